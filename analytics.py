@@ -0,0 +1,133 @@
+"""Step durations and bay turnaround over completed loads.
+
+Only the columns below are read from the storage, never whole records;
+everything after that is NumPy/pandas column arithmetic, so a year of
+history takes a fraction of a second.
+"""
+import time
+import warnings
+from typing import Iterable, Sequence
+
+import numpy as np
+import pandas as pd
+
+from checklist import STEP_TIMESTAMPS
+
+# Checklist step timestamps in the order the steps are done
+STEP_FIELDS = STEP_TIMESTAMPS
+# A step's duration runs from the previous recorded step to it, so the first step has none
+STEPS = tuple(name[:-len("_timestamp")] for name in STEP_FIELDS[1:])
+TURNAROUND = "turnaround"
+
+GROUP_FIELDS = ("bay_number", "shift", "truck_type")
+QUANTILES = (0.5, 0.9, 0.99)
+
+# A step is an outlier when it is this many (scaled) median absolute
+# deviations above that step's median
+OUTLIER_MADS = 5.0
+# Scales the MAD to a standard deviation for normally distributed data
+_MAD_SCALE = 1.4826
+
+# Fields build_frame reads from each completed load, after its id
+COLUMNS = (*GROUP_FIELDS, *STEP_FIELDS)
+
+
+def _epoch_seconds(times: pd.DataFrame) -> np.ndarray:
+    """Step times as epoch seconds (NaN if unset), from epoch seconds or timestamp text.
+
+    Text is local time, as the JSON layout stores it. It is parsed in one
+    pass and shifted by the UTC offset of its hour, looked up once per hour.
+    """
+    try:
+        return times.to_numpy(dtype=float)
+    except ValueError:
+        pass
+    values = times.to_numpy()
+    moments = pd.to_datetime(pd.Series(values.ravel()), format="ISO8601", errors="coerce")
+    unset = moments.isna().to_numpy()
+    naive = moments.to_numpy(dtype="datetime64[s]").astype(np.int64)
+    naive[unset] = 0
+    hours, inverse = np.unique(naive // 3600 * 3600, return_inverse=True)
+    offsets = np.array([hour - time.mktime(time.gmtime(hour)[:8] + (-1,)) for hour in hours.tolist()])
+    seconds = (naive - offsets[inverse]).astype(float)
+    seconds[unset] = np.nan
+    return seconds.reshape(values.shape)
+
+
+def build_frame(rows: Iterable[tuple]) -> pd.DataFrame:
+    """Reads completed loads into one row per load.
+
+    ``rows`` are (id, *values of COLUMNS), as a storage's
+    iter_completed_values streams them. Columns are the record id,
+    GROUP_FIELDS, the duration of every step in STEPS and the bay
+    turnaround (truck on bay to drive out), all durations in seconds. A step
+    that was not recorded, or was recorded out of order, is NaN.
+    """
+    frame = pd.DataFrame.from_records(rows, columns=["id", *COLUMNS])
+    times = _epoch_seconds(frame[list(STEP_FIELDS)])
+    frame = frame[["id", *GROUP_FIELDS]]
+    if not len(frame):
+        return frame.assign(**{name: np.empty(0) for name in (*STEPS, TURNAROUND)})
+
+    # Time of the last step recorded before each step: skipped steps fold into the next one
+    previous = pd.DataFrame(times).ffill(axis=1).to_numpy()[:, :-1]
+    durations = times[:, 1:] - previous
+    durations[durations < 0] = np.nan
+    turnaround = times[:, STEP_FIELDS.index("drive_out_timestamp")] - times[:, 0]
+    turnaround[turnaround < 0] = np.nan
+
+    columns = dict(zip(STEPS, durations.T))
+    columns[TURNAROUND] = turnaround
+    return pd.concat([frame, pd.DataFrame(columns, index=frame.index)], axis=1)
+
+
+def summarize(frame: pd.DataFrame, by: str, metrics: Sequence[str] = (TURNAROUND,)) -> pd.DataFrame:
+    """p50/p90/p99 of each metric per value of ``by`` (one of GROUP_FIELDS).
+
+    The result has one row per group, a ``loads`` count and columns named
+    ``<metric>_p50`` and so on.
+    """
+    groups = frame.fillna({by: ""}).groupby(by, sort=True)
+    quantiles = groups[list(metrics)].quantile(list(QUANTILES)).unstack()
+    quantiles.columns = [f"{metric}_p{round(q * 100)}" for metric, q in quantiles.columns]
+    return pd.concat([groups.size().rename("loads"), quantiles], axis=1)
+
+
+def step_quantiles(frame: pd.DataFrame) -> pd.DataFrame:
+    """p50/p90/p99 of every step over all loads, one row per step in checklist order."""
+    table = frame[list(STEPS)].quantile(list(QUANTILES)).T
+    table.columns = [f"p{round(q * 100)}" for q in QUANTILES]
+    table["loads"] = frame[list(STEPS)].count()
+    return table
+
+
+def find_outliers(frame: pd.DataFrame, threshold: float = OUTLIER_MADS, limit: int = 50) -> pd.DataFrame:
+    """Steps that took far longer than usual for that step, worst first.
+
+    Uses the median and median absolute deviation of each step, so a few
+    extreme loads do not hide each other the way they would with a mean.
+    Returns id, bay_number, step, seconds, usual (the step's median) and score.
+    """
+    durations = frame[list(STEPS)].to_numpy(dtype=float)
+    if not len(durations):
+        return pd.DataFrame(columns=["id", "bay_number", "step", "seconds", "usual", "score"])
+    with warnings.catch_warnings():
+        # Steps nobody has recorded yet have no median; they simply stay NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        median = np.nanmedian(durations, axis=0)
+        mad = np.nanmedian(np.abs(durations - median), axis=0) * _MAD_SCALE
+        # Steps that nearly always take the same time have no spread; use 1 s
+        score = (durations - median) / np.where(mad > 0, mad, 1.0)
+    with np.errstate(invalid="ignore"):
+        rows, steps = np.nonzero(score > threshold)
+    order = np.argsort(-score[rows, steps], kind="stable")[:limit]
+    rows, steps = rows[order], steps[order]
+    return pd.DataFrame({
+        "id": frame["id"].to_numpy()[rows],
+        "bay_number": frame["bay_number"].to_numpy()[rows],
+        "step": np.asarray(STEPS, dtype=object)[steps],
+        "seconds": durations[rows, steps],
+        "usual": median[steps],
+        "score": score[rows, steps],
+    })
+
@@ -1,40 +1,452 @@
 import flet as ft
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
 import os
-import pandas as pd
-from typing import Dict, List, Optional
+import threading
+from collections import OrderedDict
+from contextlib import ExitStack
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from autosave import Autosaver
+from changefeed import ChangeFeed, ChangeSet, compact
+from checklist import ADMIN_FIELDS, ADMIN_ROWS, LOADING_FIELDS, STEPS, TIMESTAMP, Field, Step
+from export import EXPORT_DIR, new_export_filename, prune_exports, write_report
+from instrument import UPDATE_STATS_ENABLED, update_stats
+from metrics import STORAGE_WRITE_SECONDS, timed
+from notify import Notifier
+from records import BOOKKEEPING_FIELDS, FIELDS, READING_FIELDS, LoadingRecord, parse_timestamp
+from search import ACTIVE, COMPLETED, INDEXED_FIELDS, SEARCH_FIELDS, SearchIndex
+from sites import DEFAULT_SITES, Site, load_sites
+from storage import open_storage
+
+# Rows per page in the review table
+REVIEW_PAGE_SIZE = 25
+# Completed-load rows kept built per session; must be at least one page
+ROW_CACHE_SIZE = 4 * REVIEW_PAGE_SIZE
+# Record fields written to Excel after the bay number and status columns
+EXPORT_FIELDS = [name for name, _ in FIELDS if name not in BOOKKEEPING_FIELDS] + ["completed_time"]
+# Fields edited in a text field or dropdown (these can show a validation error)
+INPUT_KEYS = frozenset(field.key for field in (*ADMIN_FIELDS, *LOADING_FIELDS) if field.kind != TIMESTAMP)
 
 # -------------------- Data Management Class --------------------
-class GasLoadingSystem:
-    """Class to manage all data related to the gas loading process."""
+class BayVersion:
+    """Version counters of one bay, for saving edits from several sessions without locking the form.
+
+    Versions are numbers of the site's change feed: ``number`` is the number
+    of the bay's latest change, ``fields`` holds the number at which each
+    field last changed and ``started`` the number at which the current load
+    began (when the bay was last cleared).
+    """
+    __slots__ = ("number", "fields", "started")
+
     def __init__(self):
-        # On a deployed server, files might not be persistent.
-        # So we'll keep data in memory for the session.
-        self.data = {
-            "bays": {"1": {}, "2": {}, "3": {}, "4": {}},
-            "completed": []
-        }
-        # In a real-world scenario, this would be a database.
+        self.number = 0
+        self.fields: Dict[str, int] = {}
+        self.started = 0
+
+    def bump(self, keys, number: int) -> int:
+        self.number = number
+        for key in keys:
+            self.fields[key] = number
+        return number
+
+    def changed_since(self, key: str, base: int) -> bool:
+        """True if ``key`` changed after version ``base``, or the load it belonged to is gone."""
+        return base < self.started or self.fields.get(key, self.started) > base
+
+
+class SaveResult(NamedTuple):
+    errors: Dict[str, str]     # rejected values: {field: error}
+    conflicts: Dict[str, str]  # fields another session changed first: {field: value now stored}
+    version: int               # the bay's version after the save
+
+
+class GasLoadingSystem:
+    """Class to manage all data related to the gas loading process.
+
+    There is one instance per site, shared by every browser session working
+    at that site. The site's bays are fixed when it is created and each bay
+    has its own record and lock, so an operation on one bay touches nothing
+    shared with the others. Every change is published to the subscribed
+    sessions with the bay's new version, which sessions send back with their
+    edits so a field changed by someone else in the meantime is not
+    overwritten. Versions are numbers of the site's change feed, from which a
+    session that lost its connection catches up on what it missed.
+    """
+    def __init__(self, site: Optional[Site] = None, storage=None):
+        self.site = site or DEFAULT_SITES[0]
+        # On a deployed server, files might not be persistent, so the default
+        # storage keeps data in memory. Set GAS_LOADING_DB to use SQLite.
+        self.storage = storage if storage is not None else open_storage()
+        stored = self.storage.load_bays()
+        # Active bays stay in memory; completed loads live in the storage.
+        self.data = {"bays": {bay_number: stored.get(bay_number) or LoadingRecord() for bay_number in self.site.bays}}
+        self._bay_locks = {bay_number: threading.Lock() for bay_number in self.site.bays}
+        # Versions start over with the process, as every session does
+        self._versions = {bay_number: BayVersion() for bay_number in self.site.bays}
+        self.feed = ChangeFeed()
+        self._listeners: List[Callable[[dict], None]] = []
+        self._listeners_lock = threading.Lock()
+        # Kept up to date by save_bay_data and complete_loading, built on first use
+        self.search_index = SearchIndex(self._search_entries)
+
+    def _bay_lock(self, bay_number: str) -> threading.Lock:
+        """The lock of one bay; raises KeyError for a bay the site does not have."""
+        return self._bay_locks[bay_number]
+
+    # -------------------- Change notifications --------------------
+    def subscribe(self, listener: Callable[[dict], None]):
+        """Registers a callback that receives every change made to the store."""
+        with self._listeners_lock:
+            self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[dict], None]):
+        """Removes a callback registered with subscribe()."""
+        with self._listeners_lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def _publish(self, change: dict):
+        with self._listeners_lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(change)
+
+    # -------------------- Bay data --------------------
+    def get_bay_record(self, bay_number: str) -> LoadingRecord:
+        """Retrieves a copy of the typed record of a specific bay."""
+        with self._bay_lock(bay_number):
+            return self.data["bays"][bay_number].copy()
 
     def get_bay_data(self, bay_number: str) -> dict:
-        """Retrieves data for a specific bay."""
-        return self.data["bays"].get(bay_number, {})
-
-    def save_bay_data(self, bay_number: str, data: dict):
-        """Saves or updates data for a specific bay."""
-        if bay_number not in self.data["bays"]:
-            self.data["bays"][bay_number] = {}
-        self.data["bays"][bay_number].update(data)
-    
-    def complete_loading(self, bay_number: str):
+        """Retrieves the data of a specific bay as form text."""
+        with self._bay_lock(bay_number):
+            return self.data["bays"][bay_number].to_json()
+
+    def get_bay_data_and_version(self, bay_number: str) -> Tuple[dict, int]:
+        """The bay's data as form text and the version it is at, read together."""
+        with self._bay_lock(bay_number):
+            return self.data["bays"][bay_number].to_json(), self._versions[bay_number].number
+
+    def get_active_bays(self) -> Dict[str, LoadingRecord]:
+        """Returns a copy of every bay that currently has data."""
+        active = {}
+        for bay_number in list(self.data["bays"]):
+            record = self.get_bay_record(bay_number)
+            if record:
+                active[bay_number] = record
+        return active
+
+    # -------------------- Completed loads --------------------
+    def get_recent_completed(self, limit: int = 10) -> List[LoadingRecord]:
+        """Returns the most recently completed loads, oldest first."""
+        return self.storage.recent_completed(limit)
+
+    def query_completed(self, **filters) -> List[LoadingRecord]:
+        """Returns completed loads filtered by start/end time, bay_number, shift or order_no."""
+        return self.storage.query_completed(**filters)
+
+    def page_completed(self, filters: Optional[dict] = None, sort: str = "completed_time", descending: bool = True,
+                       cursor=None, limit: int = 25):
+        """Returns one page of completed loads and the cursor of the next page."""
+        return self.storage.page_completed(filters, sort, descending, cursor, limit)
+
+    def iter_completed(self) -> Iterator[LoadingRecord]:
+        """Streams every completed load from the storage."""
+        return self.storage.iter_completed()
+
+    def iter_completed_values(self, fields: Sequence[str]) -> Iterator[tuple]:
+        """Streams (id, *values of ``fields``) of every completed load, without building records."""
+        return self.storage.iter_completed_values(fields)
+
+    def rollup(self, by: Sequence[str] = (), start=None, end=None, **filters) -> List[dict]:
+        """Truck count and load_qty per value of ``by`` (day, shift, bay_number, customer_name).
+
+        ``start`` and ``end`` are days, both included; ``filters`` may fix a
+        shift, bay_number or customer_name. Reads the running totals the
+        storage keeps, never the completed loads themselves.
+        """
+        return self.storage.rollup(by, start, end, **filters)
+
+    def rebuild_rollups(self):
+        """Recomputes the running totals from the completed loads."""
+        self.storage.rebuild_rollups()
+
+    # -------------------- Search --------------------
+    def _search_entries(self):
+        """Everything the search index holds, for building it."""
+        fields = (*SEARCH_FIELDS, "bay_number", "shift", "completed_time")
+        for record_id, texts in self.storage.iter_completed_fields(fields):
+            *search_texts, bay_number, shift, completed_time = texts
+            epoch = parse_timestamp(completed_time) if completed_time else 0
+            yield (COMPLETED, record_id), search_texts, bay_number, shift, epoch
+        for bay_number in self.site.bays:
+            record = self.get_bay_record(bay_number)
+            yield ((ACTIVE, bay_number), [record.text(field) for field in SEARCH_FIELDS], bay_number, record.text("shift"),
+                   record.admin_saved_time or 0)
+
+    def search(self, text: str, filters: Optional[dict] = None, status: str = "all", offset: int = 0,
+               limit: int = 25) -> Tuple[List[Tuple[Optional[str], LoadingRecord]], Optional[int]]:
+        """Finds loads by part of a license plate, carrier, customer or order number.
+
+        Returns one page of (bay_number, record) pairs, where bay_number is
+        None for completed loads, and the offset of the next page.
+        """
+        kinds = {"all": (ACTIVE, COMPLETED), "active": (ACTIVE,), "completed": (COMPLETED,)}[status]
+        keys, next_offset = self.search_index.search(text, filters, kinds, offset, limit)
+        completed = {record.id: record for record in
+                     self.storage.get_completed([record_id for kind, record_id in keys if kind == COMPLETED])}
+        found = []
+        for kind, ident in keys:
+            if kind == ACTIVE:
+                found.append((ident, self.get_bay_record(ident)))
+            elif ident in completed:
+                found.append((None, completed[ident]))
+        return found, next_offset
+
+    def save_bay_data(self, bay_number: str, data: dict, origin: Optional[str] = None,
+                      base: Optional[Dict[str, int]] = None) -> SaveResult:
+        """Saves or updates data for a specific bay.
+
+        Values are validated and converted once, here; rejected values are
+        returned as errors and the other fields are still saved. ``base`` holds
+        the bay version each value was based on: a field that another session
+        changed since then to something else is not saved but returned as a
+        conflict with the value now stored. Without ``base`` every value is
+        saved. ``origin`` identifies the session that made the change so it can
+        skip its own echo when the change is published.
+        """
+        with self._bay_lock(bay_number):
+            record = self.data["bays"][bay_number]
+            version = self._versions[bay_number]
+            conflicts = {}
+            if base is not None:
+                for key, value in data.items():
+                    if key in base and version.changed_since(key, base[key]):
+                        current = record.text(key)
+                        if current != ("" if value is None else str(value)):
+                            conflicts[key] = current
+                data = {key: value for key, value in data.items() if key not in conflicts}
+            errors = record.update(data)
+            saved = {key: record.text(key) for key in data if key not in errors}
+            if saved:
+                with STORAGE_WRITE_SECONDS.time("save_bay"):
+                    self.storage.save_bay(bay_number, record)
+                if not INDEXED_FIELDS.isdisjoint(saved):
+                    self.search_index.put_record((ACTIVE, bay_number), bay_number, record)
+                change = self._record_change({"type": "bay", "bay_number": bay_number, "fields": saved,
+                                              "origin": origin}, saved)
+            number = version.number
+        if saved:
+            self._publish(change)
+        return SaveResult(errors, conflicts, number)
+
+    def ingest_readings(self, readings: List[dict], origin: str = "ingest") -> List[dict]:
+        """Applies a batch of instrument readings, e.g. from a weighbridge or the DCS.
+
+        Each reading is {"bay_number": ..., "fields": {field: value}} and may
+        only set READING_FIELDS; a later reading of a field replaces an earlier
+        one. Every accepted value is written in one storage transaction and each
+        bay's change is published once. Readings are only taken for bays with
+        a load in progress; instruments cannot start a load. Returns
+        [{"index", "errors"}] for the readings with rejected values; the other
+        values are still applied.
+        """
+        rejected: Dict[int, Dict[str, str]] = {}
+        by_bay: Dict[str, dict] = {}
+        indices: Dict[str, List[int]] = {}  # readings with accepted values, by bay
+        for index, reading in enumerate(readings):
+            bay_number, values = reading["bay_number"], reading["fields"]
+            if bay_number not in self._bay_locks:
+                rejected[index] = {"bay_number": f"Unknown bay {bay_number!r}"}
+                continue
+            errors = {}
+            accepted = {}
+            for key, value in values.items():
+                if key not in READING_FIELDS:
+                    errors[key] = "Not an instrument reading"
+                elif isinstance(value, bool) or not isinstance(value, (str, int, float)):
+                    errors[key] = "Expected a number or text"
+                else:
+                    accepted[key] = value
+            # Parsed here, outside the bay locks; typed values cannot fail later
+            parsed = LoadingRecord()
+            errors.update(parsed.update(accepted))
+            by_bay.setdefault(bay_number, {}).update(
+                (key, getattr(parsed, key)) for key in accepted if key not in errors)
+            if accepted.keys() - errors.keys():
+                indices.setdefault(bay_number, []).append(index)
+            if errors:
+                rejected[index] = errors
+
+        changes = {}
+        with ExitStack() as locks:
+            for bay_number in sorted(by_bay):  # a fixed order, so batches never deadlock
+                locks.enter_context(self._bay_lock(bay_number))
+            updated = {}
+            for bay_number, values in by_bay.items():
+                if not values:
+                    continue
+                # Checked under the lock: the load may have been completed meanwhile
+                if not self.data["bays"][bay_number]:
+                    for index in indices[bay_number]:
+                        rejected.setdefault(index, {})["bay_number"] = "No load in progress"
+                    continue
+                record = self.data["bays"][bay_number].copy()
+                record.update(values)
+                updated[bay_number] = record
+                changes[bay_number] = {key: record.text(key) for key in values}
+            # Readings never set INDEXED_FIELDS, so the search index is unaffected
+            if updated:
+                with STORAGE_WRITE_SECONDS.time("ingest"):
+                    self.storage.save_bays(updated)
+                self.data["bays"].update(updated)
+            changes = [self._record_change({"type": "bay", "bay_number": bay_number, "fields": saved,
+                                            "origin": origin}, saved) for bay_number, saved in changes.items()]
+        for change in changes:
+            self._publish(change)
+        return [{"index": index, "errors": rejected[index]} for index in sorted(rejected)]
+
+    def complete_loading(self, bay_number: str, origin: Optional[str] = None):
         """Moves data from an active bay to the completed list."""
-        if bay_number in self.data["bays"] and self.data["bays"][bay_number]:
-            completed_data = self.data["bays"][bay_number].copy()
-            completed_data["bay_number"] = bay_number
-            completed_data["completed_time"] = datetime.now().isoformat()
-            self.data["completed"].append(completed_data)
-            self.data["bays"][bay_number] = {}  # Clear the bay
+        with self._bay_lock(bay_number):
+            if not self.data["bays"][bay_number]:
+                return
+            completed = self.data["bays"][bay_number]
+            completed.bay_number = bay_number
+            completed.completed_time = int(datetime.now().timestamp())
+            with STORAGE_WRITE_SECONDS.time("complete"):
+                self.storage.complete(bay_number, completed)
+            self.data["bays"][bay_number] = LoadingRecord()  # Clear the bay
+            self.search_index.remove((ACTIVE, bay_number))
+            self.search_index.put_record((COMPLETED, completed.id), bay_number, completed)
+            change = self._record_change({"type": "completed", "bay_number": bay_number, "record": completed,
+                                          "origin": origin}, ())
+            # Edits based on the load that just ended now conflict
+            version = self._versions[bay_number]
+            version.started = version.number
+            version.fields.clear()
+        self._publish(change)
+
+    # -------------------- Change feed --------------------
+    def _record_change(self, change: dict, keys) -> dict:
+        """Numbers a bay's change in the feed and makes it the bay's version; call with the bay's lock held."""
+        self._versions[change["bay_number"]].bump(keys, self.feed.append(change))
+        return change
+
+    def _changes_from_bays(self, seq: int, reset: bool = False) -> List[dict]:
+        """What changed after ``seq`` according to the bays' versions, or with ``reset`` every bay's state.
+
+        Serves clients the feed's buffer no longer covers. Completions come
+        without their record: there may have been several; the completed
+        list holds them all.
+        """
+        changes = []
+        for bay_number in self.site.bays:
+            with self._bay_lock(bay_number):
+                record = self.data["bays"][bay_number]
+                version = self._versions[bay_number]
+                if reset:
+                    fields = record.to_json()
+                else:
+                    if version.started > seq:
+                        changes.append({"type": "completed", "bay_number": bay_number, "record": None,
+                                        "origin": None, "seq": version.started, "version": version.started})
+                    fields = {key: record.text(key) for key, number in version.fields.items() if number > seq}
+                number = version.number
+            if fields or reset:
+                changes.append({"type": "bay", "bay_number": bay_number, "fields": fields, "origin": None,
+                                "seq": number, "version": number})
+        changes.sort(key=lambda change: change["seq"])
+        return changes
+
+    def changes_since(self, seq: int, feed: Optional[str]) -> ChangeSet:
+        """The changes after sequence number ``seq``, compacted, for a client catching up.
+
+        Each bay's edits are merged into one change with the latest value of
+        each field. Served from the feed's buffer while it still holds every
+        change after ``seq``, else from the bays' versions. ``feed`` is the id
+        of the ChangeSet the client got last time: if it is missing or not
+        this feed's (the process restarted), or ``seq`` is ahead of the feed,
+        the result is a reset holding every bay's full state.
+        """
+        latest = self.feed.seq
+        if feed != self.feed.id or seq > latest:
+            return ChangeSet(self.feed.id, latest, True, self._changes_from_bays(0, reset=True))
+        changes = self.feed.since(seq)
+        if changes is None:
+            return ChangeSet(self.feed.id, latest, False, self._changes_from_bays(seq))
+        return ChangeSet(self.feed.id, changes[-1]["seq"] if changes else seq, False, compact(changes))
+
+
+# Sites and bays from GAS_LOADING_SITES (one site with bays 1-4 by default)
+SITES = load_sites()
+# One store per site, shared by every browser session at that site. With
+# several sites, each keeps its data in its own storage.
+gas_systems: Dict[str, GasLoadingSystem] = {
+    site.id: GasLoadingSystem(site, open_storage(site.id if len(SITES) > 1 else None)) for site in SITES
+}
+
+# -------------------- UI Components --------------------
+def set_text(text: ft.Text, value: str, changed: List[ft.Control], color: Optional[str] = None):
+    """Sets a Text's value (and color) and records it in ``changed`` if anything differs."""
+    if text.value != value or (color is not None and text.color != color):
+        text.value = value
+        if color is not None:
+            text.color = color
+        changed.append(text)
+
+
+class BaySummaryCard(ft.Card):
+    """Summary card for one bay whose texts are updated in place."""
+    def __init__(self, label: str):
+        self.status_text = ft.Text()
+        self.carrier_text = ft.Text()
+        self.order_text = ft.Text()
+        super().__init__(
+            content=ft.Container(
+                content=ft.Column([
+                    ft.Text(label, size=16, weight=ft.FontWeight.BOLD),
+                    self.status_text,
+                    self.carrier_text,
+                    self.order_text,
+                ]),
+                padding=10
+            ),
+            width=250,
+            height=150
+        )
+
+    def show(self, record: LoadingRecord) -> List[ft.Control]:
+        """Writes the bay state into the card and returns the texts that changed."""
+        changed = []
+        is_active = bool(record)
+        set_text(self.status_text, f"Status: {'กำลังดำเนินการ' if is_active else 'ว่าง'}", changed,
+                 ft.Colors.ORANGE if is_active else ft.Colors.GREEN)
+        set_text(self.carrier_text, f"Carrier: {record.text('carrier_name', '-')}", changed)
+        set_text(self.order_text, f"Order: {record.text('order_no', '-')}", changed)
+        return changed
+
+
+class RecordRow(ft.DataRow):
+    """Review-table row for one active bay or completed load."""
+    def __init__(self):
+        self.texts = [ft.Text() for _ in range(7)]
+        super().__init__(cells=[ft.DataCell(text) for text in self.texts])
+
+    def show(self, bay_num: str, record: LoadingRecord, status: str, color: str, time_key: str) -> List[ft.Control]:
+        """Writes the record into the row and returns the cells that changed."""
+        changed = []
+        bay_text, carrier_text, license_text, order_text, qty_text, status_text, time_text = self.texts
+        set_text(bay_text, f"Bay {bay_num}", changed)
+        set_text(carrier_text, record.text('carrier_name', '-'), changed)
+        set_text(license_text, f"{record.text('license_front', '-')}/{record.text('license_rear', '-')}", changed)
+        set_text(order_text, record.text('order_no', '-'), changed)
+        set_text(qty_text, record.text('load_qty', '-'), changed)
+        set_text(status_text, status, changed, color)
+        set_text(time_text, record.text(time_key, '-'), changed)
+        return changed
+
 
 # -------------------- Main Application UI --------------------
 def main(page: ft.Page):
@@ -44,114 +456,182 @@ def main(page: ft.Page):
     page.window.width = 1200
     page.window.height = 800
     page.auto_scroll = True
+    if UPDATE_STATS_ENABLED:
+        update_stats.instrument(page)
     
-    # Initialize the data system
-    gas_system = GasLoadingSystem()
-    current_bay = "1"  # Default bay
+    # A session works at one site: the one it switched to, ?site=<id>, or the first
+    site_id = page.session.get("site") or page.query.to_dict.get("site")
+    site = next((s for s in SITES if s.id == site_id), SITES[0])
+    gas_system = gas_systems[site.id]
+    current_bay = site.bays[0]  # Default bay
+    session_id = page.session_id
     
     # -------------------- UI elements (created once) --------------------
+    def input_control(field: Field) -> ft.Control:
+        """Builds the text field or dropdown that edits ``field``."""
+        if field.choices:
+            return ft.Dropdown(label=field.title, width=field.width,
+                               options=[ft.dropdown.Option(choice) for choice in field.choices])
+        return ft.TextField(label=field.title, width=field.width,
+                            keyboard_type=ft.KeyboardType.NUMBER if field.uses_numeric_keyboard else None)
+
     # Admin check order fields
-    carrier_name = ft.TextField(label="Carrier Name", width=300)
-    license_front = ft.TextField(label="License (Front)", width=200, keyboard_type=ft.KeyboardType.NUMBER)
-    license_rear = ft.TextField(label="License (Rear)", width=200, keyboard_type=ft.KeyboardType.NUMBER)
-    truck_type = ft.Dropdown(label="Types of truck", width=300, options=[ft.dropdown.Option("Semi-Trailer"), ft.dropdown.Option("10 wheel truck"), ft.dropdown.Option("ISO Tank")])
-    shift = ft.Dropdown(label="Shift", width=150, options=[ft.dropdown.Option("A"), ft.dropdown.Option("B"), ft.dropdown.Option("C"), ft.dropdown.Option("D")])
-    order_no = ft.TextField(label="Order No.", width=200, keyboard_type=ft.KeyboardType.NUMBER)
-    customer_name = ft.TextField(label="Customer name", width=300)
-    load_qty = ft.TextField(label="Calculated/Load Q'ty (kg)", width=200, keyboard_type=ft.KeyboardType.NUMBER)
-    checker_name = ft.TextField(label="ชื่อผู้ตรวจสอบ", width=300)
-    
-    # Store admin fields for easier access
-    admin_fields = {
-        'carrier_name': carrier_name, 'license_front': license_front, 'license_rear': license_rear,
-        'truck_type': truck_type, 'shift': shift, 'order_no': order_no,
-        'customer_name': customer_name, 'load_qty': load_qty, 'checker_name': checker_name
-    }
+    admin_fields = {field.key: input_control(field) for field in ADMIN_FIELDS}
     
     # -------------------- Helper Functions --------------------
+    notifier = Notifier(page)
+
     def show_snackbar(message: str, color: str = ft.Colors.GREEN):
         """Displays a temporary message at the bottom of the screen."""
-        snackbar = ft.SnackBar(content=ft.Text(message), bgcolor=color, duration=2000)
-        page.overlay.append(snackbar)
-        snackbar.open = True
-        page.update()
+        notifier.show(message, color)
     
     def get_timestamp():
         """Returns the current timestamp in a readable format."""
         return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-    def save_all_fields():
-        """Saves data from all fields for the current bay."""
-        bay_data = {}
-        # Save Admin fields
-        for key, field in admin_fields.items():
-            bay_data[key] = field.value
-        # Save Loading fields
-        for key, field in loading_fields.items():
-            if isinstance(field, (ft.TextField, ft.Dropdown)):
-                bay_data[key] = field.value
-            elif isinstance(field, ft.Text):
-                # We need to get the value from the UI element
-                bay_data[key] = field.value
-
-        gas_system.save_bay_data(current_bay, bay_data)
-        page.update()
-
-    def load_bay_data_to_form():
-        """Loads saved data for the current bay into the form fields."""
-        bay_data = gas_system.get_bay_data(current_bay)
-        
-        # Load Admin fields
-        for key, field in admin_fields.items():
-            field.value = bay_data.get(key, '')
-        
-        # Load Loading fields
-        for key, field in loading_fields.items():
-            if isinstance(field, (ft.TextField, ft.Dropdown)):
-                field.value = bay_data.get(key, '')
-            elif isinstance(field, ft.Text):
-                field.value = bay_data.get(key, '')
-                
-        page.update()
+    # The bay version each form value is based on: the version the bay was
+    # loaded at, or for a field shown or saved since, the version of that change
+    loaded_versions: Dict[str, int] = {}
+    field_versions: Dict[str, Dict[str, int]] = {}
+
+    def base_versions(bay_number: str, keys) -> Dict[str, int]:
+        loaded = loaded_versions.get(bay_number, 0)
+        seen = field_versions.get(bay_number, {})
+        return {key: seen.get(key, loaded) for key in keys}
+
+    def mark_seen(bay_number: str, keys, version: int) -> List[str]:
+        """Records that the form shows ``keys`` as of ``version``; returns the keys that were older."""
+        loaded = loaded_versions.get(bay_number, 0)
+        seen = field_versions.setdefault(bay_number, {})
+        newer = [key for key in keys if version > seen.get(key, loaded)]
+        seen.update((key, version) for key in newer)
+        return newer
+
+    @timed("save_changed_fields")
+    def save_changed_fields(bay_number: str, changes: dict, bases: Dict[str, Optional[int]]):
+        """Saves only the fields whose value differs from what is stored for the bay.
+
+        ``bases`` holds the version each field was at when its edit began.
+        """
+        stored = gas_system.get_bay_data(bay_number)
+        changes = {key: value for key, value in changes.items() if stored.get(key, '') != (value or '')}
+        if changes:
+            base = base_versions(bay_number, changes)
+            base.update((key, bases[key]) for key in changes if bases.get(key) is not None)
+            errors, conflicts, version = gas_system.save_bay_data(
+                bay_number, changes, origin=session_id, base=base)
+            mark_seen(bay_number, [key for key in changes if key not in errors], version)
+            show_field_errors(changes, errors, conflicts if bay_number == current_bay else {})
+            if conflicts:
+                show_snackbar(f"ผู้ใช้อื่นแก้ไข {len(conflicts)} ช่องของ {site.bay_label(bay_number)} ก่อน "
+                              "แสดงค่าล่าสุดแทนค่าที่กรอก", ft.Colors.ORANGE)
+
+    def show_field_errors(changes: dict, errors: Dict[str, str], conflicts: Dict[str, str]):
+        """Marks rejected values on their fields, shows the stored value of conflicting ones and clears the rest."""
+        changed = []
+        for key in changes:
+            field = admin_fields.get(key) or loading_fields.get(key)
+            if field is None:
+                continue
+            error_text = "ค่าไม่ถูกต้อง" if key in errors else "ผู้ใช้อื่นแก้ไขแล้ว" if key in conflicts else None
+            if key in conflicts and field.value != conflicts[key]:
+                field.value = conflicts[key]
+                changed.append(field)
+            if key in INPUT_KEYS and field.error_text != error_text:
+                field.error_text = error_text
+                changed.append(field)
+        changed = [control for control in dict.fromkeys(changed) if control.page]
+        if changed:
+            page.update(*changed)
+
+    autosave = Autosaver(save_changed_fields)
+
+    def mark_edited(key: str, value):
+        """Queues an edit for autosave, based on the version the field shows now."""
+        autosave.mark(current_bay, key, value, base_versions(current_bay, (key,))[key])
+
+    def on_field_changed(key: str):
+        """Returns an on_change handler that queues the field for autosave."""
+        return lambda e: mark_edited(key, e.control.value)
+
+    def fill_fields(fields: Dict[str, ft.Control], bay_data: dict) -> List[ft.Control]:
+        """Copies bay data into form fields and returns the ones whose value changed."""
+        changed = []
+        for key, field in fields.items():
+            value = bay_data.get(key, '')
+            if field.value != value:
+                field.value = value
+                changed.append(field)
+        return changed
+
+    def fill_loading_fields(bay_data: dict) -> List[ft.Control]:
+        """Copies bay data into the Loading tab fields (if the tab has been built)."""
+        return fill_fields(loading_fields, bay_data)
+
+    @timed("load_bay_data_to_form")
+    def load_bay_data_to_form(*controls: ft.Control):
+        """Loads saved data for the current bay into the form fields.
+
+        Only the fields that changed, plus ``controls``, are sent, in one update.
+        """
+        bay_data, loaded_versions[current_bay] = gas_system.get_bay_data_and_version(current_bay)
+        field_versions[current_bay] = {}
+        changed = [*controls, *fill_fields(admin_fields, bay_data), *fill_loading_fields(bay_data)]
+        changed = [control for control in changed if control.page]
+        if changed:
+            page.update(*changed)
     
     # -------------------- Bay Selector UI --------------------
+    @timed("on_bay_changed")
     def on_bay_changed(e):
         """Handles a change in the selected bay."""
         nonlocal current_bay
         # Save data of the OLD bay before switching
-        save_all_fields()
+        autosave.flush()
         
         current_bay = e.control.value
-        bay_status.value = f"กำลังทำงานที่ Bay {current_bay}"
-        # Load data of the NEW bay
-        load_bay_data_to_form()
-        page.update()
+        bay_status.value = f"กำลังทำงานที่ {site.bay_label(current_bay)}"
+        # Load data of the NEW bay; the fields and the status go out together
+        load_bay_data_to_form(bay_status)
     
     bay_selector = ft.Dropdown(
         label="เลือก Bay",
         width=150,
-        value="1",
-        options=[ft.dropdown.Option("1", "Bay 1"), ft.dropdown.Option("2", "Bay 2"), ft.dropdown.Option("3", "Bay 3"), ft.dropdown.Option("4", "Bay 4")],
+        value=current_bay,
+        options=[ft.dropdown.Option(b, site.bay_label(b)) for b in site.bays],
         on_change=on_bay_changed
     )
     
-    bay_status = ft.Text(f"กำลังทำงานที่ Bay {current_bay}", size=16, weight=ft.FontWeight.BOLD)
+    bay_status = ft.Text(f"กำลังทำงานที่ {site.bay_label(current_bay)}", size=16, weight=ft.FontWeight.BOLD)
+
+    def on_site_changed(e):
+        """Starts this session over at another site."""
+        autosave.flush()
+        on_close(e)
+        page.session.set("site", e.control.value)
+        page.controls.clear()
+        page.overlay.clear()
+        main(page)
+
+    site_selector = ft.Dropdown(
+        label="ลานโหลด",
+        width=200,
+        value=site.id,
+        options=[ft.dropdown.Option(s.id, s.name) for s in SITES],
+        on_change=on_site_changed,
+        visible=len(SITES) > 1
+    )
     
     # -------------------- Tab 1: Admin Check Order --------------------
     def create_admin_tab():
         # Set on_change handlers for Admin fields
-        for field in admin_fields.values():
-            field.on_change = lambda e: save_all_fields()
+        for key, field in admin_fields.items():
+            field.on_change = on_field_changed(key)
 
         return ft.Container(
             content=ft.Column([
                 ft.Text("Admin Check Order", size=20, weight=ft.FontWeight.BOLD),
-                ft.Row([carrier_name]),
-                ft.Row([license_front, license_rear]),
-                ft.Row([truck_type, shift]),
-                ft.Row([order_no, customer_name]),
-                ft.Row([load_qty]),
-                ft.Row([checker_name]),
+                *(ft.Row([admin_fields[field.key] for field in row]) for row in ADMIN_ROWS),
             ], scroll=ft.ScrollMode.AUTO),
             padding=20
         )
@@ -160,93 +640,50 @@ def main(page: ft.Page):
     loading_fields = {} # A dictionary to hold all loading UI elements
 
     def create_loading_tab():
-        loading_steps = []
-        
-        def create_timestamp_button(label: str, field_name: str):
+        def create_timestamp_button(field: Field):
             """Creates a button to save a timestamp and displays it."""
             timestamp_text = ft.Text("", size=12)
-            loading_fields[f"{field_name}_timestamp"] = timestamp_text
+            loading_fields[field.key] = timestamp_text
             
             def on_click(e):
                 timestamp = get_timestamp()
                 timestamp_text.value = timestamp
-                save_all_fields()
-                page.update()
+                mark_edited(field.key, timestamp)
+                autosave.flush()
+                page.update(timestamp_text)
             
             return ft.Row([
-                ft.Text(label, size=14, expand=True),
+                ft.Text(field.label, size=14, expand=True),
                 ft.ElevatedButton("OK", on_click=on_click, width=80),
                 timestamp_text
             ], vertical_alignment=ft.CrossAxisAlignment.CENTER)
-            
-        def create_input_field(label: str, field_name: str, unit: str = "", keyboard_type=ft.KeyboardType.NUMBER):
-            """Creates a text field with a label and unit."""
-            field = ft.TextField(
-                label=f"{label} ({unit})" if unit else label,
-                width=300,
-                keyboard_type=keyboard_type
-            )
-            field.on_change = lambda e: save_all_fields()
-            loading_fields[field_name] = field
-            return field
-            
-        def create_dropdown_field(label: str, field_name: str, options: List[str], initial_value: str = None):
-            """Creates a dropdown field."""
-            dropdown = ft.Dropdown(
-                label=label,
-                width=300,
-                options=[ft.dropdown.Option(opt) for opt in options],
-                value=initial_value
-            )
-            dropdown.on_change = lambda e: save_all_fields()
-            loading_fields[field_name] = dropdown
-            return dropdown
+
+        def create_step_field(field: Field) -> ft.Control:
+            """Creates the control of one step field and registers it in loading_fields."""
+            if field.kind == TIMESTAMP:
+                return create_timestamp_button(field)
+            control = input_control(field)
+            control.on_change = on_field_changed(field.key)
+            loading_fields[field.key] = control
+            if field.caption:
+                return ft.Row([ft.Text(field.caption), ft.VerticalDivider(width=10), control])
+            return control
+
+        def create_step(step: Step) -> ft.Control:
+            controls = [create_step_field(field) for field in step.fields]
+            if len(controls) == 1:
+                return controls[0]
+            return ft.Column(controls) if step.layout == "column" else ft.Row(controls)
         
-        # Create all loading steps based on the provided list
-        loading_steps.extend([
-            create_timestamp_button("Check weight scale / Truck on bay time", "truck_on_bay"),
-            create_timestamp_button("Parking and stop engine", "parking_stop"),
-            create_timestamp_button("Put wheel chock, traffic cone, pole sign & connect ground (Geen Lamp)", "safety_setup"),
-            create_input_field("Create and check instruction sheet", "instruction_sheet_ton", "Ton"),
-            create_timestamp_button("Check ground before tare weight (F1) & confirm Q'ty and status with DCS", "check_ground_tare"),
-            create_input_field("Connect liquid & vapor arms / Flexible hose Open bypass valve of truck", "connect_arms_kg", "Kg"),
-            create_timestamp_button("Open manual valve vent safe location at liquid line", "open_vent"),
-            create_timestamp_button("Supply N2 & open valve vapor arm for leak test (3-5 Barg)", "supply_n2"),
-            create_timestamp_button("Open valve liquid arm/Flexible hose and purging and check O2 (< 1% by Vol.) -Close N2 supply valve and Close bypass valve of truck", "purging_o2"),
-            create_timestamp_button("Close manual valve vent safe location at liquid line of bay", "close_vent"),
-            create_input_field("Open SDV vapor of Bay for releasing tank pressure", "release_pressure_barg", "barg"),
-            create_timestamp_button("Open vapor valve and liquid valve (Top/Bottom fill) of truck", "open_truck_valves"),
-            ft.Row([
-                create_input_field("Open SDV liquid and start cooldown (F3)", "cooldown_flow_m3", "m3/hr"),
-                create_dropdown_field("Cooldown status", "cooldown_status", ["cool down", "Not cool down"], "cool down")
-            ]),
-            ft.Column([
-                create_input_field("Ramp up by FV open to full rate", "ramp_up_flow_m3", "m3/hr"),
-                ft.Row([ft.Text("ผู้ตรวจสอบ (ช่างเข้า)"), ft.VerticalDivider(width=10), create_input_field("", "technician_name", "", ft.KeyboardType.TEXT)])
-            ]),
-            create_timestamp_button("Ramp down by FV close and confirm Gross weight order", "ramp_down"),
-            create_timestamp_button("Close liquid & vapor valve of truck & open bypass valve of truck for draining", "close_truck_valves"),
-            create_timestamp_button("Supply N2 for drain & continue purging and check %LEL(CH4) ( < 3%byVol or 60%LEL)", "n2_drain_purging"),
-            create_timestamp_button("Close valve N2 supply and close valve line drain", "close_n2_drain"),
-            create_timestamp_button("Closed manual liquid and vapor arm/flexible hose", "close_arms_manual"),
-            create_timestamp_button("Open manual valve vent (safe to location) release pressure at liquid line&close", "release_final_pressure"),
-            create_timestamp_button("Disconnect liquid & vapor arm /Flexible hose ( Install seal )", "disconnect_arms"),
-            create_timestamp_button("Check all people out of bay and gross weigh truck (F1)", "gross_weigh_truck"),
-            create_input_field("Check all condition tank normal and start truck's engine", "tank_normal_kg", "kg."),
-            create_input_field("Disconnect ground and check ground camp at parking point", "disconnect_ground_kg", "kg."),
-            create_input_field("Remove wheel chock, Traffic cone and pole sign at parking area", "remove_safety_kg", "kg."),
-            create_timestamp_button("Confirm operating bay is normal and inform drive out of bay", "drive_out"),
-            ft.Column([
-                create_timestamp_button("Create and sign for confirm loading Q'ty on Bill of Loading / Excise", "bill_loading_sign"),
-                ft.Row([ft.Text("ผู้ตรวจสอบน้ำหนัก"), ft.VerticalDivider(width=10), create_input_field("", "weight_checker", "", ft.KeyboardType.TEXT)])
-            ]),
-            create_input_field("Remark", "remark", "", ft.KeyboardType.TEXT)
-        ])
+        # One row per step of the checklist definition
+        loading_steps = [create_step(step) for step in STEPS]
         
+        @timed("complete_loading")
         def complete_loading(e):
             """Completes the loading process for the current bay."""
-            gas_system.complete_loading(current_bay)
-            show_snackbar(f"บันทึกข้อมูล Bay {current_bay} เสร็จสมบูรณ์", ft.Colors.BLUE)
+            autosave.flush()
+            gas_system.complete_loading(current_bay, origin=session_id)
+            show_snackbar(f"บันทึกข้อมูล {site.bay_label(current_bay)} เสร็จสมบูรณ์", ft.Colors.BLUE)
             load_bay_data_to_form()
             
         complete_btn = ft.ElevatedButton(
@@ -268,128 +705,538 @@ def main(page: ft.Page):
     
     # -------------------- Tab 3: Data Review --------------------
     def create_review_tab():
+        # Current query; only one page of rows is fetched and sent at a time
+        sort_columns = {0: "bay_number", 1: "carrier_name", 3: "order_no", 6: "completed_time"}
+        query = {"filters": {}, "status": "all", "sort": "completed_time", "descending": True, "search": ""}
+        page_cursors = [None]  # cursor at the start of each page visited so far
+        next_cursor = None
+        # Search refreshes on every keystroke; one at a time, so the last one shows the latest text
+        refresh_lock = threading.Lock()
+
+        def on_sort(e):
+            query["sort"] = sort_columns[e.column_index]
+            query["descending"] = not e.ascending
+            data_table.sort_column_index = e.column_index
+            data_table.sort_ascending = e.ascending
+            reset_pages()
+
+        def sortable_column(label: str, column_index: int):
+            return ft.DataColumn(ft.Text(label), on_sort=on_sort if column_index in sort_columns else None)
+
         data_table = ft.DataTable(
             columns=[
-                ft.DataColumn(ft.Text("Bay")),
-                ft.DataColumn(ft.Text("Carrier")),
-                ft.DataColumn(ft.Text("License")),
-                ft.DataColumn(ft.Text("Order No.")),
-                ft.DataColumn(ft.Text("Load Q'ty (kg)")),
-                ft.DataColumn(ft.Text("Status")),
-                ft.DataColumn(ft.Text("Time")),
+                sortable_column("Bay", 0),
+                sortable_column("Carrier", 1),
+                sortable_column("License", 2),
+                sortable_column("Order No.", 3),
+                sortable_column("Load Q'ty (kg)", 4),
+                sortable_column("Status", 5),
+                sortable_column("Time", 6),
             ],
-            rows=[]
+            rows=[],
+            sort_column_index=6,
+            sort_ascending=False
         )
         
-        def refresh_data(e=None):
-            """Refreshes the data table with the latest information."""
+        # Fields shown in (or filtering) the active-bay rows
+        table_fields = {'carrier_name', 'license_front', 'license_rear', 'order_no', 'load_qty', 'admin_saved_time', 'shift'}
+
+        # Rows are reused between refreshes, so Flet only sends the rows that
+        # were added, removed or edited. Completed loads never change, so their
+        # rows are built once and kept in an LRU cache keyed by record id.
+        row_cache: "OrderedDict[int, RecordRow]" = OrderedDict()
+        active_rows: Dict[str, RecordRow] = {}
+
+        def completed_row(record: LoadingRecord) -> RecordRow:
+            row = row_cache.get(record.id)
+            if row is None:
+                row = RecordRow()
+                row.show(record.text('bay_number', '-'), record, "เสร็จสิ้น", ft.Colors.GREEN, 'completed_time')
+                row_cache[record.id] = row
+                if len(row_cache) > ROW_CACHE_SIZE:
+                    row_cache.popitem(last=False)
+            else:
+                row_cache.move_to_end(record.id)
+            return row
+
+        def active_row(bay_num: str, record: LoadingRecord) -> RecordRow:
+            row = active_rows.get(bay_num) or RecordRow()
+            row.show(bay_num, record, "กำลังดำเนินการ", ft.Colors.ORANGE, 'admin_saved_time')
+            return row
+
+        def active_bay_matches(record: LoadingRecord, bay_num: str) -> bool:
+            """Applies the filters to an active bay, dated by its admin order (undated until it is saved)."""
+            filters = query["filters"]
+            if filters.get("bay_number") not in (None, bay_num):
+                return False
+            if filters.get("shift") not in (None, record.shift):
+                return False
+            start, end = filters.get("start"), filters.get("end")
+            if start is None and end is None:
+                return True
+            saved = record.admin_saved_time
+            return (saved is not None and (start is None or saved >= start.timestamp())
+                    and (end is None or saved < end.timestamp()))
+
+        def search_rows(shown_active: Dict[str, RecordRow]) -> List[RecordRow]:
+            """One page of search results (newest first; the sort column does not apply)."""
+            nonlocal next_cursor
             rows = []
-            
-            # Active bays
-            for bay_num, bay_data in gas_system.data["bays"].items():
-                if bay_data:
-                    rows.append(ft.DataRow(cells=[
-                        ft.DataCell(ft.Text(f"Bay {bay_num}")),
-                        ft.DataCell(ft.Text(bay_data.get('carrier_name', '-'))),
-                        ft.DataCell(ft.Text(f"{bay_data.get('license_front', '-')}/{bay_data.get('license_rear', '-')}")),
-                        ft.DataCell(ft.Text(bay_data.get('order_no', '-'))),
-                        ft.DataCell(ft.Text(bay_data.get('load_qty', '-'))),
-                        ft.DataCell(ft.Text("กำลังดำเนินการ", color=ft.Colors.ORANGE)),
-                        ft.DataCell(ft.Text(bay_data.get('admin_saved_time', '-'))),
-                    ]))
-            
-            # Completed loads
-            for completed in gas_system.data["completed"][-10:]:  # Show last 10 completed
-                rows.append(ft.DataRow(cells=[
-                    ft.DataCell(ft.Text(f"Bay {completed.get('bay_number', '-')}")),
-                    ft.DataCell(ft.Text(completed.get('carrier_name', '-'))),
-                    ft.DataCell(ft.Text(f"{completed.get('license_front', '-')}/{completed.get('license_rear', '-')}")),
-                    ft.DataCell(ft.Text(completed.get('order_no', '-'))),
-                    ft.DataCell(ft.Text(completed.get('load_qty', '-'))),
-                    ft.DataCell(ft.Text("เสร็จสิ้น", color=ft.Colors.GREEN)),
-                    ft.DataCell(ft.Text(completed.get('completed_time', '-'))),
-                ]))
-            
-            data_table.rows = rows
-            page.update()
+            found, next_cursor = gas_system.search(query["search"], query["filters"], query["status"],
+                                                   page_cursors[-1] or 0, REVIEW_PAGE_SIZE)
+            for bay_num, record in found:
+                if bay_num is None:
+                    rows.append(completed_row(record))
+                else:
+                    shown_active[bay_num] = active_row(bay_num, record)
+                    rows.append(shown_active[bay_num])
+            return rows
+
+        @timed("refresh_data")
+        def refresh_data(e=None):
+            """Refreshes the current page of the data table, reusing rows already built."""
+            nonlocal next_cursor, active_rows
+            with refresh_lock:
+                rows = []
+                shown_active = {}
+                next_cursor = None
+                if query["search"]:
+                    rows = search_rows(shown_active)
+                else:
+                    # Active bays head the first page
+                    if query["status"] != "completed" and len(page_cursors) == 1:
+                        for bay_num, record in gas_system.get_active_bays().items():
+                            if active_bay_matches(record, bay_num):
+                                shown_active[bay_num] = active_row(bay_num, record)
+                                rows.append(shown_active[bay_num])
+
+                    # One page of completed loads, filtered and sorted by the store
+                    if query["status"] != "active":
+                        completed_page, next_cursor = gas_system.page_completed(
+                            query["filters"], query["sort"], query["descending"], page_cursors[-1], REVIEW_PAGE_SIZE)
+                        for completed in completed_page:
+                            rows.append(completed_row(completed))
+                active_rows = shown_active
+
+                data_table.rows = rows
+                prev_btn.disabled = len(page_cursors) == 1
+                next_btn.disabled = next_cursor is None
+                page_label.value = f"หน้า {len(page_cursors)}"
+                if data_table.page:
+                    page.update(data_table, prev_btn, next_btn, page_label)
+
+        def reset_pages():
+            del page_cursors[1:]
+            refresh_data()
+            refresh_summary()
+
+        def next_page(e):
+            if next_cursor is not None:
+                page_cursors.append(next_cursor)
+                refresh_data()
+
+        def previous_page(e):
+            if len(page_cursors) > 1:
+                page_cursors.pop()
+                refresh_data()
+
+        prev_btn = ft.IconButton(icon=ft.Icons.CHEVRON_LEFT, on_click=previous_page, tooltip="หน้าก่อนหน้า")
+        next_btn = ft.IconButton(icon=ft.Icons.CHEVRON_RIGHT, on_click=next_page, tooltip="หน้าถัดไป")
+        page_label = ft.Text("หน้า 1")
+
+        # -------------------- Filters --------------------
+        def set_filter(key: str, value: Optional[str]):
+            if value:
+                query["filters"][key] = value
+            else:
+                query["filters"].pop(key, None)
+
+        def on_choice_filter(key: str):
+            def handler(e):
+                set_filter(key, e.control.value)
+                reset_pages()
+            return handler
+
+        def on_status_filter(e):
+            query["status"] = e.control.value or "all"
+            reset_pages()
+
+        def on_search(e):
+            query["search"] = (e.control.value or "").strip()
+            reset_pages()
+
+        def on_date_filter(e):
+            """Applies the date range; the end date is inclusive."""
+            try:
+                start = datetime.strptime(date_from.value, "%Y-%m-%d") if date_from.value else None
+                end = datetime.strptime(date_to.value, "%Y-%m-%d") + timedelta(days=1) if date_to.value else None
+            except ValueError:
+                e.control.error_text = "รูปแบบ YYYY-MM-DD"
+                e.control.update()
+                return
+            date_from.error_text = date_to.error_text = None
+            set_filter("start", start)
+            set_filter("end", end)
+            page.update(date_from, date_to)
+            reset_pages()
+
+        bay_filter = ft.Dropdown(label="Bay", width=120, value="", on_change=on_choice_filter("bay_number"),
+                                 options=[ft.dropdown.Option("", "ทั้งหมด"), *[ft.dropdown.Option(b, site.bay_label(b)) for b in site.bays]])
+        shift_filter = ft.Dropdown(label="Shift", width=120, value="", on_change=on_choice_filter("shift"),
+                                   options=[ft.dropdown.Option("", "ทั้งหมด"), *[ft.dropdown.Option(x) for x in "ABCD"]])
+        status_filter = ft.Dropdown(label="Status", width=170, value="all", on_change=on_status_filter, options=[
+            ft.dropdown.Option("all", "ทั้งหมด"),
+            ft.dropdown.Option("active", "กำลังดำเนินการ"),
+            ft.dropdown.Option("completed", "เสร็จสิ้น"),
+        ])
+        date_from = ft.TextField(label="ตั้งแต่วันที่", hint_text="YYYY-MM-DD", width=160, on_submit=on_date_filter, on_blur=on_date_filter)
+        date_to = ft.TextField(label="ถึงวันที่", hint_text="YYYY-MM-DD", width=160, on_submit=on_date_filter, on_blur=on_date_filter)
+        search_box = ft.TextField(label="ค้นหา", hint_text="ทะเบียนรถ, Carrier, ลูกค้า, Order No.", width=320,
+                                  prefix_icon=ft.Icons.SEARCH, on_change=on_search)
         
-        def export_to_excel(e):
-            """Exports all data to an Excel file."""
+        export_progress = ft.ProgressBar(width=300, visible=False)
+        export_status = ft.Text("", size=12)
+
+        def export_rows() -> Iterator[list]:
+            """Yields active bays, then completed loads, one spreadsheet row at a time."""
+            for bay_num, record in gas_system.get_active_bays().items():
+                yield [bay_num, 'กำลังดำเนินการ', *record.row(EXPORT_FIELDS)]
+            for completed in gas_system.iter_completed():
+                yield [completed.bay_number, 'เสร็จสิ้น', *completed.row(EXPORT_FIELDS)]
+
+        @timed("export")
+        def run_export():
+            """Writes the report on a worker thread and hands it to the browser."""
+            total = len(gas_system.get_active_bays()) + gas_system.storage.count_completed()
+            if total == 0:
+                show_snackbar("ไม่มีข้อมูลให้ส่งออก", ft.Colors.RED)
+                return
+
+            def on_progress(count: int):
+                export_progress.value = count / total
+                export_status.value = f"กำลังส่งออก {count:,}/{total:,} รายการ"
+                page.update(export_progress, export_status)
+
+            export_btn.disabled = True
+            export_progress.value = 0
+            export_progress.visible = True
+            on_progress(0)
+            page.update(export_btn)
             try:
-                all_data = []
-                
-                for bay_num, bay_data in gas_system.data["bays"].items():
-                    if bay_data:
-                        record = bay_data.copy()
-                        record['bay_number'] = bay_num
-                        record['status'] = 'กำลังดำเนินการ'
-                        all_data.append(record)
-                
-                for completed in gas_system.data["completed"]:
-                    record = completed.copy()
-                    record['status'] = 'เสร็จสิ้น'
-                    all_data.append(record)
-                
-                if all_data:
-                    # In a deployed environment, you can't save to a local file.
-                    # Instead, you would use a web-based approach.
-                    show_snackbar("ฟังก์ชันส่งออก Excel ไม่สามารถใช้งานได้บนเว็บไซต์", ft.Colors.RED)
-                else:
-                    show_snackbar("ไม่มีข้อมูลให้ส่งออก", ft.Colors.RED)
+                prune_exports()
+                filename = new_export_filename()
+                columns = ['bay_number', 'status', *EXPORT_FIELDS]
+                count = write_report(os.path.join(EXPORT_DIR, filename), export_rows(), columns, on_progress)
+                export_status.value = f"ส่งออก {count:,} รายการ: {filename}"
+                if page.web:
+                    page.launch_url(f"/exports/{filename}")
+                show_snackbar(f"ส่งออกข้อมูลเป็น {filename} สำเร็จ", ft.Colors.GREEN)
             except Exception as ex:
+                export_status.value = ""
                 show_snackbar(f"เกิดข้อผิดพลาด: {str(ex)}", ft.Colors.RED)
+            finally:
+                export_btn.disabled = False
+                export_progress.visible = False
+                page.update(export_btn, export_progress, export_status)
+
+        def export_to_excel(e):
+            """Exports all data to an Excel file without blocking the UI."""
+            page.run_thread(run_export)
         
-        refresh_btn = ft.IconButton(icon=ft.Icons.REFRESH, on_click=refresh_data, tooltip="รีเฟรชข้อมูล")
         export_btn = ft.ElevatedButton("ส่งออก Excel", on_click=export_to_excel, icon=ft.Icons.FILE_DOWNLOAD)
         
-        # Summary cards for all 4 bays
-        def create_bay_summary_card(bay_num: str):
-            bay_data = gas_system.get_bay_data(bay_num)
-            is_active = bool(bay_data)
-            
-            return ft.Card(
-                content=ft.Container(
-                    content=ft.Column([
-                        ft.Text(f"Bay {bay_num}", size=16, weight=ft.FontWeight.BOLD),
-                        ft.Text(f"Status: {'กำลังดำเนินการ' if is_active else 'ว่าง'}", color=ft.Colors.ORANGE if is_active else ft.Colors.GREEN),
-                        ft.Text(f"Carrier: {bay_data.get('carrier_name', '-')}" if is_active else "Carrier: -"),
-                        ft.Text(f"Order: {bay_data.get('order_no', '-')}" if is_active else "Order: -"),
-                    ]),
-                    padding=10
-                ),
-                width=250,
-                height=150
-            )
-        
-        bay_summaries = ft.Row([
-            create_bay_summary_card("1"), create_bay_summary_card("2"),
-            create_bay_summary_card("3"), create_bay_summary_card("4"),
-        ], wrap=True)
+        # Summary cards for every bay, kept up to date by store changes. The
+        # grid is virtualized: the client only builds the cards in view.
+        bay_cards = {bay_num: BaySummaryCard(site.bay_label(bay_num)) for bay_num in site.bays}
+        for bay_num, card in bay_cards.items():
+            card.show(gas_system.get_bay_record(bay_num))
+        card_rows = min(2, -(-len(bay_cards) // 4))
+        bay_summaries = ft.GridView(list(bay_cards.values()), max_extent=260, child_aspect_ratio=250 / 150,
+                                    spacing=10, run_spacing=10, height=card_rows * 160)
         
+        # -------------------- Production summary --------------------
+        # Truck count and load_qty over the review's dates (today by default),
+        # bay and shift, from the store's running totals
+        summary_groups = {"shift": "Shift", "bay_number": "Bay", "customer_name": "Customer", "day": "วันที่"}
+        summary_title = ft.Text("", size=16, weight=ft.FontWeight.BOLD)
+        summary_by = ft.Dropdown(label="สรุปตาม", width=150, value="shift", on_change=lambda e: refresh_summary(),
+                                 options=[ft.dropdown.Option(key, label) for key, label in summary_groups.items()])
+        summary_table = ft.DataTable(columns=[
+            ft.DataColumn(ft.Text("Shift")),
+            ft.DataColumn(ft.Text("รถ (คัน)"), numeric=True),
+            ft.DataColumn(ft.Text("Load Q'ty (kg)"), numeric=True),
+        ], rows=[])
+        summary_lock = threading.Lock()
+        summary_shown = []
+
+        def summary_days():
+            """The review's date filter as a range of days, or today."""
+            start, end = query["filters"].get("start"), query["filters"].get("end")
+            if start is None and end is None:
+                today = datetime.now().date()
+                return today, today
+            return start and start.date(), end and (end - timedelta(days=1)).date()
+
+        def summary_label(by: str, value: str) -> str:
+            if not value:
+                return "-"
+            return site.bay_label(value) if by == "bay_number" else value
+
+        @timed("refresh_summary")
+        def refresh_summary():
+            """Shows the totals for the current filters; sends nothing if they did not change."""
+            by = summary_by.value or "shift"
+            start, end = summary_days()
+            filters = query["filters"]
+            with summary_lock:
+                totals = gas_system.rollup((by,), start, end, shift=filters.get("shift"),
+                                           bay_number=filters.get("bay_number"))
+                rows = [(summary_label(by, row[by]), row["loads"], row["load_qty"]) for row in totals]
+                rows.append(("รวม", sum(row[1] for row in rows), sum(row[2] for row in rows)))
+                if start == end:
+                    title = "ยอดโหลดวันนี้" if start == datetime.now().date() else f"ยอดโหลดวันที่ {start}"
+                else:
+                    title = f"ยอดโหลด {start or 'เริ่มต้น'} ถึง {end or 'ปัจจุบัน'}"
+                if (by, rows, title) == tuple(summary_shown):
+                    return
+                summary_shown[:] = by, rows, title
+                summary_title.value = title
+                summary_table.columns[0].label.value = summary_groups[by]
+                # Rows are reused, so a completion only sends the numbers that changed
+                del summary_table.rows[len(rows):]
+                while len(summary_table.rows) < len(rows):
+                    summary_table.rows.append(ft.DataRow(cells=[ft.DataCell(ft.Text()) for _ in range(3)]))
+                for i, (row, values) in enumerate(zip(summary_table.rows, rows)):
+                    for cell, value in zip(row.cells, (values[0], f"{values[1]:,}", f"{values[2]:,.0f}")):
+                        cell.content.value = value
+                    row.cells[0].content.weight = ft.FontWeight.BOLD if i == len(rows) - 1 else None
+                if summary_table.page:
+                    page.update(summary_title, summary_table)
+
+        def on_store_change(change: dict):
+            """Pushes a bay change from any session into this session's cards and table."""
+            bay_num = change["bay_number"]
+            record = gas_system.get_bay_record(bay_num)
+            changed = bay_cards[bay_num].show(record) if bay_num in bay_cards else []
+            fields = change.get("fields", {})
+            # A shift or admin order time edit, or while searching an edit to an indexed field, can move the
+            # bay in or out of the table
+            stays = ('shift' not in fields and 'admin_saved_time' not in fields
+                     and not (query["search"] and not INDEXED_FIELDS.isdisjoint(fields)))
+            if change["type"] == "bay" and bay_num in active_rows and stays:
+                # The bay's row is on screen and stays there; patch its cells in place
+                changed += active_rows[bay_num].show(
+                    bay_num, record, "กำลังดำเนินการ", ft.Colors.ORANGE, 'admin_saved_time')
+            elif change["type"] == "completed" or not stays or table_fields.intersection(fields):
+                refresh_data()
+            if change["type"] == "completed":
+                refresh_summary()
+            if changed:
+                page.update(*changed)
+
+        store_change_handlers.append(on_store_change)
         refresh_data()
+        refresh_summary()
+        # Build the search index while the user looks at the table
+        page.run_thread(gas_system.search_index.warm)
         
         return ft.Container(
             content=ft.Column([
                 ft.Text("ตรวจสอบข้อมูล", size=20, weight=ft.FontWeight.BOLD),
-                ft.Row([refresh_btn, export_btn]),
-                ft.Text("สรุปสถานะ 4 Bay", size=16, weight=ft.FontWeight.BOLD),
+                ft.Row([export_btn, export_progress, export_status]),
+                ft.Text(f"สรุปสถานะ {len(site.bays)} Bay", size=16, weight=ft.FontWeight.BOLD),
                 bay_summaries,
+                ft.Row([summary_title, summary_by], vertical_alignment=ft.CrossAxisAlignment.CENTER),
+                summary_table,
                 ft.Divider(),
                 ft.Text("ข้อมูลทั้งหมด", size=16, weight=ft.FontWeight.BOLD),
-                ft.Container(content=data_table, border=ft.border.all(1, ft.Colors.GREY_400), border_radius=10, padding=10)
+                ft.Row([search_box, bay_filter, shift_filter, status_filter, date_from, date_to], wrap=True),
+                ft.Container(content=data_table, border=ft.border.all(1, ft.Colors.GREY_400), border_radius=10, padding=10),
+                ft.Row([prev_btn, page_label, next_btn])
+            ], scroll=ft.ScrollMode.AUTO),
+            padding=20
+        )
+    
+    # -------------------- Tab 4: Dashboard --------------------
+    def create_dashboard_tab():
+        group_labels = {"bay_number": "Bay", "shift": "Shift", "truck_type": "Truck type"}
+
+        def minutes(seconds) -> str:
+            return "-" if seconds != seconds else f"{seconds / 60:.1f}"
+
+        def cells(*values) -> List[ft.DataCell]:
+            return [ft.DataCell(ft.Text(str(value))) for value in values]
+
+        def header(*labels) -> List[ft.DataColumn]:
+            return [ft.DataColumn(ft.Text(label)) for label in labels]
+
+        group_table = ft.DataTable(columns=header("", "Loads", "Turnaround p50 (min)", "p90", "p99"), rows=[])
+        step_table = ft.DataTable(columns=header("Step", "Loads", "p50 (min)", "p90", "p99"), rows=[])
+        outlier_table = ft.DataTable(columns=header("Record", "Bay", "Step", "Took (min)", "Usual (min)"), rows=[])
+        dashboard_status = ft.Text("", size=12)
+        group_by = ft.Dropdown(label="แยกตาม", width=170, value="bay_number",
+                               options=[ft.dropdown.Option(key, label) for key, label in group_labels.items()],
+                               on_change=lambda e: refresh_dashboard(e))
+
+        def compute():
+            """Runs on a worker thread; pandas is only imported once the dashboard is used."""
+            import analytics
+
+            refresh_btn.disabled = True
+            dashboard_status.value = "กำลังคำนวณ..."
+            if group_table.page:
+                page.update(refresh_btn, dashboard_status)
+            try:
+                frame = analytics.build_frame(gas_system.iter_completed_values(analytics.COLUMNS))
+                by = group_by.value
+                group_table.columns[0] = ft.DataColumn(ft.Text(group_labels[by]))
+                group_table.rows = [
+                    ft.DataRow(cells=cells(group or "-", int(row.loads), minutes(row.turnaround_p50),
+                                           minutes(row.turnaround_p90), minutes(row.turnaround_p99)))
+                    for group, row in analytics.summarize(frame, by).iterrows()
+                ]
+                step_table.rows = [
+                    ft.DataRow(cells=cells(step.replace("_", " "), int(row.loads), minutes(row.p50),
+                                           minutes(row.p90), minutes(row.p99)))
+                    for step, row in analytics.step_quantiles(frame).iterrows()
+                ]
+                outlier_table.rows = [
+                    ft.DataRow(cells=cells(row.id, row.bay_number, row.step.replace("_", " "),
+                                           minutes(row.seconds), minutes(row.usual)))
+                    for row in analytics.find_outliers(frame).itertuples()
+                ]
+                dashboard_status.value = f"{len(frame):,} รายการ, คำนวณเมื่อ {datetime.now().strftime('%H:%M:%S')}"
+            except Exception as ex:
+                dashboard_status.value = ""
+                show_snackbar(f"เกิดข้อผิดพลาด: {str(ex)}", ft.Colors.RED)
+            finally:
+                refresh_btn.disabled = False
+                if group_table.page:
+                    page.update(group_table, step_table, outlier_table, refresh_btn, dashboard_status)
+
+        def refresh_dashboard(e=None):
+            page.run_thread(compute)
+
+        refresh_btn = ft.ElevatedButton("คำนวณใหม่", on_click=refresh_dashboard, icon=ft.Icons.REFRESH)
+
+        def section(title: str, table: ft.DataTable) -> List[ft.Control]:
+            return [
+                ft.Text(title, size=16, weight=ft.FontWeight.BOLD),
+                ft.Container(content=table, border=ft.border.all(1, ft.Colors.GREY_400), border_radius=10, padding=10),
+            ]
+
+        refresh_dashboard()
+
+        return ft.Container(
+            content=ft.Column([
+                ft.Text("สถิติเวลาโหลด", size=20, weight=ft.FontWeight.BOLD),
+                ft.Row([group_by, refresh_btn, dashboard_status]),
+                *section("เวลาที่รถอยู่ในลานโหลด", group_table),
+                *section("เวลาแต่ละขั้นตอน", step_table),
+                *section("ขั้นตอนที่ใช้เวลานานผิดปกติ", outlier_table),
             ], scroll=ft.ScrollMode.AUTO),
             padding=20
         )
     
+    # -------------------- Live updates from the shared store --------------------
+    store_change_handlers: List[Callable[[dict], None]] = []
+
+    def apply_change_to_form(change: dict):
+        """Shows another session's edits on the bay this session is looking at."""
+        if change["origin"] == session_id or change["bay_number"] != current_bay:
+            return
+        if change["type"] == "completed":
+            load_bay_data_to_form()
+            return
+        changed = []
+        # A field with an unsaved edit keeps the edit and the version it was based on,
+        # so saving it reports the conflict; until then it is marked
+        pending = autosave.pending(current_bay)
+        for key in pending.intersection(change["fields"], INPUT_KEYS):
+            field = admin_fields.get(key) or loading_fields.get(key)
+            if field is not None and field.error_text != "ผู้ใช้อื่นแก้ไขแล้ว":
+                field.error_text = "ผู้ใช้อื่นแก้ไขแล้ว"
+                changed.append(field)
+        # Changes can arrive out of order; a field only takes a value newer than the one shown
+        newer = mark_seen(current_bay, [key for key in change["fields"] if key not in pending], change["version"])
+        for key in newer:
+            value = change["fields"][key]
+            field = admin_fields.get(key) or loading_fields.get(key)
+            if field is not None and field.value != value:
+                field.value = value
+                changed.append(field)
+        changed = [control for control in changed if control.page]
+        if changed:
+            page.update(*changed)
+
+    store_change_handlers.append(apply_change_to_form)
+
+    def apply_store_change(change: dict):
+        for handler in store_change_handlers:
+            handler(change)
+
+    # While the browser is away: the feed number it had seen all changes up
+    # to. Later changes are not applied one by one but caught up on reconnect.
+    offline_since: Optional[int] = None
+
+    def on_store_change(change: dict):
+        # Called on the writer's thread; hand the UI work to this session's executor
+        if offline_since is None or change["seq"] <= offline_since:
+            page.run_thread(apply_store_change, change)
+
+    def on_disconnect(e):
+        nonlocal offline_since
+        # Don't lose the last few keystrokes when the browser tab goes away
+        autosave.flush()
+        offline_since = gas_system.feed.seq
+
+    @timed("catch_up")
+    def catch_up(e):
+        """Applies what changed while the browser was away, one merged change per bay."""
+        nonlocal offline_since
+        since, offline_since = offline_since, None
+        if since is None:
+            return
+        changes = gas_system.changes_since(since, gas_system.feed.id).changes
+        # Only a bay's last completion matters here: each one reloads the bay and the tables
+        last_completed = {change["bay_number"]: change for change in changes if change["type"] == "completed"}
+        for change in changes:
+            if change["type"] != "completed" or last_completed[change["bay_number"]] is change:
+                apply_store_change(change)
+
     # -------------------- Main UI Layout --------------------
+    # Only the first tab is built before the first paint; the others are
+    # built the first time they are opened.
+    tab_builders = [create_admin_tab, create_loading_tab, create_review_tab, create_dashboard_tab]
+    tab_build_lock = threading.Lock()
+
+    def ensure_tab(index: int) -> bool:
+        """Builds a tab's content if needed; returns True if it was just built."""
+        with tab_build_lock:
+            tab = tabs.tabs[index]
+            if tab.content is not None:
+                return False
+            tab.content = tab_builders[index]()
+            if index == 1:
+                bay_data, version = gas_system.get_bay_data_and_version(current_bay)
+                fill_loading_fields(bay_data)
+                mark_seen(current_bay, loading_fields, version)
+            return True
+
+    def on_tab_changed(e):
+        if ensure_tab(tabs.selected_index):
+            tabs.update()
+
     tabs = ft.Tabs(
         selected_index=0,
         animation_duration=300,
         tabs=[
             ft.Tab(text="Admin check order", icon=ft.Icons.ADMIN_PANEL_SETTINGS, content=create_admin_tab()),
-            ft.Tab(text="Loading", icon=ft.Icons.LOCAL_SHIPPING, content=create_loading_tab()),
-            ft.Tab(text="ตรวจสอบข้อมูล", icon=ft.Icons.TABLE_CHART, content=create_review_tab()),
+            ft.Tab(text="Loading", icon=ft.Icons.LOCAL_SHIPPING),
+            ft.Tab(text="ตรวจสอบข้อมูล", icon=ft.Icons.TABLE_CHART),
+            ft.Tab(text="สถิติ", icon=ft.Icons.INSIGHTS),
         ],
+        on_change=on_tab_changed,
         expand=1
     )
     
@@ -399,6 +1246,7 @@ def main(page: ft.Page):
                 ft.Icon(ft.Icons.LOCAL_GAS_STATION, size=40, color=ft.Colors.BLUE),
                 ft.Text("ระบบจัดการลานโหลดก๊าซธรรมชาติ", size=24, weight=ft.FontWeight.BOLD),
                 ft.Container(expand=True),
+                site_selector,
                 bay_selector,
                 bay_status
             ]),
@@ -408,6 +1256,18 @@ def main(page: ft.Page):
     )
     
     load_bay_data_to_form()
+    gas_system.subscribe(on_store_change)
+
+    # Flet keeps the session for a while after the connection drops; on
+    # reconnect only what changed in the meantime is applied
+    page.on_disconnect = on_disconnect
+    page.on_connect = catch_up
+
+    def on_close(e):
+        gas_system.unsubscribe(on_store_change)
+        notifier.close()
+
+    page.on_close = on_close
 
 # -------------------- Run the application --------------------
 if __name__ == "__main__":
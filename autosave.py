@@ -0,0 +1,70 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Set
+
+# Quiet period (seconds) after the last keystroke before pending fields are saved.
+AUTOSAVE_DELAY = float(os.environ.get("AUTOSAVE_DELAY", "0.5"))
+
+
+class Autosaver:
+    """Collects changed form fields and saves them in one batch after a quiet period.
+
+    ``save`` receives the bay, the changed values and, for each field, the
+    base given with the first edit of the batch: what the value was based
+    on when the operator started typing, not when the batch is saved.
+    """
+    def __init__(self, save: Callable[[str, dict, dict], None], delay: float = AUTOSAVE_DELAY):
+        self._save = save
+        self._delay = delay
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # keeps batches in the order they were taken
+        self._bay: Optional[str] = None
+        self._pending: Dict[str, object] = {}
+        self._bases: Dict[str, object] = {}
+        self._due = 0.0
+        self._timer: Optional[threading.Timer] = None
+
+    def mark(self, bay_number: str, key: str, value, base=None):
+        """Records a changed field; the save happens once the typing burst is over."""
+        if self._bay is not None and bay_number != self._bay:
+            self.flush()
+        with self._lock:
+            self._bay = bay_number
+            self._pending[key] = value
+            self._bases.setdefault(key, base)
+            self._due = time.monotonic() + self._delay
+            if self._timer is None:
+                self._start_timer(self._delay)
+
+    def pending(self, bay_number: str) -> Set[str]:
+        """The fields of ``bay_number`` edited but not saved yet."""
+        with self._lock:
+            return set(self._pending) if bay_number == self._bay else set()
+
+    def flush(self):
+        """Saves all pending fields right away."""
+        with self._save_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                bay_number, changes, bases = self._bay, self._pending, self._bases
+                self._bay, self._pending, self._bases = None, {}, {}
+            if changes:
+                self._save(bay_number, changes, bases)
+
+    def _start_timer(self, delay: float):
+        self._timer = threading.Timer(delay, self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            remaining = self._due - time.monotonic()
+            if remaining > 0:
+                # More keystrokes arrived while waiting; push the save back.
+                self._start_timer(remaining)
+                return
+            self._timer = None
+        self.flush()
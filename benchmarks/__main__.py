@@ -0,0 +1,99 @@
+"""Runs the benchmark suite and compares it with the recorded baselines.
+
+Run from the repository root:
+
+    python -m benchmarks             # compare with benchmarks/baselines.json
+    python -m benchmarks --record    # measure and overwrite the baselines
+    python -m benchmarks --quick     # history up to 10k loads only
+
+A metric regresses when it is worse than its baseline by more than the
+tolerance for its kind in TOLERANCES (timings are noisier than byte
+counts). Exits with status 1 on any regression. Everything runs offline.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+from datetime import datetime
+from typing import Dict
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+# Allowed slowdown relative to the baseline, by metric kind
+TOLERANCES = {"bytes": 0.10, "time": 0.50}
+# Timings this small (µs / ms) are dominated by noise; they must exceed the floor to regress
+TIME_FLOOR = {"us": 20.0, "ms": 2.0}
+
+
+def collect(quick: bool) -> Dict[str, float]:
+    from benchmarks import (bench_analytics, bench_import, bench_ingest, bench_reports, bench_search,
+                            bench_sessions, bench_startup, bench_store)
+
+    results = {}
+    results.update(bench_store.collect(bench_store.DEFAULT_SIZES[:3] if quick else bench_store.DEFAULT_SIZES))
+    results.update(bench_sessions.collect())
+    results.update(bench_ingest.collect())
+    results.update(bench_import.collect(bench_import.SUITE_LOADS, bench_import.SUITE_REPORTS))
+    results.update(bench_search.collect(bench_search.DEFAULT_SIZES[:2] if quick else bench_search.DEFAULT_SIZES))
+    results.update(bench_reports.collect(bench_reports.DEFAULT_SIZES[:1] if quick else bench_reports.DEFAULT_SIZES))
+    startup = {**bench_startup.measure_cold_import(3), **bench_startup.measure_first_paint(5)}
+    results.update({f"startup.{name}": value for name, value in startup.items() if name in bench_startup.BUDGETS})
+    history = bench_analytics.fake_history(bench_analytics.LOADS_PER_YEAR)
+    with tempfile.TemporaryDirectory() as workdir:
+        for backend, name in (("memory", "analytics.dashboard_ms@year"), ("sqlite", "analytics.sqlite.dashboard_ms@year")):
+            storage = bench_analytics.open_history(history, backend, workdir)
+            results[name] = min(bench_analytics.run_dashboard(storage) for _ in range(3))
+            storage.close()
+    return results
+
+
+def metric_kind(name: str) -> str:
+    return "bytes" if "bytes" in name else "time"
+
+
+def regressed(name: str, value: float, baseline: float) -> bool:
+    kind = metric_kind(name)
+    if kind == "time":
+        unit = "ms" if "_ms" in name else "us"
+        if value < TIME_FLOOR[unit]:
+            return False
+    return value > baseline * (1 + TOLERANCES[kind]) + 1e-9
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--record", action="store_true", help="save the results as the new baselines")
+    parser.add_argument("--quick", action="store_true", help="skip the 100k-load history size")
+    args = parser.parse_args()
+
+    results = collect(args.quick)
+    if args.record:
+        with open(BASELINES, "w", encoding="utf-8") as f:
+            json.dump({
+                "recorded": datetime.now().isoformat(timespec="seconds"),
+                "machine": f"{platform.system()} {platform.machine()}, Python {platform.python_version()}",
+                "metrics": {name: round(value, 1) for name, value in sorted(results.items())},
+            }, f, indent=2)
+            f.write("\n")
+        print(f"Recorded {len(results)} baselines in {BASELINES}")
+        return 0
+
+    with open(BASELINES, "r", encoding="utf-8") as f:
+        baselines = json.load(f)["metrics"]
+    failed = False
+    for name, value in sorted(results.items()):
+        baseline = baselines.get(name)
+        if baseline is None:
+            print(f"{name:50} {value:>12.1f}  (no baseline)")
+            continue
+        over = regressed(name, value, baseline)
+        failed |= over
+        change = (value - baseline) / baseline * 100 if baseline else 0.0
+        print(f"{name:50} {value:>12.1f}  baseline {baseline:>10.1f} {change:+7.1f}%{'  REGRESSION' if over else ''}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""Analytics benchmark: a year of completed loads through the dashboard computations.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_analytics
+    python -m benchmarks.bench_analytics --storage sqlite
+
+The dashboard reads the history from the storage the way the app does.
+Exits with status 1 if the full dashboard computation is over BUDGET_MS.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from analytics import COLUMNS, STEP_FIELDS, build_frame, find_outliers, step_quantiles, summarize
+from records import CHOICES, LoadingRecord
+
+BUDGET_MS = 1000
+# 4 bays, ~30 loads per bay per day
+LOADS_PER_YEAR = 4 * 30 * 365
+
+
+def fake_history(count: int, seed: int = 1) -> list:
+    """Completed loads with plausible step times and a few very slow purges."""
+    rng = random.Random(seed)
+    start = int(time.time()) - 365 * 24 * 3600
+    records = []
+    for i in range(count):
+        record = LoadingRecord()
+        record.id = i + 1
+        record.bay_number = str(i % 4 + 1)
+        record.shift = rng.choice(CHOICES["shift"])
+        record.truck_type = rng.choice(CHOICES["truck_type"])
+        moment = start + i * 260
+        for field in STEP_FIELDS:
+            if rng.random() < 0.03:
+                continue  # an operator skipped the step
+            moment += rng.randint(30, 300)
+            if field == "purging_o2_timestamp" and rng.random() < 0.002:
+                moment += 3600
+            setattr(record, field, moment)
+        record.completed_time = moment
+        records.append(record)
+    return records
+
+
+def open_history(records: list, backend: str, workdir: str):
+    """A storage holding ``records`` as completed loads."""
+    from storage import MemoryStorage, SQLiteStorage
+
+    storage = SQLiteStorage(os.path.join(workdir, "analytics.db")) if backend == "sqlite" else MemoryStorage()
+    storage.import_completed(records)
+    return storage
+
+
+def run_dashboard(storage) -> float:
+    start = time.perf_counter()
+    frame = build_frame(storage.iter_completed_values(COLUMNS))
+    for by in ("bay_number", "shift", "truck_type"):
+        summarize(frame, by)
+    step_quantiles(frame)
+    find_outliers(frame)
+    return (time.perf_counter() - start) * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--loads", type=int, default=LOADS_PER_YEAR)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--storage", choices=("memory", "sqlite"), default="memory")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        storage = open_history(fake_history(args.loads), args.storage, workdir)
+        elapsed = statistics.median(run_dashboard(storage) for _ in range(args.runs))
+        storage.close()
+    over = elapsed > BUDGET_MS
+    print(f"{'dashboard_ms':20} {elapsed:>10.1f}  (budget {BUDGET_MS}, {args.loads:,} loads in {args.storage})"
+          f"{'  OVER BUDGET' if over else ''}")
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
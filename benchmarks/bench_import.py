@@ -0,0 +1,91 @@
+"""Importing historical exports: Excel reports and the JSON data file.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_import [--loads 43800] [--reports 12]
+
+Writes ``reports`` monthly Excel reports covering ``loads`` completed loads
+(each report also repeats the previous month, as overlapping exports do)
+and one gas_loading_data.json, then imports them into a fresh SQLite store:
+first the reports, then the JSON file, whose loads are all duplicates by
+then. Reports microseconds per row of each kind and the peak memory
+allocated while streaming the JSON file.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict
+
+from benchmarks.bench_analytics import fake_history
+
+# A year at 4 bays and ~30 loads per bay per day
+DEFAULT_LOADS = 4 * 30 * 365
+DEFAULT_REPORTS = 12
+# What the suite runs: the cost per row does not depend on the history size
+SUITE_LOADS = 5000
+SUITE_REPORTS = 4
+
+
+def collect(loads: int = DEFAULT_LOADS, reports: int = DEFAULT_REPORTS) -> Dict[str, float]:
+    from export import write_report
+    from importer import import_files
+    from records import FIELDS
+    from storage import SQLiteStorage
+
+    columns = [name for name, _ in FIELDS] + ["status"]
+    history = fake_history(loads)
+    for record in history:
+        record.order_no = f"ORD-{record.id}"
+    per_report = -(-loads // reports)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for month in range(reports):
+            rows = history[max(0, (month - 1) * per_report):(month + 1) * per_report]
+            path = os.path.join(tmp, f"gas_loading_report_{month:02}.xlsx")
+            write_report(path, (record.row(columns[:-1]) + ["เสร็จสิ้น"] for record in rows), columns)
+            paths.append(path)
+        data_file = os.path.join(tmp, "gas_loading_data.json")
+        with open(data_file, "w", encoding="utf-8") as f:
+            json.dump({"bays": {}, "completed": [record.to_json() for record in history]}, f, ensure_ascii=False)
+
+        storage = SQLiteStorage(os.path.join(tmp, "import.db"))
+        try:
+            start = time.perf_counter()
+            reported = import_files(storage, paths)
+            reports_s = time.perf_counter() - start
+            start = time.perf_counter()
+            repeated = import_files(storage, [data_file])
+            json_s = time.perf_counter() - start
+            # Measured on a second pass: tracemalloc slows everything it traces
+            tracemalloc.start()
+            import_files(storage, [data_file])
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        finally:
+            storage.close()
+    if reported["imported"] != loads or repeated["duplicates"] != loads:
+        raise RuntimeError(f"Import miscounted: {reported}, then {repeated}")
+    report_rows = reported["imported"] + reported["duplicates"]
+    return {
+        "import.report_us_per_row": reports_s * 1e6 / report_rows,
+        "import.json_duplicate_us_per_row": json_s * 1e6 / loads,
+        "import.json_peak_bytes": peak,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--loads", type=int, default=DEFAULT_LOADS)
+    parser.add_argument("--reports", type=int, default=DEFAULT_REPORTS)
+    args = parser.parse_args()
+    for name, value in collect(args.loads, args.reports).items():
+        print(f"{name:45} {value:>12.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
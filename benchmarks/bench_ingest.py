@@ -0,0 +1,84 @@
+"""Instrument readings posted to /ingest while operators work.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_ingest [--rate 500] [--seconds 3]
+
+The fake weighbridge posts readings for every bay at ``rate`` per second
+while the operator (on the Loading tab) keeps switching bays and the
+observer keeps the review tab open. Reports the time per ingest request
+and per reading, the operator's bay switch time under that load and the
+bytes pushed to both sessions per reading.
+"""
+import argparse
+import os
+import secrets
+import statistics
+import sys
+import threading
+import time
+from typing import Dict
+
+import flet as ft
+
+from benchmarks.bench_sessions import settle, start_sessions
+from benchmarks.fake_page import find, fire, walk
+from benchmarks.fake_weighbridge import WeighbridgeFeeder
+
+BATCH = 50
+
+
+def collect(rate: float = 500, seconds: float = 3.0) -> Dict[str, float]:
+    from fastapi.testclient import TestClient
+
+    os.environ.setdefault("INGEST_TOKEN", secrets.token_hex(8))
+    import app
+    import server
+
+    operator, operator_conn, observer, observer_conn = start_sessions()
+    tabs = find(operator, ft.Tabs)
+    tabs.selected_index = 1
+    fire(tabs)
+    bay_selector = next(c for c in walk(operator) if isinstance(c, ft.Dropdown) and c.label == "เลือก Bay")
+    bays = app.SITES[0].bays
+    for bay_number in bays:  # readings are only taken for loads in progress
+        app.gas_systems[app.SITES[0].id].save_bay_data(bay_number, {"carrier_name": f"Carrier {bay_number}"})
+    settle(operator_conn, observer_conn)
+
+    sent = operator_conn.bytes_sent, observer_conn.bytes_sent
+    feeder = WeighbridgeFeeder(bays, BATCH)
+    timings = []
+    feeding = threading.Thread(target=lambda: timings.extend(feeder.run(TestClient(server.app), rate, seconds, server.INGEST_TOKEN)))
+    feeding.start()
+    switches = []
+    while feeding.is_alive():
+        bay_selector.value = bays[len(switches) % len(bays)]
+        start = time.perf_counter()
+        fire(bay_selector)
+        switches.append((time.perf_counter() - start) * 1e6)
+        time.sleep(0.02)
+    feeding.join()
+    settle(operator_conn, observer_conn)
+
+    readings = len(timings) * BATCH
+    return {
+        "ingest.request_ms": statistics.median(timings),
+        "ingest.us_per_reading": statistics.median(timings) * 1000 / BATCH,
+        "ingest.operator_switch_us": statistics.median(switches),
+        "ingest.operator_bytes_per_reading": (operator_conn.bytes_sent - sent[0]) / readings,
+        "ingest.observer_bytes_per_reading": (observer_conn.bytes_sent - sent[1]) / readings,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=float, default=500, help="readings per second")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+    for name, value in collect(args.rate, args.seconds).items():
+        print(f"{name:45} {value:>12.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""Notification benchmark: session memory and overlay size over 10k field edits.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_notify
+
+Each edit goes through the form's on_change handler and posts a
+notification, the way the desktop app confirms every saved field. Exits
+with status 1 if the overlay grows or memory keeps growing after warm-up.
+"""
+import argparse
+import gc
+import sys
+import time
+import tracemalloc
+
+import flet as ft
+
+# Memory still allocated after the run, beyond what was held after warm-up
+BUDGET_GROWTH_BYTES = 64 * 1024
+WARMUP_EDITS = 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--edits", type=int, default=10_000)
+    args = parser.parse_args()
+
+    import app
+    from benchmarks.fake_page import find, fire, new_page
+    from notify import Notifier
+
+    app.gas_systems[app.SITES[0].id] = app.GasLoadingSystem(app.SITES[0])
+    page, conn = new_page("notify")
+    app.main(page)
+    notifier = Notifier(page, interval=0.001)
+    page.update()  # main() has already rendered; send the new snackbar
+    field = find(page, ft.TextField, label="Carrier Name")
+
+    def edit(count: int):
+        for i in range(count):
+            field.value = f"carrier {i}"
+            fire(field)
+            notifier.show("บันทึกข้อมูล carrier_name สำเร็จ")
+
+    tracemalloc.start()
+    edit(WARMUP_EDITS)
+    time.sleep(0.1)
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    sent_before = conn.bytes_sent
+    edit(args.edits - WARMUP_EDITS)
+    time.sleep(0.1)
+    gc.collect()
+    growth = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    overlay = len(page.overlay)
+    failed = growth > BUDGET_GROWTH_BYTES or overlay != 2
+    print(f"{'overlay_controls':20} {overlay:>10}  (app + benchmark notifier: 2)")
+    print(f"{'memory_growth_bytes':20} {growth:>10,}  (budget {BUDGET_GROWTH_BYTES:,})")
+    print(f"{'bytes_per_edit':20} {(conn.bytes_sent - sent_before) / (args.edits - WARMUP_EDITS):>10.1f}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
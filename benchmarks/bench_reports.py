@@ -0,0 +1,86 @@
+"""Scheduled shift and daily reports written while the server keeps running.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_reports [--sizes 1000 10000]
+
+Fills a SQLite store with ``size`` loads completed over one day, then
+writes that day's shift and daily reports through the scheduler's worker
+pool while a thread that stands in for the sessions sleeps 5 ms at a time.
+Reports the time to write them all and the longest that thread was held up
+beyond its sleep. Exits with status 1 if that is over BUDGET_MS at the
+largest size.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict
+
+from benchmarks.bench_analytics import fake_history
+
+BUDGET_MS = 20
+DEFAULT_SIZES = (1000, 10_000)
+TICK = 0.005
+
+
+def collect(sizes=DEFAULT_SIZES) -> Dict[str, float]:
+    import app
+    from reports import ReportScheduler, day_jobs
+    from sites import DEFAULT_SITES
+    from storage import SQLiteStorage
+
+    results = {}
+    day = datetime(2025, 9, 17)
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            storage = SQLiteStorage(os.path.join(workdir, f"bench_{size}.db"))
+            history = fake_history(size)
+            for i, record in enumerate(history):
+                record.id = None
+                record.completed_time = int((day + timedelta(seconds=i * 86400 // size)).timestamp())
+            storage.import_completed(history)
+            system = app.GasLoadingSystem(DEFAULT_SITES[0], storage)
+            scheduler = ReportScheduler({"main": system}, app.EXPORT_FIELDS, directory=os.path.join(workdir, "out"))
+            scheduler._executor().submit(int).result()  # the pool starts once per server, not per report
+
+            stop = threading.Event()
+            worst = [0.0]
+
+            def session():
+                while not stop.is_set():
+                    start = time.perf_counter()
+                    time.sleep(TICK)
+                    worst[0] = max(worst[0], time.perf_counter() - start - TICK)
+            ticker = threading.Thread(target=session)
+            ticker.start()
+            start = time.perf_counter()
+            scheduler.write(system, day_jobs("main", day.date(), scheduler.shifts), force=True)
+            results[f"reports.day_ms@{size}"] = (time.perf_counter() - start) * 1000
+            stop.set()
+            ticker.join()
+            results[f"reports.worst_lag_ms@{size}"] = worst[0] * 1000
+            scheduler.stop()
+            storage.close()
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    args = parser.parse_args()
+    results = collect(args.sizes)
+    for name, value in results.items():
+        print(f"{name:45} {value:>12.1f}")
+    worst = results[f"reports.worst_lag_ms@{max(args.sizes)}"]
+    if worst > BUDGET_MS:
+        print(f"Sessions were held up {worst:.1f} ms, over the {BUDGET_MS} ms budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
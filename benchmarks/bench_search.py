@@ -0,0 +1,110 @@
+"""Search-as-you-type over completed history.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_search [--sizes 1000 10000 100000]
+
+Fills a store with ``size`` completed loads (Thai and Latin carriers and
+customers, a few thousand trucks, a unique order number each), then
+measures building the search index, one save of an active bay with the
+next search applying it, and each query of QUERIES typed one character at
+a time (median and worst keystroke). Exits with status 1 if a keystroke at
+the largest size is over BUDGET_MS.
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+from benchmarks.bench_analytics import fake_history
+
+BUDGET_MS = 50
+DEFAULT_SIZES = (1000, 10_000, 100_000)
+CARRIERS = ["PTT", "Siam Gas", "SCG Logistics", "ขนส่งไทยรุ่งเรือง", "ไทยแก๊สขนส่ง", "บางกอกทรานสปอร์ต",
+            "Eastern LNG", "ชลบุรีขนส่ง", "Gulf Logistics", "ระยองปิโตรขนส่ง"]
+CUSTOMERS = [f"{prefix} {suffix}" for prefix in ("บริษัท", "Co.", "โรงงาน", "หจก.")
+             for suffix in ("สยามเซรามิก", "Thai Glass", "อุตสาหกรรมอาหาร", "Steel Works", "ปูนซีเมนต์ไทย",
+                            "Textile", "เคมีภัณฑ์", "Paper Mill", "ยางพาราไทย", "Auto Parts")]
+PROVINCE_LETTERS = "กขคงจฉชซฌญฎฏฐฒณดตถทธนบปผพฟภมยรลวศษสหฬอฮ"
+# Typed one character at a time: plate digits, a Thai plate, a carrier, a Thai customer, an order number
+QUERIES = ["70-12", "กข 12", "siam", "สยาม", "ORD-2025-0042"]
+
+
+def fake_plates(count: int, rng: random.Random) -> List[str]:
+    plates = []
+    for _ in range(count):
+        if rng.random() < 0.5:
+            plates.append(f"{rng.randint(60, 79)}-{rng.randint(1000, 9999)}")
+        else:
+            plates.append(f"{rng.choice(PROVINCE_LETTERS)}{rng.choice(PROVINCE_LETTERS)} {rng.randint(1000, 9999)}")
+    return plates
+
+
+def fake_loads(count: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    fronts = fake_plates(3000, rng)
+    rears = fake_plates(3000, rng)
+    records = fake_history(count, seed)
+    for record in records:
+        truck = rng.randrange(len(fronts))
+        record.license_front = fronts[truck]
+        record.license_rear = rears[truck]
+        record.carrier_name = CARRIERS[truck % len(CARRIERS)]
+        record.customer_name = rng.choice(CUSTOMERS)
+        record.order_no = f"ORD-2025-{record.id:06}"
+    return records
+
+
+def collect(sizes=DEFAULT_SIZES) -> Dict[str, float]:
+    import app
+    from sites import DEFAULT_SITES
+    from storage import MemoryStorage
+
+    results = {}
+    for size in sizes:
+        storage = MemoryStorage()
+        storage.import_completed(fake_loads(size))
+        system = app.GasLoadingSystem(DEFAULT_SITES[0], storage)
+
+        start = time.perf_counter()
+        system.search_index.warm()
+        results[f"search.build_ms@{size}"] = (time.perf_counter() - start) * 1000
+
+        bay_number = DEFAULT_SITES[0].bays[0]
+        timings = []
+        for i in range(50):
+            start = time.perf_counter()
+            system.save_bay_data(bay_number, {"license_front": f"70-{1000 + i}"})
+            system.search("70-10")
+            timings.append((time.perf_counter() - start) * 1000)
+        results[f"search.save_then_search_ms@{size}"] = statistics.median(timings)
+
+        keystrokes = []
+        for query in QUERIES:
+            for length in range(1, len(query) + 1):
+                start = time.perf_counter()
+                system.search(query[:length])
+                keystrokes.append((time.perf_counter() - start) * 1000)
+        results[f"search.keystroke_ms@{size}"] = statistics.median(keystrokes)
+        results[f"search.worst_keystroke_ms@{size}"] = max(keystrokes)
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    args = parser.parse_args()
+    results = collect(args.sizes)
+    for name, value in results.items():
+        print(f"{name:45} {value:>12.1f}")
+    worst = results[f"search.worst_keystroke_ms@{max(args.sizes)}"]
+    if worst > BUDGET_MS:
+        print(f"Slowest keystroke {worst:.1f} ms is over the {BUDGET_MS} ms budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""Headless operator workloads replayed against main(page).
+
+Run from the repository root:
+
+    python -m benchmarks.bench_sessions
+
+Two fake sessions share the store: an operator who works the form and an
+observer who keeps the review tab open. Each workload reports the
+operator's handler time and the bytes sent to both sessions per action:
+
+- typing_storm: keystrokes across the admin order fields
+- bay_switching: switching between bays that hold data
+- checklist: every Loading step (timestamps and readings), then completion
+- reconnect: the observer's connection drops while the bays keep changing;
+  reports the bytes sent to it from the drop through catching up, and the
+  time the catch-up takes
+"""
+import argparse
+import statistics
+import sys
+import time
+import types
+from typing import Dict, List, Tuple
+
+import flet as ft
+
+from benchmarks.fake_page import RecordingConnection, find, fire, new_page, walk
+
+TYPED_TEXT = {"carrier_name": "PTT Logistics", "order_no": "ORD-2025-000123", "customer_name": "Gulf Energy",
+              "load_qty": "18,500", "checker_name": "Somchai"}
+
+
+def settle(*conns: RecordingConnection, quiet: float = 0.05, timeout: float = 5.0):
+    """Waits until pushed updates stop arriving (they run on the sessions' executors)."""
+    deadline = time.monotonic() + timeout
+    last = None
+    while time.monotonic() < deadline:
+        sent = tuple(conn.bytes_sent for conn in conns)
+        if sent == last:
+            return
+        last = sent
+        time.sleep(quiet)
+
+
+def start_sessions() -> Tuple[ft.Page, RecordingConnection, ft.Page, RecordingConnection]:
+    import app
+
+    site = app.SITES[0]
+    app.gas_systems[site.id] = app.GasLoadingSystem(site)
+    operator, operator_conn = new_page("operator")
+    app.main(operator)
+    observer, observer_conn = new_page("observer")
+    app.main(observer)
+    tabs = find(observer, ft.Tabs)
+    tabs.selected_index = 2
+    fire(tabs)
+    settle(operator_conn, observer_conn)
+    return operator, operator_conn, observer, observer_conn
+
+
+def field(page: ft.Page, label: str) -> ft.Control:
+    return next(c for c in walk(page) if isinstance(c, (ft.TextField, ft.Dropdown)) and c.label == label)
+
+
+def run_workload(name: str, actions: List, operator_conn, observer_conn) -> Dict[str, float]:
+    """Runs each action, timing the operator's handler and counting bytes after everything settles."""
+    sent = operator_conn.bytes_sent, observer_conn.bytes_sent
+    timings = []
+    for action in actions:
+        start = time.perf_counter()
+        action()
+        timings.append((time.perf_counter() - start) * 1e6)
+    settle(operator_conn, observer_conn)
+    count = len(actions)
+    return {
+        f"sessions.{name}.handler_us": statistics.median(timings),
+        f"sessions.{name}.operator_bytes_per_action": (operator_conn.bytes_sent - sent[0]) / count,
+        f"sessions.{name}.observer_bytes_per_action": (observer_conn.bytes_sent - sent[1]) / count,
+    }
+
+
+def typing_storm(operator: ft.Page, bay_selector: ft.Dropdown, keystrokes: int) -> List:
+    labels = {"carrier_name": "Carrier Name", "order_no": "Order No.", "customer_name": "Customer name",
+              "load_qty": "Calculated/Load Q'ty (kg)", "checker_name": "ชื่อผู้ตรวจสอบ"}
+    fields = {key: field(operator, label) for key, label in labels.items()}
+    actions = []
+    while len(actions) < keystrokes:
+        for key, text in TYPED_TEXT.items():
+            for end in range(1, len(text) + 1):
+                actions.append(lambda f=fields[key], value=text[:end]: (setattr(f, "value", value), fire(f)))
+    actions = actions[:keystrokes]
+    # Switching bay at the end flushes the last autosave batch
+    actions.append(lambda: (setattr(bay_selector, "value", "2"), fire(bay_selector)))
+    return actions
+
+
+def bay_switching(bay_selector: ft.Dropdown, bays, switches: int) -> List:
+    return [lambda bay=bays[i % len(bays)]: (setattr(bay_selector, "value", bay), fire(bay_selector))
+            for i in range(1, switches + 1)]
+
+
+def checklist(operator: ft.Page) -> List:
+    """Every step of the Loading tab in order, then the completion button."""
+    loading = find(operator, ft.Tabs).tabs[1].content
+    actions = []
+    for control in walk(loading):
+        if isinstance(control, ft.ElevatedButton) and control.text == "OK":
+            actions.append(lambda c=control: fire(c, "on_click"))
+        elif isinstance(control, ft.TextField):
+            actions.append(lambda c=control: (setattr(c, "value", "12.5"), fire(c)))
+    actions.reverse()  # walk() returns controls bottom-up
+    complete_btn = next(c for c in walk(loading) if isinstance(c, ft.ElevatedButton) and c.text == "เสร็จสิ้นการโหลด")
+    actions.append(lambda: fire(complete_btn, "on_click"))
+    return actions
+
+
+def reconnect(observer: ft.Page, observer_conn: RecordingConnection, system, bays, changes: int) -> Dict[str, float]:
+    """``changes`` edits spread over the bays, with a completion every 100, while the observer is away."""
+    sent = observer_conn.bytes_sent
+    event = types.SimpleNamespace(control=observer, data="")
+    observer.on_disconnect(event)
+    for i in range(changes):
+        bay = bays[i % len(bays)]
+        system.save_bay_data(bay, {"carrier_name": f"Carrier {i}", "load_qty": str(18000 + i)})
+        if i % 100 == 99:
+            system.complete_loading(bay)
+    settle(observer_conn)
+    start = time.perf_counter()
+    observer.on_connect(event)
+    elapsed = (time.perf_counter() - start) * 1e6
+    settle(observer_conn)
+    return {
+        "sessions.reconnect.catch_up_us": elapsed,
+        "sessions.reconnect.observer_bytes": observer_conn.bytes_sent - sent,
+    }
+
+
+def collect(keystrokes: int = 2000, switches: int = 200, checklists: int = 20) -> Dict[str, float]:
+    import app
+
+    operator, operator_conn, observer, observer_conn = start_sessions()
+    bay_selector = next(c for c in walk(operator) if isinstance(c, ft.Dropdown) and c.label == "เลือก Bay")
+    bays = app.SITES[0].bays
+    results = {}
+    results.update(run_workload("typing_storm", typing_storm(operator, bay_selector, keystrokes),
+                                operator_conn, observer_conn))
+
+    system = app.gas_systems[app.SITES[0].id]
+    for bay in bays:
+        system.save_bay_data(bay, {"carrier_name": f"Carrier {bay}", "order_no": f"ORD-{bay}", "shift": "A"})
+    settle(operator_conn, observer_conn)
+    results.update(run_workload("bay_switching", bay_switching(bay_selector, bays, switches),
+                                operator_conn, observer_conn))
+
+    tabs = find(operator, ft.Tabs)
+    tabs.selected_index = 1
+    fire(tabs)
+    bay_selector.value = bays[0]
+    fire(bay_selector)
+    settle(operator_conn, observer_conn)
+    actions = []
+    for _ in range(checklists):
+        actions.extend(checklist(operator))
+    results.update(run_workload("checklist", actions, operator_conn, observer_conn))
+    results.update(reconnect(observer, observer_conn, system, bays, 500))
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keystrokes", type=int, default=2000)
+    parser.add_argument("--switches", type=int, default=200)
+    parser.add_argument("--checklists", type=int, default=20)
+    args = parser.parse_args()
+    for name, value in collect(args.keystrokes, args.switches, args.checklists).items():
+        print(f"{name:50} {value:>12.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""Startup benchmark: cold import time and session time-to-first-paint.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_startup
+
+Exits with status 1 if a measurement is over its budget in BUDGETS, so it
+can gate a deploy.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+# Upper limits; raise them deliberately, never to make a slow change pass
+BUDGETS = {
+    "import_app_ms": 1500,
+    "first_paint_ms": 50,
+    "first_paint_bytes": 10_000,
+}
+
+# Modules that must not be imported before the user asks for an export
+LAZY_MODULES = ("pandas", "numpy", "openpyxl")
+
+_IMPORT_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+"""
+
+
+def measure_cold_import(runs: int) -> dict:
+    """Imports app.py in a fresh interpreter ``runs`` times."""
+    timings, loaded = [], set()
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", _IMPORT_PROBE % (LAZY_MODULES,)],
+                                check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        timings.append(result["seconds"] * 1000)
+        loaded.update(result["loaded"])
+    return {"import_app_ms": statistics.median(timings), "eagerly_loaded": sorted(loaded)}
+
+
+def measure_first_paint(runs: int) -> dict:
+    """Runs main(page) against fake sessions; the first paint is everything main() sends."""
+    import app
+    from benchmarks.fake_page import new_page
+
+    timings, sizes = [], []
+    for run in range(runs):
+        page, conn = new_page(f"startup-{run}")
+        start = time.perf_counter()
+        app.main(page)
+        timings.append((time.perf_counter() - start) * 1000)
+        sizes.append(conn.bytes_sent)
+    return {"first_paint_ms": statistics.median(timings), "first_paint_bytes": statistics.median(sizes)}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    results = {**measure_cold_import(args.runs), **measure_first_paint(args.runs)}
+    failed = False
+    for name, budget in BUDGETS.items():
+        over = results[name] > budget
+        failed |= over
+        print(f"{name:20} {results[name]:>10.1f}  (budget {budget}){'  OVER BUDGET' if over else ''}")
+    if results["eagerly_loaded"]:
+        failed = True
+        print(f"imported at startup: {', '.join(results['eagerly_loaded'])}  SHOULD BE LAZY")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""Store micro-benchmarks as completed history grows from 0 to 100k loads.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_store [--sizes 0 1000 10000 100000]
+
+Measures, at each history size:
+
+- web app store (memory and SQLite backends): save_bay_data, complete_loading,
+  opening the store (startup), the first review page, the Excel export
+  (per row, over the first EXPORT_ROWS rows) and production rollups (one
+  day's shift-end totals per bay, and the whole history per customer);
+- desktop app store (snapshot + journal): save_bay_data, complete_loading
+  and load_data.
+
+Also measures the memory a completed load takes once read from the JSON
+layout, as the memory backend keeps it.
+
+History is grown once and measured at each size on the way up.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Dict, List
+
+from benchmarks.bench_analytics import fake_history
+
+DEFAULT_SIZES = (0, 1000, 10_000, 100_000)
+SAVE_REPEAT = 200
+COMPLETE_REPEAT = 50
+# openpyxl costs the same per row at any depth; a full 100k-row export takes minutes
+EXPORT_ROWS = 5000
+
+DESKTOP_APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "lng_truck_system", "lng_truck_system", "One fild truck.py", "gas_loading_system.py")
+
+# A filled-in admin order, saved before every completion
+ORDER = {"carrier_name": "PTT", "license_front": "70-1234", "license_rear": "70-5678", "truck_type": "Semi-Trailer",
+         "shift": "A", "order_no": "ORD-1", "customer_name": "Customer", "load_qty": "18500", "checker_name": "Checker"}
+
+
+def per_op_us(fn: Callable[[int], None], repeat: int) -> float:
+    """Median microseconds of fn(i) over ``repeat`` runs."""
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn(i)
+        timings.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(timings)
+
+
+def elapsed_ms(fn: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+# -------------------- Web app store --------------------
+def measure_web(backend: str, sizes: List[int], workdir: str) -> Dict[str, float]:
+    import app
+    from export import write_report
+    from storage import MemoryStorage, SQLiteStorage
+
+    db_path = os.path.join(workdir, "bench.db")
+    open_backend = (lambda: SQLiteStorage(db_path)) if backend == "sqlite" else MemoryStorage
+    storage = open_backend()
+    history = fake_history(max(sizes)) if sizes else []
+    # Customers and quantities for the rollups: about 40 customers, as at a busy terminal
+    for i, record in enumerate(history):
+        record.customer_name = f"Customer {i * 7 % 40}"
+        record.load_qty = 15000 + i * 37 % 5000
+    results, filled = {}, 0
+    for size in sizes:
+        for record in history[filled:size]:
+            record.id = None
+            storage.complete(record.bay_number, record)
+        filled = size
+        if backend == "sqlite":
+            storage.close()
+            results[f"web.{backend}.open_ms@{size}"] = elapsed_ms(lambda: app.GasLoadingSystem(storage=open_backend()))
+            storage = open_backend()
+        system = app.GasLoadingSystem(storage=storage)
+
+        results[f"web.{backend}.save_bay_data_us@{size}"] = per_op_us(
+            lambda i: system.save_bay_data("1", {"load_qty": str(18000 + i)}), SAVE_REPEAT)
+
+        def complete(i):
+            system.save_bay_data("2", ORDER)
+            start = time.perf_counter()
+            system.complete_loading("2")
+            return time.perf_counter() - start
+        results[f"web.{backend}.complete_loading_us@{size}"] = statistics.median(
+            complete(i) * 1e6 for i in range(COMPLETE_REPEAT))
+        results[f"web.{backend}.first_page_us@{size}"] = per_op_us(lambda i: system.page_completed(limit=25), 20)
+        today = datetime.now().date()
+        results[f"web.{backend}.rollup_shift_end_us@{size}"] = per_op_us(
+            lambda i: system.rollup(("bay_number",), today, today, shift="A"), 20)
+        results[f"web.{backend}.rollup_history_us@{size}"] = per_op_us(
+            lambda i: system.rollup(("customer_name",)), 20)
+
+        if size:
+            columns = ["bay_number", "status", *app.EXPORT_FIELDS]
+            rows = ([r.bay_number, "เสร็จสิ้น", *r.row(app.EXPORT_FIELDS)] for r in system.iter_completed())
+            path = os.path.join(workdir, "report.xlsx")
+            exported = []
+            milliseconds = elapsed_ms(lambda: exported.append(write_report(path, islice(rows, EXPORT_ROWS), columns)))
+            results[f"web.{backend}.export_us_per_row@{size}"] = milliseconds * 1000 / exported[0]
+    storage.close()
+    return results
+
+
+# -------------------- Records --------------------
+def measure_records(count: int = 10_000) -> Dict[str, float]:
+    """Bytes held per completed load built with LoadingRecord.from_json."""
+    from records import LoadingRecord
+
+    texts = []
+    for i, record in enumerate(fake_history(count)):
+        record.update(dict(ORDER, carrier_name=f"Carrier {i % 30}", customer_name=f"Customer {i * 7 % 40}",
+                           checker_name=f"Checker {i % 12}", order_no=f"ORD-{i}", license_front=f"70-{i % 9000:04}",
+                           load_qty=str(15000 + i * 37 % 5000)))
+        texts.append(json.dumps(record.to_json(), ensure_ascii=False))
+    tracemalloc.start()
+    try:
+        records = [LoadingRecord.from_json(json.loads(text)) for text in texts]
+        held = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return {"records.bytes_per_load": held / len(records)}
+
+
+# -------------------- Desktop app store --------------------
+def load_desktop_module():
+    """Imports the desktop app by path (its folder name is not a package name)."""
+    spec = importlib.util.spec_from_file_location("gas_loading_system", DESKTOP_APP)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def measure_desktop(sizes: List[int], workdir: str) -> Dict[str, float]:
+    desktop = load_desktop_module()
+    history = [record.to_json() for record in fake_history(max(sizes))] if sizes else []
+    results = {}
+    cwd = os.getcwd()
+    try:
+        for size in sizes:
+            run_dir = os.path.join(workdir, f"desktop-{size}")
+            os.makedirs(run_dir)
+            os.chdir(run_dir)
+            with open("gas_loading_data.json", "w", encoding="utf-8") as f:
+                json.dump({"bays": {}, "completed": history[:size]}, f, ensure_ascii=False)
+            desktop.GasLoadingSystem().close()  # first start moves old loads to the archive
+            results[f"desktop.load_data_ms@{size}"] = elapsed_ms(lambda: desktop.GasLoadingSystem().close())
+
+            system = desktop.GasLoadingSystem()
+            results[f"desktop.save_bay_data_us@{size}"] = per_op_us(
+                lambda i: system.save_bay_data("1", {"load_qty": str(18000 + i)}), SAVE_REPEAT)
+
+            def complete(i):
+                system.save_bay_data("2", ORDER)
+                start = time.perf_counter()
+                system.complete_loading("2")
+                return time.perf_counter() - start
+            results[f"desktop.complete_loading_us@{size}"] = statistics.median(
+                complete(i) * 1e6 for i in range(COMPLETE_REPEAT))
+            system.close()
+    finally:
+        os.chdir(cwd)
+    return results
+
+
+def collect(sizes: List[int] = DEFAULT_SIZES) -> Dict[str, float]:
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for backend in ("memory", "sqlite"):
+            backend_dir = os.path.join(workdir, backend)
+            os.makedirs(backend_dir)
+            results.update(measure_web(backend, list(sizes), backend_dir))
+        results.update(measure_desktop(list(sizes), workdir))
+    results.update(measure_records())
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    args = parser.parse_args()
+    for name, value in collect(args.sizes).items():
+        print(f"{name:45} {value:>12.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
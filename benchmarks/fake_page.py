@@ -0,0 +1,89 @@
+"""Headless stand-in for a Flet browser session.
+
+``new_page()`` returns a real ``ft.Page`` wired to a connection that applies
+commands the way the web server does but, instead of sending them over a
+websocket, counts the batches and the bytes that would have been sent.
+"""
+import asyncio
+import json
+import threading
+import types
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Type
+
+import flet as ft
+from flet.core.local_connection import LocalConnection
+from flet.core.protocol import ClientActions, ClientMessage, CommandEncoder, PageCommandsBatchResponsePayload
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+class RecordingConnection(LocalConnection):
+    """Connection that records what would be sent to the browser."""
+    def __init__(self):
+        super().__init__()
+        self.batches = 0
+        self.bytes_sent = 0
+
+    def send_command(self, session_id: str, command):
+        return self.send_commands(session_id, [command])
+
+    def send_commands(self, session_id: str, commands):
+        results, messages = [], []
+        for command in commands:
+            result, message = self._process_command(command)
+            if command.name in ("add", "get"):
+                results.append(result)
+            if message:
+                messages.append(message)
+        if messages:
+            payload = json.dumps(ClientMessage(ClientActions.PAGE_CONTROLS_BATCH, messages),
+                                 cls=CommandEncoder, separators=(",", ":"))
+            self.batches += 1
+            self.bytes_sent += len(payload.encode("utf-8"))
+        return PageCommandsBatchResponsePayload(results=results, error="")
+
+    def _process_get_command(self, values):
+        # No browser to ask; page details such as size stay unset
+        return "", None
+
+
+def _event_loop() -> asyncio.AbstractEventLoop:
+    """One background loop shared by all fake sessions, so page.run_thread works."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, daemon=True).start()
+        return _loop
+
+
+def new_page(session_id: str = "bench") -> Tuple[ft.Page, RecordingConnection]:
+    conn = RecordingConnection()
+    page = ft.Page(conn, session_id, _event_loop(), ThreadPoolExecutor(max_workers=4))
+    return page, conn
+
+
+def walk(control: ft.Control) -> List[ft.Control]:
+    """All controls under ``control``, including unselected tab contents."""
+    found, stack = [], [control]
+    while stack:
+        current = stack.pop()
+        found.append(current)
+        stack.extend(current._get_children())
+    return found
+
+
+def find(control: ft.Control, control_type: Type[ft.Control], **attrs) -> ft.Control:
+    """First control of ``control_type`` whose attributes match ``attrs``."""
+    for candidate in walk(control):
+        if isinstance(candidate, control_type) and all(getattr(candidate, k, None) == v for k, v in attrs.items()):
+            return candidate
+    raise LookupError(f"No {control_type.__name__} with {attrs}")
+
+
+def fire(control: ft.Control, handler: str = "on_change", **event_attrs):
+    """Calls one of the control's event handlers the way Flet would."""
+    event = types.SimpleNamespace(control=control, data=None, **event_attrs)
+    getattr(control, handler)(event)
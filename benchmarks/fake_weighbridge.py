@@ -0,0 +1,105 @@
+"""Fake weighbridge and DCS that post readings to the ingestion API.
+
+Run from the repository root against a running server:
+
+    python -m benchmarks.fake_weighbridge --url http://localhost:8000 --rate 500 --seconds 10 --token $INGEST_TOKEN
+
+Each bay loads a truck: tare, then cooldown and ramp-up flows, tank
+pressure and a rising load quantity, then the gross weight. Readings for
+all bays are sent together, ``batch`` at a time. The server only takes
+readings for bays with a load in progress, so start one on each bay first.
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Sequence
+
+TARGET_KG = 18_500
+
+
+def now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def bay_readings(bay_number: str, seed: int = 0) -> Iterator[Dict[str, object]]:
+    """Endless readings of one bay, one truck after another."""
+    rng = random.Random(f"{bay_number}-{seed}")
+    while True:
+        yield {"check_ground_tare_timestamp": now(), "connect_arms_kg": rng.randint(14_000, 16_000)}
+        for _ in range(20):
+            yield {"cooldown_flow_m3": round(rng.uniform(0.5, 3.0), 2),
+                   "release_pressure_barg": round(rng.uniform(1.5, 4.0), 2)}
+        loaded = 0
+        while loaded < TARGET_KG:
+            loaded = min(TARGET_KG, loaded + rng.randint(100, 400))
+            yield {"ramp_up_flow_m3": round(rng.uniform(20.0, 40.0), 1), "load_qty": loaded,
+                   "release_pressure_barg": round(rng.uniform(3.0, 6.0), 2)}
+        yield {"gross_weigh_truck_timestamp": now(), "tank_normal_kg": loaded}
+
+
+class WeighbridgeFeeder:
+    """Interleaves the readings of several bays into batches for POST /ingest."""
+    def __init__(self, bays: Sequence[str], batch: int = 50, site: str = None):
+        self.batch = batch
+        self.site = site
+        self._streams = [(bay_number, bay_readings(bay_number)) for bay_number in bays]
+        self._turn = 0
+
+    def next_batch(self) -> dict:
+        readings: List[dict] = []
+        while len(readings) < self.batch:
+            bay_number, stream = self._streams[self._turn % len(self._streams)]
+            self._turn += 1
+            readings.append({"bay_number": bay_number, "fields": next(stream)})
+        body = {"readings": readings}
+        if self.site:
+            body["site"] = self.site
+        return body
+
+    def run(self, client, rate: float, seconds: float, token: str = None) -> List[float]:
+        """Posts ``rate`` readings per second for ``seconds``; returns each request's milliseconds.
+
+        ``client`` is an httpx.Client (or FastAPI's TestClient).
+        """
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        interval = self.batch / rate
+        timings = []
+        next_send = time.monotonic()
+        deadline = next_send + seconds
+        while next_send < deadline:
+            body = self.next_batch()
+            start = time.perf_counter()
+            response = client.post("/ingest", json=body, headers=headers)
+            timings.append((time.perf_counter() - start) * 1000)
+            response.raise_for_status()
+            if response.json()["rejected"]:
+                raise RuntimeError(f"Readings rejected: {response.json()['rejected'][:3]}")
+            next_send += interval
+            time.sleep(max(0.0, next_send - time.monotonic()))
+        return timings
+
+
+def main() -> int:
+    import httpx
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--bays", nargs="+", default=["1", "2", "3", "4"])
+    parser.add_argument("--site", default=None)
+    parser.add_argument("--rate", type=float, default=500, help="readings per second")
+    parser.add_argument("--batch", type=int, default=50, help="readings per request")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--token", default=None, help="the server's INGEST_TOKEN")
+    args = parser.parse_args()
+    feeder = WeighbridgeFeeder(args.bays, args.batch, args.site)
+    with httpx.Client(base_url=args.url) as client:
+        timings = sorted(feeder.run(client, args.rate, args.seconds, args.token))
+    print(f"{len(timings)} requests, {len(timings) * args.batch} readings; "
+          f"median {timings[len(timings) // 2]:.1f} ms, max {timings[-1]:.1f} ms per request")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""Sequence-numbered feed of the changes made to one site's store.
+
+Every change to a bay or to the completed list takes the next number of the
+site's sequence. The latest CHANGE_FEED_SIZE changes stay in a ring buffer,
+so a client that lost its connection asks for the changes after the last
+number it saw instead of loading everything again. A client that was away
+for longer than the buffer covers is answered from the store instead (see
+GasLoadingSystem.changes_since).
+"""
+import os
+import secrets
+import threading
+from collections import deque
+from itertools import islice
+from typing import Deque, Dict, List, NamedTuple, Optional
+
+# Changes kept in memory per site for clients catching up
+CHANGE_FEED_SIZE = int(os.environ.get("CHANGE_FEED_SIZE", "1000"))
+
+
+class ChangeSet(NamedTuple):
+    feed: str            # id of the feed, new with every process; pass it back when asking again
+    seq: int             # the last sequence number included; ask for the changes after it next time
+    reset: bool          # True if the feed restarted: changes hold every bay's full state
+    changes: List[dict]  # compacted, in sequence order
+
+
+class ChangeFeed:
+    """The latest changes of one site in a ring buffer, numbered in order.
+
+    Numbers are handed out and changes kept under one lock, so the buffer is
+    always in sequence order without gaps, even though the changes are
+    published to listeners afterwards and may reach them out of order.
+    """
+    def __init__(self, size: int = CHANGE_FEED_SIZE):
+        # Numbers start over with the process; the id tells clients it happened
+        self.id = secrets.token_hex(8)
+        self.seq = 0
+        self._changes: Deque[dict] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def append(self, change: dict) -> int:
+        """Numbers ``change`` (as its "seq" and "version") and keeps it; returns the number.
+
+        Both keys are set before the change enters the buffer, where readers
+        on other threads may already see it.
+        """
+        with self._lock:
+            self.seq += 1
+            change["seq"] = change["version"] = self.seq
+            self._changes.append(change)
+            return self.seq
+
+    def since(self, seq: int) -> Optional[List[dict]]:
+        """The changes after ``seq`` in order, or None if some of them have left the buffer."""
+        with self._lock:
+            if seq >= self.seq:
+                return []
+            if not self._changes or self._changes[0]["seq"] > seq + 1:
+                return None
+            return list(islice(self._changes, seq + 1 - self._changes[0]["seq"], None))
+
+
+def compact(changes: List[dict]) -> List[dict]:
+    """Merges each bay's edits into one change holding the latest value of every field.
+
+    A completion ends the bay's load, so edits made before it are dropped
+    (the completed record has them) and it is kept with the edits after it.
+    Merged changes carry the number of their last edit; the changes passed in
+    are not modified.
+    """
+    compacted: List[dict] = []
+    open_edits: Dict[str, dict] = {}
+    for change in changes:
+        bay_number = change["bay_number"]
+        edits = open_edits.get(bay_number)
+        if change["type"] == "completed":
+            if edits is not None:
+                compacted.remove(edits)
+                del open_edits[bay_number]
+            compacted.append(change)
+        elif edits is None:
+            open_edits[bay_number] = dict(change, fields=dict(change["fields"]))
+            compacted.append(open_edits[bay_number])
+        else:
+            edits["fields"].update(change["fields"])
+            edits.update(seq=change["seq"], version=change["version"],
+                         origin=edits["origin"] if edits["origin"] == change["origin"] else None)
+    compacted.sort(key=lambda change: change["seq"])
+    return compacted
@@ -0,0 +1,145 @@
+"""The admin order and the Loading checklist, declared once.
+
+Record fields (records.FIELDS and CHOICES), the admin and Loading forms,
+the Excel columns and the analytics step columns are all generated from
+ADMIN_ROWS and STEPS. Adding, renaming or reordering a step happens here
+and nowhere else. The definitions are immutable and shared by every
+session; only the controls are built per session.
+"""
+from typing import NamedTuple, Optional, Tuple
+
+# Field kinds: how a value is stored
+TEXT = "text"
+NUMBER = "number"
+TIMESTAMP = "timestamp"
+
+
+class Field(NamedTuple):
+    """One value of a loading record and the control that edits it.
+
+    A TIMESTAMP field is an OK button that records the time; a field with
+    ``choices`` is a dropdown; anything else is a text field. ``caption``
+    is shown beside the control instead of as its label.
+    """
+    key: str
+    kind: str
+    label: str = ""
+    unit: str = ""
+    choices: Tuple[str, ...] = ()
+    width: int = 300
+    numeric_keyboard: Optional[bool] = None  # defaults to kind == NUMBER
+    caption: str = ""
+
+    @property
+    def title(self) -> str:
+        return f"{self.label} ({self.unit})" if self.unit else self.label
+
+    @property
+    def uses_numeric_keyboard(self) -> bool:
+        return self.kind == NUMBER if self.numeric_keyboard is None else self.numeric_keyboard
+
+
+class Step(NamedTuple):
+    """A Loading step: one field, or several shown in a row or a column."""
+    fields: Tuple[Field, ...]
+    layout: str = "row"
+
+
+def _stamp(name: str, label: str) -> Step:
+    return Step((Field(f"{name}_timestamp", TIMESTAMP, label),))
+
+
+def _value(key: str, label: str, unit: str = "", kind: str = NUMBER) -> Step:
+    return Step((Field(key, kind, label, unit),))
+
+
+# -------------------- Admin check order --------------------
+# One tuple per row of the admin tab
+ADMIN_ROWS: Tuple[Tuple[Field, ...], ...] = (
+    (Field("carrier_name", TEXT, "Carrier Name"),),
+    (Field("license_front", TEXT, "License (Front)", width=200, numeric_keyboard=True),
+     Field("license_rear", TEXT, "License (Rear)", width=200, numeric_keyboard=True)),
+    (Field("truck_type", TEXT, "Types of truck", choices=("Semi-Trailer", "10 wheel truck", "ISO Tank")),
+     Field("shift", TEXT, "Shift", choices=("A", "B", "C", "D"), width=150)),
+    (Field("order_no", TEXT, "Order No.", width=200, numeric_keyboard=True),
+     Field("customer_name", TEXT, "Customer name")),
+    (Field("load_qty", NUMBER, "Calculated/Load Q'ty (kg)", width=200),),
+    (Field("checker_name", TEXT, "ชื่อผู้ตรวจสอบ"),),
+)
+# Set by the app when the admin order is saved; no control of its own
+ADMIN_SAVED_TIME = Field("admin_saved_time", TIMESTAMP)
+
+# -------------------- Loading process --------------------
+STEPS: Tuple[Step, ...] = (
+    _stamp("truck_on_bay", "Check weight scale / Truck on bay time"),
+    _stamp("parking_stop", "Parking and stop engine"),
+    _stamp("safety_setup", "Put wheel chock, traffic cone, pole sign & connect ground (Geen Lamp)"),
+    _value("instruction_sheet_ton", "Create and check instruction sheet", "Ton"),
+    _stamp("check_ground_tare", "Check ground before tare weight (F1) & confirm Q'ty and status with DCS"),
+    _value("connect_arms_kg", "Connect liquid & vapor arms / Flexible hose Open bypass valve of truck", "Kg"),
+    _stamp("open_vent", "Open manual valve vent safe location at liquid line"),
+    _stamp("supply_n2", "Supply N2 & open valve vapor arm for leak test (3-5 Barg)"),
+    _stamp("purging_o2", "Open valve liquid arm/Flexible hose and purging and check O2 (< 1% by Vol.) "
+                         "-Close N2 supply valve and Close bypass valve of truck"),
+    _stamp("close_vent", "Close manual valve vent safe location at liquid line of bay"),
+    _value("release_pressure_barg", "Open SDV vapor of Bay for releasing tank pressure", "barg"),
+    _stamp("open_truck_valves", "Open vapor valve and liquid valve (Top/Bottom fill) of truck"),
+    Step((Field("cooldown_flow_m3", NUMBER, "Open SDV liquid and start cooldown (F3)", "m3/hr"),
+          Field("cooldown_status", TEXT, "Cooldown status", choices=("cool down", "Not cool down")))),
+    Step((Field("ramp_up_flow_m3", NUMBER, "Ramp up by FV open to full rate", "m3/hr"),
+          Field("technician_name", TEXT, caption="ผู้ตรวจสอบ (ช่างเข้า)")), layout="column"),
+    _stamp("ramp_down", "Ramp down by FV close and confirm Gross weight order"),
+    _stamp("close_truck_valves", "Close liquid & vapor valve of truck & open bypass valve of truck for draining"),
+    _stamp("n2_drain_purging", "Supply N2 for drain & continue purging and check %LEL(CH4) ( < 3%byVol or 60%LEL)"),
+    _stamp("close_n2_drain", "Close valve N2 supply and close valve line drain"),
+    _stamp("close_arms_manual", "Closed manual liquid and vapor arm/flexible hose"),
+    _stamp("release_final_pressure", "Open manual valve vent (safe to location) release pressure at liquid line&close"),
+    _stamp("disconnect_arms", "Disconnect liquid & vapor arm /Flexible hose ( Install seal )"),
+    _stamp("gross_weigh_truck", "Check all people out of bay and gross weigh truck (F1)"),
+    _value("tank_normal_kg", "Check all condition tank normal and start truck's engine", "kg."),
+    _value("disconnect_ground_kg", "Disconnect ground and check ground camp at parking point", "kg."),
+    _value("remove_safety_kg", "Remove wheel chock, Traffic cone and pole sign at parking area", "kg."),
+    _stamp("drive_out", "Confirm operating bay is normal and inform drive out of bay"),
+    Step((Field("bill_loading_sign_timestamp", TIMESTAMP,
+                "Create and sign for confirm loading Q'ty on Bill of Loading / Excise"),
+          Field("weight_checker", TEXT, caption="ผู้ตรวจสอบน้ำหนัก")), layout="column"),
+    _value("remark", "Remark", kind=TEXT),
+)
+
+# Filled in by the store rather than by an operator
+BOOKKEEPING: Tuple[Field, ...] = (Field("bay_number", TEXT), Field("completed_time", TIMESTAMP))
+
+ADMIN_FIELDS: Tuple[Field, ...] = tuple(field for row in ADMIN_ROWS for field in row)
+LOADING_FIELDS: Tuple[Field, ...] = tuple(field for step in STEPS for field in step.fields)
+# Every field of a record, in column order
+ALL_FIELDS: Tuple[Field, ...] = (*ADMIN_FIELDS, ADMIN_SAVED_TIME, *LOADING_FIELDS, *BOOKKEEPING)
+# Step times in the order the steps are done
+STEP_TIMESTAMPS: Tuple[str, ...] = tuple(field.key for field in LOADING_FIELDS if field.kind == TIMESTAMP)
+
+# Names the desktop app used before it shared these keys, and their keys
+# now. Its close_n2 step has no key of its own: closing N2 is part of purging_o2.
+LEGACY_NAMES = {
+    "instruction_sheet": "instruction_sheet_ton",
+    "check_ground_timestamp": "check_ground_tare_timestamp",
+    "connect_arms": "connect_arms_kg",
+    "purging_timestamp": "purging_o2_timestamp",
+    "release_pressure": "release_pressure_barg",
+    "cooldown_flow": "cooldown_flow_m3",
+    "ramp_up_flow": "ramp_up_flow_m3",
+    "close_valves_timestamp": "close_truck_valves_timestamp",
+    "n2_drain_timestamp": "n2_drain_purging_timestamp",
+    "close_arms_timestamp": "close_arms_manual_timestamp",
+    "release_final_timestamp": "release_final_pressure_timestamp",
+    "gross_weigh_timestamp": "gross_weigh_truck_timestamp",
+    "tank_check": "tank_normal_kg",
+    "disconnect_ground": "disconnect_ground_kg",
+    "remove_safety": "remove_safety_kg",
+    "bill_loading_timestamp": "bill_loading_sign_timestamp",
+}
+
+
+def rename_legacy(values: dict) -> dict:
+    """Returns ``values`` with legacy desktop names replaced by the current keys."""
+    if LEGACY_NAMES.keys().isdisjoint(values):
+        return values
+    return {LEGACY_NAMES.get(key, key): value for key, value in values.items()}
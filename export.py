@@ -0,0 +1,65 @@
+import os
+import re
+import secrets
+import time
+from datetime import datetime
+from typing import Callable, Iterable, List, Optional, Sequence
+
+# Directory where finished reports wait to be downloaded
+EXPORT_DIR = os.environ.get("EXPORT_DIR", "exports")
+# Reports older than this (seconds) are removed when a new export starts
+EXPORT_MAX_AGE = 24 * 60 * 60
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+_FILENAME_RE = re.compile(r"^gas_loading_report_[0-9_]+_[0-9a-f]+\.xlsx$")
+
+
+def new_export_filename() -> str:
+    """Timestamped report name with a random suffix so sessions never collide."""
+    return f"gas_loading_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{secrets.token_hex(4)}.xlsx"
+
+
+def export_path(filename: str) -> Optional[str]:
+    """Returns the path of a report in EXPORT_DIR, or None if the name is not one of ours."""
+    if not _FILENAME_RE.match(filename):
+        return None
+    return os.path.join(EXPORT_DIR, filename)
+
+
+def prune_exports(max_age: float = EXPORT_MAX_AGE):
+    """Deletes downloaded-or-forgotten reports older than max_age seconds."""
+    if not os.path.isdir(EXPORT_DIR):
+        return
+    cutoff = time.time() - max_age
+    for filename in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, filename)
+        if _FILENAME_RE.match(filename) and os.path.getmtime(path) < cutoff:
+            os.remove(path)
+
+
+def write_report(path: str, rows: Iterable[Sequence], columns: List[str],
+                 progress: Optional[Callable[[int], None]] = None, progress_every: int = 500) -> int:
+    """Streams rows into an xlsx file one at a time and returns the number of rows.
+
+    The workbook is opened in write-only mode, so memory use does not depend
+    on how many records are exported. ``progress`` is called with the row
+    count every ``progress_every`` rows.
+    """
+    from openpyxl import Workbook  # only needed once someone exports
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Loading")
+    sheet.append(columns)
+    count = 0
+    for row in rows:
+        sheet.append(row)
+        count += 1
+        if progress and count % progress_every == 0:
+            progress(count)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    workbook.save(tmp_path)
+    os.replace(tmp_path, path)
+    return count
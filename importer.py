@@ -0,0 +1,274 @@
+"""Imports historical loads into the store.
+
+Run from the repository root, with GAS_LOADING_DB pointing at the
+database (and --site for one site of several):
+
+    python -m importer gas_loading_data.json lng_truck_data.json gas_loading_report_*.xlsx
+
+Reads three kinds of files, streaming each one:
+
+- ``gas_loading_data.json``: {"bays": {...}, "completed": [...]}, from either app;
+- ``lng_truck_data.json``: {"Bay A": [...], ...}, each list holding one bay's loads;
+- Excel reports exported by either app (header row of field names, then one
+  row per load; loads still in progress are skipped).
+
+Old desktop field names are renamed. A load already in the store, or seen
+earlier in the import, is skipped; loads are the same when their bay,
+order number and completion time (to the second) match. Every export holds
+the whole history up to that day, so most report rows are duplicates and are
+dropped before a record is built. New loads are written in batches of
+BATCH_SIZE, one transaction each.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, TextIO, Tuple
+
+from checklist import STEP_TIMESTAMPS, TEXT, rename_legacy
+from records import FIELD_KINDS, LoadingRecord, parse_timestamp
+from storage import LoadKey
+
+BATCH_SIZE = 1000
+# Characters read from a JSON file at a time
+CHUNK_SIZE = 1 << 16
+IN_PROGRESS = "กำลังดำเนินการ"
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+# -------------------- Streaming JSON --------------------
+class _JsonStream:
+    """Reads a JSON document piece by piece, keeping only a chunk and one value in memory."""
+    def __init__(self, f: TextIO):
+        self._f = f
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        chunk = self._f.read(CHUNK_SIZE)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Skips whitespace and returns the next character ('' at the end)."""
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} in JSON at offset {self._pos}")
+        self._pos += 1
+
+    def value(self) -> Any:
+        """Decodes the next complete value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number that ends the buffer may continue in the next chunk
+            if end == len(self._buf) and not self._eof and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def items(self) -> Iterator[Any]:
+        """Decodes the elements of the array that starts here, one at a time."""
+        self.expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ",":
+                self._pos += 1
+                continue
+            self.expect("]")
+            return
+
+
+def iter_json_object(f: TextIO) -> Iterator[Tuple[str, Any]]:
+    """Yields (key, element) for each element of the top-level arrays and (key, value) for other values.
+
+    An empty file (as the desktop app leaves before its first save) yields nothing.
+    """
+    stream = _JsonStream(f)
+    if not stream.peek():
+        return
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+    while True:
+        key = stream.value()
+        stream.expect(":")
+        if stream.peek() == "[":
+            for item in stream.items():
+                yield key, item
+        else:
+            yield key, stream.value()
+        if stream.peek() == ",":
+            stream.expect(",")
+            continue
+        stream.expect("}")
+        return
+
+
+# -------------------- Sources --------------------
+def read_json(path: str) -> Iterator[Dict[str, Any]]:
+    """Completed loads of either JSON layout, each with its bay_number."""
+    with open(path, "r", encoding="utf-8") as f:
+        for key, value in iter_json_object(f):
+            if key == "completed" and isinstance(value, dict):
+                yield value
+            elif key.startswith("Bay ") and isinstance(value, dict):
+                yield dict(value, bay_number=value.get("bay_number") or key[len("Bay "):])
+
+
+def _cell(key: str, value: Any) -> Any:
+    """A report cell as the value the record expects: text fields get text."""
+    if FIELD_KINDS.get(key) == TEXT and not isinstance(value, str):
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        return str(value)
+    return value
+
+
+def read_report(path: str) -> Iterator[Dict[str, Any]]:
+    """Completed loads of an Excel report, one row at a time (openpyxl read-only mode)."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if not header:
+                continue
+            columns = [(index, str(name)) for index, name in enumerate(header) if name]
+            for row in rows:
+                values = {name: _cell(name, row[index]) for index, name in columns
+                          if index < len(row) and row[index] not in (None, "")}
+                if values.pop("status", None) != IN_PROGRESS:
+                    yield values
+    finally:
+        workbook.close()
+
+
+READERS: Dict[str, Callable[[str], Iterator[Dict[str, Any]]]] = {".json": read_json, ".xlsx": read_report}
+
+
+# -------------------- Import --------------------
+def _epoch(value: Any) -> Optional[int]:
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str) and value.strip():
+        try:
+            return parse_timestamp(value)
+        except ValueError:
+            return None
+    return None
+
+
+def completion_time(values: Dict[str, Any]) -> Optional[int]:
+    """completed_time, or for loads saved without one, the last step that was recorded."""
+    epoch = _epoch(values.get("completed_time"))
+    if epoch is None:
+        steps = [_epoch(values.get(key)) for key in STEP_TIMESTAMPS]
+        epoch = max((step for step in steps if step is not None), default=None)
+    return epoch
+
+
+def import_files(storage, paths: List[str], batch_size: int = BATCH_SIZE,
+                 progress: Optional[Callable[[str, Dict[str, int]], None]] = None) -> Dict[str, int]:
+    """Imports every file in ``paths``; returns the number of loads imported, duplicate and skipped.
+
+    ``progress`` is called after each file with its path and that file's counts.
+    """
+    counts = {"imported": 0, "duplicates": 0, "skipped": 0}
+    seen = storage.completed_keys()
+    batch: List[LoadingRecord] = []
+
+    def flush():
+        if batch:
+            storage.import_completed(batch)
+            counts["imported"] += len(batch)
+            batch.clear()
+
+    for path in paths:
+        reader = READERS.get(os.path.splitext(path)[1].lower())
+        if reader is None:
+            raise ValueError(f"Cannot import {path}: expected a .json or .xlsx file")
+        before = dict(counts)
+        for values in reader(path):
+            values = rename_legacy(values)
+            bay_number, epoch = values.get("bay_number"), completion_time(values)
+            if bay_number in (None, "") or epoch is None:
+                counts["skipped"] += 1
+                continue
+            order_no = values.get("order_no")
+            key: LoadKey = (str(bay_number), "" if order_no in (None, "") else str(order_no), epoch)
+            if key in seen:
+                counts["duplicates"] += 1
+                continue
+            seen.add(key)
+            record = LoadingRecord.from_json(values)
+            record.bay_number = key[0]
+            record.completed_time = epoch
+            batch.append(record)
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+        if progress:
+            progress(path, {name: counts[name] - before[name] for name in counts})
+    return counts
+
+
+def main() -> int:
+    from sites import load_sites
+    from storage import command_line_site, open_storage
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="JSON data files and .xlsx reports")
+    parser.add_argument("--site", default=None, help="site id (with several sites configured)")
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE, help="loads per transaction")
+    args = parser.parse_args()
+
+    sites = load_sites()
+    site = command_line_site(args.site, sites, "the import would only reach an in-memory store")
+    if site is None:
+        return 2
+    storage = open_storage(site.id if len(sites) > 1 else None)
+    start = time.perf_counter()
+    try:
+        counts = import_files(storage, args.paths, args.batch, progress=lambda path, counts: print(
+            f"{path}: {counts['imported']:,} imported, {counts['duplicates']:,} duplicates, {counts['skipped']:,} skipped"))
+    finally:
+        storage.close()
+    print(f"Imported {counts['imported']:,} loads ({counts['duplicates']:,} duplicates, "
+          f"{counts['skipped']:,} without a bay or completion time) in {time.perf_counter() - start:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""Counts what each event handler sends to the browser.
+
+Turned on with UPDATE_STATS=1. Every handler run by a session (event
+handlers and store changes, both go through page.run_thread) is named after
+its function, e.g. ``on_bay_changed`` or ``create_loading_tab.create_timestamp_button.on_click``.
+Work done on other threads, such as autosave timers, counts as
+``background``. For each name it counts handler runs, page.update() calls,
+controls sent and the bytes of the serialized update commands.
+"""
+import json
+import os
+import threading
+from typing import Callable, Dict, List
+
+import flet as ft
+from flet.core.protocol import CommandEncoder
+
+UPDATE_STATS_ENABLED = os.environ.get("UPDATE_STATS") == "1"
+
+BACKGROUND = "background"
+_COUNTERS = ("runs", "updates", "controls", "bytes")
+
+
+def handler_name(handler: Callable) -> str:
+    """Short, stable name of a handler defined inside main()."""
+    name = getattr(handler, "__qualname__", None) or repr(handler)
+    name = name.replace(".<locals>", "")
+    return name[len("main."):] if name.startswith("main.") else name
+
+
+def _controls_in(commands) -> int:
+    """Controls touched by a batch: one per update, one per control added or removed."""
+    count = 0
+    for command in commands:
+        if command.commands:
+            count += len(command.commands)
+        else:
+            count += max(1, len(command.values))
+    return count
+
+
+class UpdateStats:
+    """Per-handler totals for the whole process."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals: Dict[str, List[int]] = {}
+        self._local = threading.local()
+
+    def _add(self, counter: int, amount: int):
+        name = getattr(self._local, "handler", BACKGROUND)
+        with self._lock:
+            totals = self._totals.setdefault(name, [0] * len(_COUNTERS))
+            totals[counter] += amount
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        """{handler: {"runs", "updates", "controls", "bytes"}}, largest byte count first."""
+        with self._lock:
+            items = sorted(self._totals.items(), key=lambda item: -item[1][3])
+            return {name: dict(zip(_COUNTERS, totals)) for name, totals in items}
+
+    def reset(self):
+        with self._lock:
+            self._totals.clear()
+
+    def instrument(self, page: ft.Page):
+        """Wraps this session's run_thread, update and connections so their work is counted.
+
+        A browser that reconnects keeps its Page but gets a new connection, so
+        every connection the page is given is wrapped too, not just the first.
+        """
+        run_thread, update, connect = page.run_thread, page.update, page._connect
+
+        def counted_run_thread(handler, *args, **kwargs):
+            name = handler_name(handler)
+
+            def run(*args, **kwargs):
+                self._local.handler = name
+                self._add(0, 1)
+                try:
+                    handler(*args, **kwargs)
+                finally:
+                    self._local.handler = BACKGROUND
+            run_thread(run, *args, **kwargs)
+
+        def counted_update(*controls):
+            self._add(1, 1)
+            update(*controls)
+
+        async def counted_connect(conn):
+            self._instrument_connection(conn)
+            await connect(conn)
+
+        page.run_thread = counted_run_thread
+        page.update = counted_update
+        page._connect = counted_connect
+        self._instrument_connection(page.connection)
+
+    def _instrument_connection(self, conn):
+        if conn is None or getattr(conn, "_update_stats", False):
+            return
+        send_commands = conn.send_commands
+
+        def counted_send_commands(session_id, commands):
+            payload = json.dumps(commands, cls=CommandEncoder, separators=(",", ":"))
+            self._add(2, _controls_in(commands))
+            self._add(3, len(payload.encode("utf-8")))
+            return send_commands(session_id, commands)
+
+        conn.send_commands = counted_send_commands
+        conn._update_stats = True
+
+
+update_stats = UpdateStats()
@@ -1,56 +1,387 @@
 import flet as ft
-from datetime import datetime
+from datetime import datetime, timedelta
+from functools import partial
 import json
+import logging
 import os
-from typing import Dict, List, Optional
-import pandas as pd
+import queue
+import sys
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# ไฟล์กำหนดลานโหลดและ bay รูปแบบเดียวกับ GAS_LOADING_SITES ของเว็บแอป
+# {"sites": [{"id": "T2", "name": "Terminal 2", "bays": ["A", "B", ...]}]}
+SITES_FILE = "gas_loading_sites.json"
+DEFAULT_SITE = {"id": "main", "name": "ลานโหลดก๊าซธรรมชาติ", "bays": ["1", "2", "3", "4"]}
+
+def load_site(site_id: Optional[str] = None) -> dict:
+    """อ่านลานโหลดที่เลือก (site_id หรือ GAS_LOADING_SITE หรือลานแรก) ถ้าไม่มีไฟล์ใช้ bay 1-4 ตามเดิม"""
+    if not os.path.exists(SITES_FILE):
+        return DEFAULT_SITE
+    with open(SITES_FILE, 'r', encoding='utf-8') as f:
+        sites = json.load(f)["sites"]
+    site_id = site_id or os.environ.get("GAS_LOADING_SITE")
+    return next((site for site in sites if site["id"] == site_id), sites[0])
+
+# -------------------- Checklist --------------------
+# ฟิลด์และขั้นตอนใช้ checklist.py และข้อความแจ้งเตือนใช้ notify.py ของเว็บแอปที่ root ของ repo (ไม่มีสำเนาในไฟล์นี้)
+# ฟอร์ม คอลัมน์ Excel และการโหลดข้อมูลเข้าฟอร์มสร้างจากรายการนั้นทั้งหมด
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+from checklist import ADMIN_FIELDS, ADMIN_ROWS, LOADING_FIELDS, STEPS, TIMESTAMP, Field, rename_legacy
+from notify import Notifier
+
+# ค่าที่ dropdown แสดงเมื่อ bay ยังไม่มีข้อมูล
+FIELD_DEFAULTS = {"truck_type": "Semi-Trailer", "shift": "A"}
+EXPORT_COLUMNS = ['bay_number', 'status', *(field.key for field in ADMIN_FIELDS), 'admin_saved_time',
+                  *(field.key for field in LOADING_FIELDS), 'completed_time']
+
+# -------------------- Persistence --------------------
+# งานที่รอเขียนได้มากที่สุด ถ้าคิวเต็ม ผู้บันทึกต้องรอจนมีที่ว่าง (ดิสก์ช้ากว่าการกรอกนานเกินไป)
+WRITE_QUEUE_SIZE = int(os.environ.get("GAS_LOADING_WRITE_QUEUE", "1000"))
+# record สูงสุดที่เขียนและ fsync ในครั้งเดียว
+WRITE_BATCH = 200
+# วินาทีที่รอก่อนลองเขียนใหม่เมื่อเขียนไม่สำเร็จ
+WRITE_RETRY = 1.0
+
+def fsync_dir(path: str):
+    """fsync โฟลเดอร์ของ path ให้การ rename ลงดิสก์ด้วย (Windows ไม่มีและไม่จำเป็น)"""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class JournalWriter:
+    """เขียน journal ใน thread แยก event handler จึงไม่ต้องรอดิสก์
+
+    รับบรรทัด journal (str) หรือฟังก์ชันที่ต้องทำหลังบรรทัดก่อนหน้าลงดิสก์แล้ว (เช่นเขียน snapshot)
+    ผ่านคิวขนาดจำกัด บรรทัดที่รออยู่เขียนรวมกันแล้ว fsync ครั้งเดียว ถ้าเขียนไม่สำเร็จ
+    ตัดส่วนที่เขียนค้างทิ้งแล้วลองใหม่ทุก WRITE_RETRY วินาทีโดยไม่ทิ้งงานในคิว
+    """
+    def __init__(self, path: str, queue_size: int = WRITE_QUEUE_SIZE, batch_size: int = WRITE_BATCH):
+        self.path = path
+        self.batch_size = batch_size
+        self.queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.cond = threading.Condition()
+        self.queued = 0  # งานที่เข้าคิวแล้วทั้งหมด
+        self.done = 0    # งานที่ลงดิสก์แล้ว
+        self.error: Optional[Exception] = None
+        self.file = open(path, 'ab')
+        self.synced = self.file.tell()  # ขนาดไฟล์ที่ fsync แล้ว
+        self.thread = threading.Thread(target=self.run, name="journal-writer", daemon=True)
+        self.thread.start()
+
+    def put(self, item):
+        """ส่งงานเข้าคิว ถ้าคิวเต็มรอจนมีที่ว่าง"""
+        with self.cond:
+            self.queued += 1
+        self.queue.put(item)
+
+    def flush(self):
+        """รอจนงานที่ส่งมาก่อนหน้านี้ลงดิสก์ครบ ถ้าเขียนไม่สำเร็จแจ้ง error ของดิสก์ (งานยังอยู่ในคิว)"""
+        with self.cond:
+            target = self.queued
+            while self.done < target:
+                if self.error is not None:
+                    raise self.error
+                self.cond.wait()
+
+    def close(self):
+        """เขียนงานที่ค้างทั้งหมดแล้วหยุด thread"""
+        self.flush()
+        self.queue.put(None)
+        self.thread.join()
+
+    def reset(self):
+        """ล้าง journal หลังเขียน snapshot แล้ว (เรียกจาก thread ของ writer เท่านั้น)"""
+        self.file.close()
+        self.file = open(self.path, 'wb')
+        self.synced = 0
+
+    def run(self):
+        pending: list = []  # งานที่ดึงจากคิวแล้วแต่ยังเขียนไม่สำเร็จ
+        while True:
+            if not pending:
+                pending.append(self.queue.get())
+            while len(pending) < self.batch_size:
+                try:
+                    pending.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                stop = self.write(pending)
+            except Exception as ex:
+                with self.cond:
+                    self.error = ex
+                    self.cond.notify_all()
+                time.sleep(WRITE_RETRY)
+                continue
+            if stop:
+                self.file.close()
+                return
+
+    def write(self, items: list) -> bool:
+        """ทำงานตามลำดับ บรรทัดที่ติดกันเขียนรวมครั้งเดียว งานที่เสร็จลบออกจาก items คืน True เมื่อเจอคำสั่งหยุด"""
+        while items:
+            if items[0] is None:
+                return True
+            if callable(items[0]):
+                items[0]()
+                count = 1
+            else:
+                count = next((i for i, item in enumerate(items) if not isinstance(item, str)), len(items))
+                self.append("".join(items[:count]))
+            del items[:count]
+            with self.cond:
+                self.done += count
+                self.error = None
+                self.cond.notify_all()
+        return False
+
+    def append(self, text: str):
+        if self.file.closed:
+            # ครั้งก่อนเขียนไม่สำเร็จ ตัดบรรทัดที่อาจเขียนค้างไว้ครึ่งหนึ่งออกก่อน
+            os.truncate(self.path, self.synced)
+            self.file = open(self.path, 'ab')
+        try:
+            self.file.write(text.encode('utf-8'))
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        except Exception:
+            try:
+                self.file.close()
+            except OSError:
+                pass
+            raise
+        self.synced = self.file.tell()
 
 class GasLoadingSystem:
-    def __init__(self):
-        self.data_file = "gas_loading_data.json"
+    # จำนวน record ใน journal ก่อนรวมเป็น snapshot ใหม่
+    COMPACT_EVERY = 500
+    # งานที่เสร็จภายในกี่วันล่าสุดที่เก็บไว้ใน snapshot (ที่เก่ากว่าย้ายไป archive)
+    HOT_DAYS = int(os.environ.get("GAS_LOADING_HOT_DAYS", "30"))
+
+    def __init__(self, site: Optional[dict] = None):
+        self.site = site or DEFAULT_SITE
+        # แต่ละลานโหลดเก็บข้อมูลในไฟล์ของตัวเอง ลานเริ่มต้นใช้ชื่อไฟล์เดิม
+        name = "gas_loading_data" if self.site["id"] == DEFAULT_SITE["id"] else f"gas_loading_data.{self.site['id']}"
+        self.data_file = f"{name}.json"
+        self.journal_file = f"{name}.journal"
+        # งานเก่าแยกเป็นไฟล์รายเดือน YYYY-MM.jsonl พร้อม index.json ว่าแต่ละไฟล์ครอบคลุมช่วงเวลาใด
+        self.archive_dir = f"{name}_archive"
+        self.archive_index_file = os.path.join(self.archive_dir, "index.json")
+        self.journal_seq = 0
+        self.journal_records = 0
+        # event handler แก้ข้อมูลในหน่วยความจำใต้ lock นี้ การเขียนไฟล์อยู่ใน thread ของ writer
+        self.lock = threading.Lock()
+        self.writer: Optional[JournalWriter] = None
+        # งานที่เสร็จก่อนเวลานี้ย้ายไป archive แล้ว (writer ตั้งค่า ส่วนการลบออกจากหน่วยความจำทำใต้ lock)
+        self.archived_before = ""
         self.load_data()
         
     def load_data(self):
-        """โหลดข้อมูลจากไฟล์"""
+        """โหลด snapshot แล้ว replay journal ที่ต่อท้ายไว้"""
         if os.path.exists(self.data_file):
             with open(self.data_file, 'r', encoding='utf-8') as f:
                 self.data = json.load(f)
         else:
-            self.data = {
-                "bays": {
-                    "1": {},
-                    "2": {},
-                    "3": {},
-                    "4": {}
-                },
-                "completed": []
-            }
+            self.data = {"bays": {}, "completed": []}
+        self.data["bays"] = {bay_number: rename_legacy(fields) for bay_number, fields in self.data["bays"].items()}
+        self.data["completed"] = [rename_legacy(record) for record in self.data["completed"]]
+        for bay_number in self.site["bays"]:
+            self.data["bays"].setdefault(bay_number, {})
+        self.journal_seq = self.data.pop("journal_seq", 0)
+        self.journal_records = 0
+        
+        if os.path.exists(self.journal_file):
+            good_end = 0  # ตำแหน่งท้ายบรรทัดสุดท้ายที่อ่านได้ครบ
+            with open(self.journal_file, 'rb') as f:
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("incomplete line")
+                        record = json.loads(line)
+                    except ValueError:
+                        # บรรทัดสุดท้ายอาจเขียนไม่ครบถ้าโปรแกรมปิดกะทันหัน
+                        break
+                    good_end += len(line)
+                    # record ที่อยู่ใน snapshot แล้วไม่ต้อง replay ซ้ำ
+                    if record["seq"] <= self.journal_seq:
+                        continue
+                    self.apply_record(record)
+                    self.journal_seq = record["seq"]
+                    self.journal_records += 1
+            # ตัดส่วนที่เขียนค้างทิ้งก่อนเปิดต่อท้าย ไม่เช่นนั้น record ถัดไปจะต่อกับบรรทัดที่ขาด
+            # และหายไปตอนเปิดโปรแกรมครั้งหน้า
+            dropped = os.path.getsize(self.journal_file) - good_end
+            if dropped:
+                logging.getLogger(__name__).warning(
+                    "ตัดท้าย journal %s ที่เขียนไม่ครบทิ้ง %d ไบต์", self.journal_file, dropped)
+                os.truncate(self.journal_file, good_end)
+        
+        self.writer = JournalWriter(self.journal_file)
+        completed = self.data["completed"]
+        if self.journal_records >= self.COMPACT_EVERY or (completed and completed[0]["completed_time"] < self.hot_cutoff()):
+            with self.lock:
+                self.save_data()
+    
+    def apply_record(self, record: dict):
+        """นำ record จาก journal มาใช้กับข้อมูลในหน่วยความจำ"""
+        bay_number = record["bay"]
+        if record["op"] == "update":
+            self.data["bays"].setdefault(bay_number, {}).update(rename_legacy(record["fields"]))
+        elif record["op"] == "complete":
+            if self.data["bays"].get(bay_number):
+                completed_data = self.data["bays"][bay_number].copy()
+                completed_data["bay_number"] = bay_number
+                completed_data["completed_time"] = record["completed_time"]
+                self.data["completed"].append(completed_data)
+                self.data["bays"][bay_number] = {}
+    
+    def append_record(self, record: dict):
+        """ใช้ record กับข้อมูลในหน่วยความจำแล้วส่งให้ writer ต่อท้าย journal รวมเป็น snapshot เมื่อครบรอบ"""
+        with self.lock:
+            self.drop_archived()
+            self.journal_seq += 1
+            record["seq"] = self.journal_seq
+            self.apply_record(record)
+            # ส่งเข้าคิวใต้ lock บรรทัดใน journal จึงเรียงตาม seq (thread ของ writer ไม่ใช้ lock นี้
+            # คิวเต็มจึงรอแค่ดิสก์ ไม่ deadlock)
+            self.writer.put(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n")
+            self.journal_records += 1
+            if self.journal_records >= self.COMPACT_EVERY:
+                self.save_data()
     
+    def drop_archived(self):
+        """ลบงานที่ writer ย้ายไป archive แล้วออกจากหน่วยความจำ (ต้องถือ lock อยู่)"""
+        completed = self.data["completed"]
+        if completed and completed[0]["completed_time"] < self.archived_before:
+            self.data["completed"] = [record for record in completed if record["completed_time"] >= self.archived_before]
+
     def save_data(self):
-        """บันทึกข้อมูลลงไฟล์"""
-        with open(self.data_file, 'w', encoding='utf-8') as f:
-            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        """ส่งสำเนาข้อมูลตอนนี้ให้ writer เขียนเป็น snapshot (ต้องถือ lock อยู่)
+
+        record ที่เสร็จแล้วไม่ถูกแก้อีก สำเนาจึงคัดลอกแค่ list และข้อมูลของแต่ละ bay
+        """
+        snapshot = {
+            "bays": {bay_number: dict(fields) for bay_number, fields in self.data["bays"].items()},
+            "completed": list(self.data["completed"]),
+            "journal_seq": self.journal_seq
+        }
+        self.writer.put(partial(self.write_snapshot, snapshot))
+        self.journal_records = 0
+
+    def write_snapshot(self, snapshot: dict):
+        """ย้ายงานเก่าไป archive เขียน snapshot ใหม่ทั้งไฟล์แล้วล้าง journal (ทำใน thread ของ writer)"""
+        snapshot["completed"] = self.archive_completed(snapshot["completed"])
+        self.write_json_atomic(self.data_file, [json.dumps(snapshot, ensure_ascii=False, indent=2)])
+        # snapshot มี journal_seq แล้ว ถ้าโปรแกรมปิดก่อนล้าง journal ก็จะไม่ replay ซ้ำ
+        self.writer.reset()
+
+    def flush(self):
+        """รอจนทุกอย่างที่บันทึกไปแล้วลงดิสก์"""
+        self.writer.flush()
+
+    def close(self):
+        """เขียนงานที่ค้างแล้วหยุด writer (เรียกตอนปิดโปรแกรม)"""
+        self.writer.close()
     
+    # -------------------- Archive --------------------
+    def hot_cutoff(self) -> str:
+        """งานที่เสร็จก่อนเวลานี้ (ISO) อยู่ใน archive"""
+        return (datetime.now() - timedelta(days=self.HOT_DAYS)).isoformat()
+
+    def load_archive_index(self) -> dict:
+        if not os.path.exists(self.archive_index_file):
+            return {}
+        with open(self.archive_index_file, 'r', encoding='utf-8') as f:
+            return json.load(f)["segments"]
+
+    def read_segment(self, month: str) -> List[dict]:
+        with open(os.path.join(self.archive_dir, f"{month}.jsonl"), 'r', encoding='utf-8') as f:
+            return [rename_legacy(json.loads(line)) for line in f if line.strip()]
+
+    def write_json_atomic(self, path: str, lines: List[str]):
+        """เขียนไฟล์ชั่วคราว fsync แล้ว rename ทับ ไฟล์บนดิสก์จึงเป็นฉบับเก่าหรือใหม่ที่ครบเสมอ"""
+        tmp_file = path + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, path)
+        fsync_dir(path)
+
+    def archive_completed(self, completed: List[dict]) -> List[dict]:
+        """ย้ายงานที่เก่ากว่า HOT_DAYS ใน completed (ของ snapshot) ไปยังไฟล์รายเดือน คืนงานที่เหลือ
+
+        เขียนไฟล์เดือนและ index ก่อน snapshot ถ้าโปรแกรมปิดระหว่างนั้น งานจะถูกย้ายซ้ำ
+        ในรอบถัดไป จึงตัดรายการซ้ำ (bay_number, completed_time) ตอนรวมไฟล์
+        """
+        cutoff = self.hot_cutoff()
+        old = [record for record in completed if record["completed_time"] < cutoff]
+        if not old:
+            return completed
+        by_month: Dict[str, List[dict]] = {}
+        for record in old:
+            by_month.setdefault(record["completed_time"][:7], []).append(record)
+
+        os.makedirs(self.archive_dir, exist_ok=True)
+        index = self.load_archive_index()
+        for month, records in by_month.items():
+            if month in index:
+                existing = self.read_segment(month)
+                seen = {(r.get("bay_number"), r["completed_time"]) for r in existing}
+                records = existing + [r for r in records if (r.get("bay_number"), r["completed_time"]) not in seen]
+            records.sort(key=lambda r: r["completed_time"])
+            self.write_json_atomic(
+                os.path.join(self.archive_dir, f"{month}.jsonl"),
+                [json.dumps(r, ensure_ascii=False, separators=(',', ':')) + "\n" for r in records]
+            )
+            index[month] = {
+                "start": records[0]["completed_time"],
+                "end": records[-1]["completed_time"],
+                "count": len(records)
+            }
+        self.write_json_atomic(self.archive_index_file, [json.dumps({"segments": index}, ensure_ascii=False, indent=2)])
+        # ไม่แตะ self.data ที่นี่ (ต้องใช้ lock) iter_completed ข้ามงานก่อน cutoff ในหน่วยความจำ
+        # จนกว่า append_record ครั้งถัดไปจะลบออก
+        self.archived_before = cutoff
+        return [record for record in completed if record["completed_time"] >= cutoff]
+
+    def iter_completed(self, start: Optional[str] = None, end: Optional[str] = None) -> Iterator[dict]:
+        """งานที่เสร็จในช่วง [start, end) (ISO) เรียงตามเวลา อ่านเฉพาะไฟล์ archive ที่ครอบคลุมช่วงนั้น"""
+        for month, segment in sorted(self.load_archive_index().items()):
+            if (start and segment["end"] < start) or (end and segment["start"] >= end):
+                continue
+            for record in self.read_segment(month):
+                if (not start or record["completed_time"] >= start) and (not end or record["completed_time"] < end):
+                    yield record
+        for record in list(self.data["completed"]):
+            if record["completed_time"] < self.archived_before:
+                continue
+            if (not start or record["completed_time"] >= start) and (not end or record["completed_time"] < end):
+                yield record
+
     def get_bay_data(self, bay_number: str) -> dict:
         """ดึงข้อมูลของ bay ที่เลือก"""
         return self.data["bays"].get(bay_number, {})
     
     def save_bay_data(self, bay_number: str, data: dict):
-        """บันทึกข้อมูลของ bay"""
-        if bay_number not in self.data["bays"]:
-            self.data["bays"][bay_number] = {}
-        self.data["bays"][bay_number].update(data)
-        self.save_data()
+        """บันทึกข้อมูลของ bay (เฉพาะฟิลด์ที่ส่งมา)"""
+        self.append_record({"op": "update", "bay": bay_number, "fields": data})
     
     def complete_loading(self, bay_number: str):
-        """ย้ายข้อมูลไปยัง completed เมื่อโหลดเสร็จ"""
+        """ย้ายข้อมูลไปยัง completed เมื่อโหลดเสร็จ แล้วรอจนลงดิสก์ (OSError ถ้าดิสก์มีปัญหา writer จะลองใหม่เอง)"""
         if bay_number in self.data["bays"] and self.data["bays"][bay_number]:
-            completed_data = self.data["bays"][bay_number].copy()
-            completed_data["bay_number"] = bay_number
-            completed_data["completed_time"] = datetime.now().isoformat()
-            self.data["completed"].append(completed_data)
-            self.data["bays"][bay_number] = {}
-            self.save_data()
+            self.append_record({
+                "op": "complete",
+                "bay": bay_number,
+                "completed_time": datetime.now().isoformat()
+            })
+            self.flush()
 
 def main(page: ft.Page):
     page.title = "ระบบจัดการลานโหลดก๊าซธรรมชาติ"
@@ -60,18 +391,14 @@ def main(page: ft.Page):
     page.window.height = 800
     
     # Initialize data system
-    gas_system = GasLoadingSystem()
-    current_bay = "1"  # Default bay
+    gas_system = GasLoadingSystem(load_site())
+    bays = gas_system.site["bays"]
+    current_bay = bays[0]  # Default bay
     
+    notifier = Notifier(page)
+
     def show_snackbar(message: str, color: str = "green"):
-        snackbar = ft.SnackBar(
-            content=ft.Text(message),
-            bgcolor=color,
-            duration=2000
-        )
-        page.overlay.append(snackbar)
-        snackbar.open = True
-        page.update()
+        notifier.show(message, color)
     
     def get_timestamp():
         """Get current timestamp"""
@@ -79,42 +406,31 @@ def main(page: ft.Page):
     
     def save_current_data(field: str, value):
         """Save data for current bay"""
-        bay_data = gas_system.get_bay_data(current_bay)
-        bay_data[field] = value
-        gas_system.save_bay_data(current_bay, bay_data)
+        gas_system.save_bay_data(current_bay, {field: value})
         show_snackbar(f"บันทึกข้อมูล {field} สำเร็จ", "green")
     
+    # (key, control, ค่าเริ่มต้น) ของทุกฟิลด์ในฟอร์ม เติมตอนสร้างแท็บ
+    bindings: List[Tuple[str, ft.Control, str]] = []
+
     def load_bay_data_to_form():
         """Load saved data for current bay into form fields"""
         bay_data = gas_system.get_bay_data(current_bay)
-        
-        # Admin check order fields
-        if hasattr(page, 'admin_fields'):
-            fields = page.admin_fields
-            fields['carrier_name'].value = bay_data.get('carrier_name', '')
-            fields['license_front'].value = bay_data.get('license_front', '')
-            fields['license_rear'].value = bay_data.get('license_rear', '')
-            fields['truck_type'].value = bay_data.get('truck_type', 'Semi-Trailer')
-            fields['shift'].value = bay_data.get('shift', 'A')
-            fields['order_no'].value = bay_data.get('order_no', '')
-            fields['customer_name'].value = bay_data.get('customer_name', '')
-            fields['load_qty'].value = bay_data.get('load_qty', '')
-            fields['checker_name'].value = bay_data.get('checker_name', '')
-            
-        # Loading fields
-        if hasattr(page, 'loading_fields'):
-            fields = page.loading_fields
-            for key, field in fields.items():
-                if key in bay_data:
-                    if isinstance(field, ft.TextField):
-                        field.value = bay_data[key]
-                    elif isinstance(field, ft.Dropdown):
-                        field.value = bay_data[key]
-                    elif isinstance(field, ft.Text):
-                        field.value = bay_data[key]
-        
+        for key, control, default in bindings:
+            control.value = bay_data.get(key, default)
         page.update()
     
+    def input_control(field: Field) -> ft.Control:
+        """สร้างช่องกรอกหรือ dropdown ของฟิลด์"""
+        default = FIELD_DEFAULTS.get(field.key, "")
+        if field.choices:
+            control = ft.Dropdown(label=field.title, width=field.width, value=default or None,
+                                  options=[ft.dropdown.Option(choice) for choice in field.choices])
+        else:
+            control = ft.TextField(label=field.title, width=field.width,
+                                   keyboard_type=ft.KeyboardType.NUMBER if field.uses_numeric_keyboard else ft.KeyboardType.TEXT)
+        bindings.append((field.key, control, default))
+        return control
+    
     # Bay selector
     def on_bay_changed(e):
         nonlocal current_bay
@@ -126,13 +442,8 @@ def main(page: ft.Page):
     bay_selector = ft.Dropdown(
         label="เลือก Bay",
         width=150,
-        value="1",
-        options=[
-            ft.dropdown.Option("1", "Bay 1"),
-            ft.dropdown.Option("2", "Bay 2"),
-            ft.dropdown.Option("3", "Bay 3"),
-            ft.dropdown.Option("4", "Bay 4"),
-        ],
+        value=current_bay,
+        options=[ft.dropdown.Option(bay_num, f"Bay {bay_num}") for bay_num in bays],
         on_change=on_bay_changed
     )
     
@@ -140,64 +451,11 @@ def main(page: ft.Page):
     
     # Admin check order tab
     def create_admin_tab():
-        carrier_name = ft.TextField(label="Carrier Name", width=300)
-        license_front = ft.TextField(label="License (Front)", width=200, keyboard_type=ft.KeyboardType.NUMBER)
-        license_rear = ft.TextField(label="License (Rear)", width=200, keyboard_type=ft.KeyboardType.NUMBER)
-        
-        truck_type = ft.Dropdown(
-            label="Types of truck",
-            width=300,
-            options=[
-                ft.dropdown.Option("Semi-Trailer"),
-                ft.dropdown.Option("10 wheel truck"),
-                ft.dropdown.Option("ISO Tank"),
-            ],
-            value="Semi-Trailer"
-        )
-        
-        shift = ft.Dropdown(
-            label="Shift",
-            width=150,
-            options=[
-                ft.dropdown.Option("A"),
-                ft.dropdown.Option("B"),
-                ft.dropdown.Option("C"),
-                ft.dropdown.Option("D"),
-            ],
-            value="A"
-        )
-        
-        order_no = ft.TextField(label="Order No.", width=200, keyboard_type=ft.KeyboardType.NUMBER)
-        customer_name = ft.TextField(label="Customer name", width=300)
-        load_qty = ft.TextField(label="Calculated/Load Q'ty (kg)", width=200, keyboard_type=ft.KeyboardType.NUMBER)
-        checker_name = ft.TextField(label="ชื่อผู้ตรวจสอบ", width=300)
-        
-        # Store fields for later access
-        page.admin_fields = {
-            'carrier_name': carrier_name,
-            'license_front': license_front,
-            'license_rear': license_rear,
-            'truck_type': truck_type,
-            'shift': shift,
-            'order_no': order_no,
-            'customer_name': customer_name,
-            'load_qty': load_qty,
-            'checker_name': checker_name
-        }
+        page.admin_fields = {field.key: input_control(field) for field in ADMIN_FIELDS}
         
         def save_admin_data(e):
-            data = {
-                'carrier_name': carrier_name.value,
-                'license_front': license_front.value,
-                'license_rear': license_rear.value,
-                'truck_type': truck_type.value,
-                'shift': shift.value,
-                'order_no': order_no.value,
-                'customer_name': customer_name.value,
-                'load_qty': load_qty.value,
-                'checker_name': checker_name.value,
-                'admin_saved_time': get_timestamp()
-            }
+            data = {key: control.value for key, control in page.admin_fields.items()}
+            data['admin_saved_time'] = get_timestamp()
             gas_system.save_bay_data(current_bay, data)
             show_snackbar("บันทึกข้อมูล Admin check order สำเร็จ")
         
@@ -211,12 +469,7 @@ def main(page: ft.Page):
         return ft.Container(
             content=ft.Column([
                 ft.Text("Admin Check Order", size=20, weight=ft.FontWeight.BOLD),
-                ft.Row([carrier_name]),
-                ft.Row([license_front, license_rear]),
-                ft.Row([truck_type, shift]),
-                ft.Row([order_no, customer_name]),
-                ft.Row([load_qty]),
-                ft.Row([checker_name]),
+                *(ft.Row([page.admin_fields[field.key] for field in row]) for row in ADMIN_ROWS),
                 ft.Row([save_btn])
             ], scroll=ft.ScrollMode.AUTO),
             padding=20
@@ -224,86 +477,50 @@ def main(page: ft.Page):
     
     # Loading tab
     def create_loading_tab():
-        loading_steps = []
         page.loading_fields = {}
         
-        def create_timestamp_button(label: str, field_name: str):
+        def create_timestamp_button(field: Field):
             timestamp_text = ft.Text("", size=12)
-            page.loading_fields[f"{field_name}_timestamp"] = timestamp_text
+            page.loading_fields[field.key] = timestamp_text
+            bindings.append((field.key, timestamp_text, ""))
             
             def on_click(e):
                 timestamp = get_timestamp()
                 timestamp_text.value = timestamp
-                save_current_data(f"{field_name}_timestamp", timestamp)
+                save_current_data(field.key, timestamp)
                 page.update()
             
             btn = ft.ElevatedButton("OK", on_click=on_click, width=80)
             return ft.Column([
-                ft.Text(label, size=14),
+                ft.Text(field.label, size=14),
                 ft.Row([btn, timestamp_text])
             ])
         
-        def create_input_field(label: str, field_name: str, unit: str = "", keyboard_type=ft.KeyboardType.NUMBER):
-            field = ft.TextField(
-                label=f"{label} ({unit})" if unit else label,
-                width=200,
-                keyboard_type=keyboard_type,
-                on_change=lambda e: save_current_data(field_name, e.control.value)
-            )
-            page.loading_fields[field_name] = field
-            return field
+        def create_step_field(field: Field) -> ft.Control:
+            if field.kind == TIMESTAMP:
+                return create_timestamp_button(field)
+            control = input_control(field)
+            control.on_change = lambda e: save_current_data(field.key, e.control.value)
+            page.loading_fields[field.key] = control
+            if field.caption:
+                return ft.Row([ft.Text(field.caption), ft.VerticalDivider(width=10), control])
+            return control
         
-        def create_dropdown_field(label: str, field_name: str, options: List[str]):
-            dropdown = ft.Dropdown(
-                label=label,
-                width=200,
-                options=[ft.dropdown.Option(opt) for opt in options],
-                on_change=lambda e: save_current_data(field_name, e.control.value)
-            )
-            page.loading_fields[field_name] = dropdown
-            return dropdown
-        
-        # Create all loading steps
-        loading_steps = [
-            create_timestamp_button("Check weight scale / Truck on bay time", "truck_on_bay"),
-            create_timestamp_button("Parking and stop engine", "parking_stop"),
-            create_timestamp_button("Put wheel chock, traffic cone, pole sign & connect ground", "safety_setup"),
-            create_input_field("Create and check instruction sheet", "instruction_sheet", "Ton"),
-            create_timestamp_button("Check ground before tare weight (F1)", "check_ground"),
-            create_input_field("Connect liquid & vapor arms", "connect_arms", "Kg"),
-            create_timestamp_button("Open manual valve vent safe location", "open_vent"),
-            create_timestamp_button("Supply N2 & open valve vapor arm (3-5 Barg)", "supply_n2"),
-            create_timestamp_button("Open valve liquid arm and purging O2 < 1%", "purging"),
-            create_timestamp_button("Close N2 supply and bypass valve", "close_n2"),
-            create_timestamp_button("Close manual valve vent safe location", "close_vent"),
-            create_input_field("Open SDV vapor for releasing pressure", "release_pressure", "barg"),
-            create_timestamp_button("Open vapor and liquid valve of truck", "open_truck_valves"),
-            ft.Row([
-                create_input_field("Open SDV liquid start cooldown", "cooldown_flow", "m3/hr"),
-                create_dropdown_field("Cooldown status", "cooldown_status", ["cool down", "Not cool down"])
-            ]),
-            create_input_field("Ramp up flow rate", "ramp_up_flow", "m3/hr"),
-            create_input_field("ช่างเข้า", "technician_name", "", ft.KeyboardType.TEXT),
-            create_timestamp_button("Ramp down and confirm gross weight", "ramp_down"),
-            create_timestamp_button("Close liquid & vapor valve", "close_valves"),
-            create_timestamp_button("Supply N2 for drain & purging", "n2_drain"),
-            create_timestamp_button("Close N2 supply and drain valve", "close_n2_drain"),
-            create_timestamp_button("Close manual liquid and vapor arm", "close_arms"),
-            create_timestamp_button("Open manual valve vent release pressure", "release_final"),
-            create_timestamp_button("Disconnect liquid & vapor arm", "disconnect_arms"),
-            create_timestamp_button("Check all people out and gross weigh", "gross_weigh"),
-            create_input_field("Check tank normal and start engine", "tank_check", "kg"),
-            create_input_field("Disconnect ground at parking", "disconnect_ground", "kg"),
-            create_input_field("Remove wheel chock and signs", "remove_safety", "kg"),
-            create_timestamp_button("Confirm bay normal and drive out", "drive_out"),
-            create_timestamp_button("Create and sign Bill of Loading", "bill_loading"),
-            create_input_field("ผู้ตรวจสอบน้ำหนัก", "weight_checker", "", ft.KeyboardType.TEXT),
-            create_input_field("Remark", "remark", "", ft.KeyboardType.TEXT),
-        ]
+        # ขั้นตอนที่มีหลายฟิลด์แสดงเป็นแถวหรือคอลัมน์ตาม step.layout
+        loading_steps = []
+        for step in STEPS:
+            controls = [create_step_field(field) for field in step.fields]
+            if len(controls) == 1:
+                loading_steps.append(controls[0])
+            else:
+                loading_steps.append(ft.Column(controls) if step.layout == "column" else ft.Row(controls))
         
         def complete_loading(e):
-            gas_system.complete_loading(current_bay)
-            show_snackbar(f"บันทึกข้อมูล Bay {current_bay} เสร็จสมบูรณ์", "blue")
+            try:
+                gas_system.complete_loading(current_bay)
+                show_snackbar(f"บันทึกข้อมูล Bay {current_bay} เสร็จสมบูรณ์", "blue")
+            except OSError as ex:
+                show_snackbar(f"ยังบันทึกลงดิสก์ไม่ได้ ({ex}) ระบบจะลองใหม่อัตโนมัติ", "red")
             load_bay_data_to_form()
         
         complete_btn = ft.ElevatedButton(
@@ -372,35 +589,40 @@ def main(page: ft.Page):
             data_table.rows = rows
             page.update()
         
-        def export_to_excel(e):
+        def export_records():
+            """ส่งข้อมูลทีละ record: bay ที่กำลังทำงาน แล้วตามด้วยที่เสร็จแล้ว"""
+            for bay_num, bay_data in list(gas_system.data["bays"].items()):
+                if bay_data:
+                    yield dict(bay_data, bay_number=bay_num, status='กำลังดำเนินการ')
+            for completed in gas_system.iter_completed():
+                yield dict(completed, status='เสร็จสิ้น')
+        
+        def run_export():
+            """เขียนไฟล์ Excel แบบ write-only ทีละแถวใน thread แยกจาก UI"""
+            # โหลด openpyxl เมื่อกดส่งออกครั้งแรกเท่านั้น
+            from openpyxl import Workbook
             try:
-                # Prepare data for export
-                all_data = []
-                
-                # Add active bays
-                for bay_num, bay_data in gas_system.data["bays"].items():
-                    if bay_data:
-                        record = bay_data.copy()
-                        record['bay_number'] = bay_num
-                        record['status'] = 'กำลังดำเนินการ'
-                        all_data.append(record)
+                if not any(gas_system.data["bays"].values()) and next(gas_system.iter_completed(), None) is None:
+                    show_snackbar("ไม่มีข้อมูลให้ส่งออก", "red")
+                    return
                 
-                # Add completed
-                for completed in gas_system.data["completed"]:
-                    record = completed.copy()
-                    record['status'] = 'เสร็จสิ้น'
-                    all_data.append(record)
+                columns = EXPORT_COLUMNS
+                workbook = Workbook(write_only=True)
+                sheet = workbook.create_sheet("Loading")
+                sheet.append(columns)
+                for record in export_records():
+                    sheet.append([record.get(column) for column in columns])
                 
-                if all_data:
-                    df = pd.DataFrame(all_data)
-                    filename = f"gas_loading_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-                    df.to_excel(filename, index=False)
-                    show_snackbar(f"ส่งออกข้อมูลเป็น {filename} สำเร็จ", "green")
-                else:
-                    show_snackbar("ไม่มีข้อมูลให้ส่งออก", "red")
+                filename = f"gas_loading_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+                workbook.save(filename)
+                show_snackbar(f"ส่งออกข้อมูลเป็น {filename} สำเร็จ", "green")
             except Exception as ex:
                 show_snackbar(f"เกิดข้อผิดพลาด: {str(ex)}", "red")
         
+        def export_to_excel(e):
+            show_snackbar("กำลังส่งออกข้อมูล...", "blue")
+            page.run_thread(run_export)
+        
         refresh_btn = ft.IconButton(
             icon=ft.icons.REFRESH,
             on_click=refresh_data,
@@ -413,7 +635,7 @@ def main(page: ft.Page):
             icon=ft.icons.FILE_DOWNLOAD
         )
         
-        # Summary cards for all 4 bays
+        # Summary cards for every bay
         def create_bay_summary_card(bay_num: str):
             bay_data = gas_system.get_bay_data(bay_num)
             is_active = bool(bay_data)
@@ -433,12 +655,15 @@ def main(page: ft.Page):
                 height=150
             )
         
-        bay_summaries = ft.Row([
-            create_bay_summary_card("1"),
-            create_bay_summary_card("2"),
-            create_bay_summary_card("3"),
-            create_bay_summary_card("4"),
-        ], wrap=True)
+        # GridView สร้างเฉพาะการ์ดที่อยู่ในหน้าจอ รองรับลานที่มีหลายสิบ bay
+        bay_summaries = ft.GridView(
+            [create_bay_summary_card(bay_num) for bay_num in bays],
+            max_extent=260,
+            child_aspect_ratio=250 / 150,
+            spacing=10,
+            run_spacing=10,
+            height=min(2, -(-len(bays) // 4)) * 160
+        )
         
         # Initial data load
         refresh_data()
@@ -447,7 +672,7 @@ def main(page: ft.Page):
             content=ft.Column([
                 ft.Text("ตรวจสอบข้อมูล", size=20, weight=ft.FontWeight.BOLD),
                 ft.Row([refresh_btn, export_btn]),
-                ft.Text("สรุปสถานะ 4 Bay", size=16, weight=ft.FontWeight.BOLD),
+                ft.Text(f"สรุปสถานะ {len(bays)} Bay", size=16, weight=ft.FontWeight.BOLD),
                 bay_summaries,
                 ft.Divider(),
                 ft.Text("ข้อมูลทั้งหมด", size=16, weight=ft.FontWeight.BOLD),
@@ -500,6 +725,25 @@ def main(page: ft.Page):
         ], expand=True)
     )
     
+    # ปิดหน้าต่างหลังงานที่ค้างในคิวลงดิสก์ครบ ถ้าดิสก์มีปัญหาแจ้งก่อน กดปิดซ้ำจึงปิดทันที
+    close_failed = False
+
+    def on_window_event(e):
+        nonlocal close_failed
+        if e.type != ft.WindowEventType.CLOSE:
+            return
+        try:
+            gas_system.close()
+        except OSError as ex:
+            if not close_failed:
+                close_failed = True
+                show_snackbar(f"ยังบันทึกลงดิสก์ไม่ได้ ({ex}) กดปิดอีกครั้งเพื่อปิดโดยไม่รอ", "red")
+                return
+        page.window.destroy()
+
+    page.window.prevent_close = True
+    page.window.on_event = on_window_event
+
     # Load initial data
     load_bay_data_to_form()
 
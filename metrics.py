@@ -0,0 +1,216 @@
+"""Handler latency histograms, storage write time and an on-demand sampling profiler.
+
+Metrics are always collected (a timer and a lock per call) and served at
+/metrics in the Prometheus text format. The profiler is off until started
+through /debug/profiler/start (allowed when PROFILER_ENABLED=1); while it
+runs it samples the stacks of threads that are inside a timed handler and
+keeps the samples of calls slower than PROFILE_SLOW_MS.
+"""
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, List, Optional
+
+PROFILER_ENABLED = os.environ.get("PROFILER_ENABLED") == "1"
+# Handler calls slower than this keep their profiler samples
+PROFILE_SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS", "100"))
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# -------------------- Histograms --------------------
+class Histogram:
+    """Prometheus-style histogram with one label."""
+    def __init__(self, name: str, help: str, label: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series: Dict[str, List[float]] = {}  # label value -> bucket counts + [sum, count]
+
+    def observe(self, label_value: str, seconds: float):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1  # slower than every bucket: counted only in +Inf
+            series[-2] += seconds
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, label_value: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(label_value, time.perf_counter() - start)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {value: list(counts) for value, counts in self._series.items()}
+        for value, counts in sorted(series.items()):
+            label = f'{self.label}="{_escape(value)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {counts[-1]}')
+            lines.append(f"{self.name}_sum{{{label}}} {counts[-2]}")
+            lines.append(f"{self.name}_count{{{label}}} {counts[-1]}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+HANDLER_SECONDS = Histogram("gas_loading_handler_seconds", "Time spent in UI handlers.", "handler")
+STORAGE_WRITE_SECONDS = Histogram("gas_loading_storage_write_seconds", "Time spent writing to storage.", "operation")
+REPORT_SECONDS = Histogram("gas_loading_report_seconds", "Time to read and write a scheduled report.", "kind",
+                           buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0))
+_REGISTRY = [HANDLER_SECONDS, STORAGE_WRITE_SECONDS, REPORT_SECONDS]
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# -------------------- Sampling profiler --------------------
+class SamplingProfiler:
+    """Samples the stacks of threads running a timed handler.
+
+    Stacks are folded ("outer;inner;innermost" with a count), the format
+    flame graph tools read.
+    """
+    MAX_STACKS = 5000
+    MAX_DEPTH = 40
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active: Dict[int, list] = {}  # thread id -> [handler, depth, start, samples]
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.interval = 0.005
+        self.stacks: Counter = Counter()
+        self.slow_calls: deque = deque(maxlen=50)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, interval: float = 0.005):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.interval = interval
+            self.stacks.clear()
+            self.slow_calls.clear()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._active.clear()
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+
+    def enter(self, handler: str):
+        if self._thread is None:
+            return
+        ident = threading.get_ident()
+        with self._lock:
+            entry = self._active.get(ident)
+            if entry is None:
+                self._active[ident] = [handler, 1, time.time(), []]
+            else:
+                entry[1] += 1  # nested timed call; the outermost handler owns the samples
+
+    def exit(self, seconds: float):
+        if self._thread is None:
+            return
+        ident = threading.get_ident()
+        with self._lock:
+            entry = self._active.get(ident)
+            if entry is None:
+                return
+            entry[1] -= 1
+            if entry[1]:
+                return
+            del self._active[ident]
+        handler, _, started, samples = entry
+        if seconds * 1000 >= PROFILE_SLOW_MS:
+            self.slow_calls.append({
+                "handler": handler,
+                "started": started,
+                "ms": round(seconds * 1000, 1),
+                "stacks": Counter(samples).most_common(10),
+            })
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, entry in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is None or ident == own:
+                        continue
+                    stack = self._fold(entry[0], frame)
+                    entry[3].append(stack)
+                    if stack in self.stacks or len(self.stacks) < self.MAX_STACKS:
+                        self.stacks[stack] += 1
+
+    def _fold(self, handler: str, frame) -> str:
+        names = []
+        while frame is not None and len(names) < self.MAX_DEPTH:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        names.append(handler)
+        return ";".join(reversed(names))
+
+    def report(self, top: int = 50) -> dict:
+        with self._lock:
+            stacks = self.stacks.most_common(top)
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "stacks": [{"stack": stack, "samples": count} for stack, count in stacks],
+            "slow_calls": list(self.slow_calls),
+        }
+
+
+profiler = SamplingProfiler()
+
+
+def timed(handler: str) -> Callable:
+    """Records the latency of a handler (and profiler samples while profiling)."""
+    def decorate(fn: Callable) -> Callable:
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            profiler.enter(handler)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                HANDLER_SECONDS.observe(handler, elapsed)
+                profiler.exit(elapsed)
+        return wrapper
+    return decorate
@@ -0,0 +1,91 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import flet as ft
+
+# Minimum time (seconds) between two notifications in one session
+NOTIFY_INTERVAL = float(os.environ.get("NOTIFY_INTERVAL", "1.0"))
+# Distinct messages waiting to be shown; the oldest is dropped beyond this
+NOTIFY_QUEUE_SIZE = 5
+
+
+class Notifier:
+    """Shows a session's messages through one SnackBar that is reused.
+
+    The overlay holds a single control however many messages are shown.
+    Messages arriving faster than one per ``interval`` wait in a small queue;
+    a message repeated while waiting is shown once with a repeat count.
+    """
+    def __init__(self, page: ft.Page, interval: float = NOTIFY_INTERVAL,
+                 queue_size: int = NOTIFY_QUEUE_SIZE, duration: int = 2000):
+        self._page = page
+        self._interval = interval
+        self._queue_size = queue_size
+        self._lock = threading.Lock()
+        self._queue: "OrderedDict[Tuple[str, str], int]" = OrderedDict()  # (message, color) -> repeats
+        self._last_shown = float("-inf")
+        self._timer: Optional[threading.Timer] = None
+        self.snackbar = ft.SnackBar(content=ft.Text(""), duration=duration)
+        page.overlay.append(self.snackbar)
+
+    def show(self, message: str, color: str = ft.Colors.GREEN):
+        """Queues a message; it is shown now unless one was shown less than ``interval`` ago."""
+        with self._lock:
+            key = (message, color)
+            if key in self._queue:
+                self._queue[key] += 1
+            else:
+                self._queue[key] = 1
+                if len(self._queue) > self._queue_size:
+                    self._queue.popitem(last=False)
+            if self._timer is not None:
+                return
+            wait = self._last_shown + self._interval - time.monotonic()
+            if wait > 0:
+                self._start_timer(wait)
+                return
+            shown = self._take()
+        self._display(*shown)
+
+    def _take(self) -> Tuple[str, str, int]:
+        """Pops the oldest waiting message; call with the lock held."""
+        (message, color), count = self._queue.popitem(last=False)
+        self._last_shown = time.monotonic()
+        if self._queue:
+            self._start_timer(self._interval)
+        return message, color, count
+
+    def _start_timer(self, delay: float):
+        self._timer = threading.Timer(delay, self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+            if not self._queue:
+                return
+            shown = self._take()
+        self._display(*shown)
+
+    def _display(self, message: str, color: str, count: int):
+        snackbar = self.snackbar
+        if snackbar.open:
+            # Still showing the previous message; close it so the client opens it again
+            snackbar.open = False
+            self._page.update(snackbar)
+        snackbar.content.value = message if count == 1 else f"{message} (×{count})"
+        snackbar.bgcolor = color
+        snackbar.open = True
+        self._page.update(snackbar)
+
+    def close(self):
+        """Drops waiting messages; used when the session goes away."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._queue.clear()
@@ -0,0 +1,220 @@
+import re
+import sys
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from checklist import ALL_FIELDS, BOOKKEEPING, NUMBER, TIMESTAMP, rename_legacy
+
+# Every field of a loading record and how its value is stored, generated
+# from the checklist definition.
+FIELDS: Tuple[Tuple[str, str], ...] = tuple((field.key, field.kind) for field in ALL_FIELDS)
+FIELD_KINDS: Dict[str, str] = dict(FIELDS)
+
+# Text fields that only accept one of a fixed set of values
+CHOICES: Dict[str, Tuple[str, ...]] = {field.key: field.choices for field in ALL_FIELDS if field.choices}
+
+# Text fields whose values repeat from load to load (bays, companies, people):
+# equal values share one string instead of a copy per record
+SHARED_TEXT_FIELDS = frozenset({"bay_number", "carrier_name", "customer_name", "checker_name",
+                                "technician_name", "weight_checker"})
+
+# Fields filled in by the store rather than by an operator
+BOOKKEEPING_FIELDS = tuple(field.key for field in BOOKKEEPING)
+_CONTENT_FIELDS = tuple(name for name, _ in FIELDS if name not in BOOKKEEPING_FIELDS)
+
+# Fields an instrument (weighbridge, DCS) may report: quantities, pressures,
+# flows and the moments of the Loading steps. Names and choices stay with
+# the operators.
+READING_FIELDS = frozenset(name for name in _CONTENT_FIELDS
+                           if FIELD_KINDS[name] == NUMBER
+                           or (FIELD_KINDS[name] == TIMESTAMP and name != "admin_saved_time"))
+
+# Timestamp text formats of the existing JSON layout
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+ISO_FIELDS = {"completed_time"}
+
+_INTEGER_RE = re.compile(r"^[+-]?\d+$")
+
+
+def parse_number(text: str):
+    """Parses a quantity typed by an operator; thousands separators are allowed."""
+    text = text.strip().replace(",", "")
+    if _INTEGER_RE.match(text):
+        return int(text)
+    value = float(text)
+    if value != value or value in (float("inf"), float("-inf")):
+        raise ValueError(f"{text!r} is not a finite number")
+    return value
+
+
+def parse_timestamp(text: str) -> int:
+    """Converts 'YYYY-MM-DD HH:MM:SS' or an ISO timestamp to epoch seconds."""
+    return int(datetime.fromisoformat(text.strip()).timestamp())
+
+
+def format_timestamp(epoch: int, iso: bool = False) -> str:
+    moment = datetime.fromtimestamp(epoch)
+    return moment.isoformat() if iso else moment.strftime(TIMESTAMP_FORMAT)
+
+
+def _parse_text(key: str) -> Callable[[Any], Any]:
+    choices = CHOICES.get(key)
+    if not choices:
+        if key in SHARED_TEXT_FIELDS:
+            return lambda value: sys.intern(value) if type(value) is str else value
+        return lambda value: value
+    # Every record holding a choice points at the same string
+    canonical = {choice: choice for choice in choices}
+
+    def parse(value):
+        try:
+            return canonical[value]
+        except (KeyError, TypeError):
+            raise ValueError(f"{value!r} is not one of {', '.join(choices)}") from None
+    return parse
+
+
+def _parse_number(value):
+    return parse_number(value) if isinstance(value, str) else value
+
+
+def _parse_timestamp(value):
+    if isinstance(value, str):
+        return parse_timestamp(value)
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    return int(value) if isinstance(value, float) else value
+
+
+def _timestamp_formatter(key: str) -> Callable[[Any], str]:
+    iso = key in ISO_FIELDS
+    return lambda value: format_timestamp(value, iso)
+
+
+# Each field's parser and formatter, picked once from its kind
+_PARSERS: Dict[str, Callable[[Any], Any]] = {
+    name: _parse_number if kind == NUMBER else _parse_timestamp if kind == TIMESTAMP else _parse_text(name)
+    for name, kind in FIELDS
+}
+_FORMATTERS: Dict[str, Callable[[Any], str]] = {
+    name: _timestamp_formatter(name) if kind == TIMESTAMP else str for name, kind in FIELDS
+}
+_FORMAT_ORDER = tuple(_FORMATTERS.items())
+
+
+class LoadingRecord:
+    """One truck load: the admin order plus every checklist step.
+
+    Values are converted once, when they are set: numbers are int/float,
+    timestamps are epoch seconds and text stays text. Unset fields are None.
+    Keys that are not part of FIELDS (old or hand-edited data) are kept in
+    ``extra`` so converting back to JSON loses nothing.
+    """
+    __slots__ = tuple(name for name, _ in FIELDS) + ("id", "extra")
+
+    def __init__(self):
+        for name, _ in FIELDS:
+            setattr(self, name, None)
+        self.id: Optional[int] = None
+        self.extra: Optional[Dict[str, Any]] = None
+
+    # -------------------- Conversion --------------------
+    def set(self, key: str, value):
+        """Validates and stores a value given as text (or already typed).
+
+        Raises ValueError if the text does not fit the field's kind.
+        """
+        parse = _PARSERS.get(key)
+        if parse is None:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+            return
+        if value is None or (isinstance(value, str) and not value.strip()):
+            value = None
+        else:
+            value = parse(value)
+        setattr(self, key, value)
+
+    def get(self, key: str, default=None):
+        """Returns the typed value of a field, or ``default`` if it is unset."""
+        if key in FIELD_KINDS:
+            value = getattr(self, key)
+        elif key == "id":
+            value = self.id
+        else:
+            value = self.extra.get(key) if self.extra else None
+        return default if value is None else value
+
+    def text(self, key: str, default: str = "") -> str:
+        """Returns a field formatted the way the form and the JSON file show it."""
+        value = self.get(key)
+        if value is None:
+            return default
+        return _FORMATTERS.get(key, str)(value)
+
+    def cell(self, key: str):
+        """Returns a field as a spreadsheet value: numbers stay numbers, timestamps become datetimes."""
+        value = self.get(key)
+        if value is not None and FIELD_KINDS.get(key) == TIMESTAMP:
+            return datetime.fromtimestamp(value)
+        return value
+
+    def row(self, columns: Iterable[str]) -> List[Any]:
+        return [self.cell(column) for column in columns]
+
+    @classmethod
+    def from_json(cls, data: dict) -> "LoadingRecord":
+        """Builds a record from the JSON layout (all values as text).
+
+        A stored value that no longer parses is kept as-is in ``extra``
+        rather than dropped. Field names of the old desktop layout are renamed.
+        """
+        record = cls()
+        for key, value in rename_legacy(data).items():
+            if key == "id":
+                record.id = value
+                continue
+            try:
+                record.set(key, value)
+            except ValueError:
+                if record.extra is None:
+                    record.extra = {}
+                record.extra[key] = value
+        return record
+
+    def to_json(self) -> dict:
+        """Converts back to the JSON layout, skipping unset fields."""
+        data = {}
+        for name, format_value in _FORMAT_ORDER:
+            value = getattr(self, name)
+            if value is not None:
+                data[name] = format_value(value)
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def update(self, values: Dict[str, Any]) -> Dict[str, str]:
+        """Sets several fields; returns {key: error} for the values that were rejected."""
+        errors = {}
+        for key, value in values.items():
+            try:
+                self.set(key, value)
+            except ValueError as ex:
+                errors[key] = str(ex)
+        return errors
+
+    def copy(self) -> "LoadingRecord":
+        record = LoadingRecord()
+        for name in self.__slots__:
+            setattr(record, name, getattr(self, name))
+        if self.extra:
+            record.extra = dict(self.extra)
+        return record
+
+    def __bool__(self) -> bool:
+        """True if any field other than the store's bookkeeping has a value."""
+        return any(getattr(self, name) is not None for name in _CONTENT_FIELDS) or bool(self.extra)
+
+    def __repr__(self) -> str:
+        return f"LoadingRecord(id={self.id!r}, bay_number={self.bay_number!r}, order_no={self.order_no!r})"
@@ -0,0 +1,328 @@
+"""Shift and daily Excel reports, generated on schedule as each shift ends.
+
+Shifts come from REPORT_SHIFTS, in order, as "name=HH:MM" start times:
+each shift ends when the next one starts and the last one when the first
+starts again, so together they cover a production day of 24 hours. The
+default is four shifts of six hours, A to D from midnight. A shift report
+holds the loads completed between the shift's start and end; a daily
+report those of the whole production day. Both are named after the day
+the production day starts on and written to REPORT_DIR/<site>/, e.g.
+reports/main/2025-09-17_shift_A.xlsx.
+
+The workbooks are written by a pool of worker processes that read the
+loads from the database themselves, so neither the event loop nor the
+sessions' threads wait on openpyxl (with the in-memory storage the
+scheduler's own thread reads them and hands the rows over). A report whose file
+already exists is not written again, which makes reruns harmless; after
+downtime the missed reports are caught up, oldest first, back to
+REPORT_KEEP_DAYS. Reports older than that are deleted.
+
+Generate the reports of a day by hand (again, with --force), with
+GAS_LOADING_DB pointing at the database:
+
+    python -m reports 2025-09-17 [--site T2] [--force]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from export import write_report
+from metrics import REPORT_SECONDS
+from storage import SQLiteStorage
+
+# Where scheduled reports are kept, one folder per site
+REPORT_DIR = os.environ.get("REPORT_DIR", "reports")
+# Shift start times, in order; see the module docstring
+REPORT_SHIFTS = os.environ.get("REPORT_SHIFTS", "A=00:00,B=06:00,C=12:00,D=18:00")
+# Reports are kept (and missed ones caught up) this many days back
+REPORT_KEEP_DAYS = int(os.environ.get("REPORT_KEEP_DAYS", "90"))
+# Worker processes writing workbooks; 0 turns the scheduler off
+REPORT_WORKERS = int(os.environ.get("REPORT_WORKERS", "2"))
+# Longest sleep between checks, so a clock change is noticed within it
+REPORT_CHECK_INTERVAL = 15 * 60
+# Seconds before a failed round is tried again
+REPORT_RETRY = 60
+
+_NAME_RE = re.compile(r"^[A-Za-z0-9_-]+$")
+_FILENAME_RE = re.compile(r"^(\d{4}-\d{2}-\d{2})_(daily|shift_[A-Za-z0-9_-]+)\.xlsx$")
+# Remembers, per site, the time up to which every due report was written
+_STATE_FILE = "schedule.json"
+
+
+class Shift(NamedTuple):
+    name: str
+    start: timedelta  # from midnight of the day the production day starts on
+    end: timedelta
+
+
+class ReportJob(NamedTuple):
+    site_id: str
+    day: date
+    shift: Optional[str]  # None for the daily report
+    start: datetime
+    end: datetime
+
+    @property
+    def filename(self) -> str:
+        return f"{self.day.isoformat()}_{'daily' if self.shift is None else 'shift_' + self.shift}.xlsx"
+
+
+def parse_shifts(text: str) -> Tuple[Shift, ...]:
+    """Reads "A=06:00,B=14:00,C=22:00"; raises ValueError if the shifts do not fit in one day."""
+    starts = []
+    for entry in text.split(","):
+        name, _, clock = entry.strip().partition("=")
+        if not _NAME_RE.match(name):
+            raise ValueError(f"Shift name {name!r} may only use letters, digits, '_' and '-'")
+        parsed = datetime.strptime(clock.strip(), "%H:%M")
+        start = timedelta(hours=parsed.hour, minutes=parsed.minute)
+        # Later shifts may run past midnight
+        while starts and start <= starts[-1][1]:
+            start += timedelta(days=1)
+        starts.append((name, start))
+    if len({name for name, _ in starts}) != len(starts):
+        raise ValueError("Shift names must be distinct")
+    day_end = starts[0][1] + timedelta(days=1)
+    if starts[-1][1] >= day_end:
+        raise ValueError(f"Shifts {text!r} take more than a day")
+    ends = [start for _, start in starts[1:]] + [day_end]
+    return tuple(Shift(name, start, end) for (name, start), end in zip(starts, ends))
+
+
+def day_jobs(site_id: str, day: date, shifts: Sequence[Shift]) -> List[ReportJob]:
+    """The shift reports of a production day, then its daily report."""
+    midnight = datetime.combine(day, datetime.min.time())
+    jobs = [ReportJob(site_id, day, shift.name, midnight + shift.start, midnight + shift.end) for shift in shifts]
+    jobs.append(ReportJob(site_id, day, None, midnight + shifts[0].start, midnight + shifts[-1].end))
+    return jobs
+
+
+def due_jobs(site_id: str, shifts: Sequence[Shift], after: datetime, until: datetime) -> List[ReportJob]:
+    """Reports whose period ended after ``after`` and by ``until``, in the order they ended."""
+    jobs = []
+    day = after.date() - timedelta(days=2)  # a production day can end two calendar days after it starts
+    while day <= until.date():
+        jobs.extend(job for job in day_jobs(site_id, day, shifts) if after < job.end <= until)
+        day += timedelta(days=1)
+    jobs.sort(key=lambda job: (job.end, job.shift is None))
+    return jobs
+
+
+# Databases a worker process has opened, by path
+_worker_storage: Dict[str, SQLiteStorage] = {}
+
+
+def write_from_database(db_path: str, start: datetime, end: datetime, path: str, fields: Sequence[str]) -> int:
+    """Writes one report in a worker process, reading its loads there; returns the number of rows."""
+    storage = _worker_storage.get(db_path)
+    if storage is None:
+        storage = _worker_storage[db_path] = SQLiteStorage(db_path)
+    records = storage.query_completed(start=start, end=end)
+    return write_report(path, ([record.bay_number, *record.row(fields)] for record in records), ["bay_number", *fields])
+
+
+def report_path(site_id: str, filename: str, directory: str = REPORT_DIR) -> Optional[str]:
+    """Returns the path of a scheduled report, or None if the names are not ours."""
+    if not _NAME_RE.match(site_id) or not _FILENAME_RE.match(filename):
+        return None
+    return os.path.join(directory, site_id, filename)
+
+
+class ReportScheduler:
+    """Writes every site's shift and daily reports as their periods end.
+
+    ``systems`` maps site ids to their GasLoadingSystem; ``fields`` are the
+    record fields written after the bay number. One thread decides what is
+    due and reads the loads; the workbooks are written by a process pool
+    started on first use.
+    """
+    def __init__(self, systems: Dict[str, object], fields: Sequence[str], directory: str = REPORT_DIR,
+                 shifts: str = REPORT_SHIFTS, keep_days: int = REPORT_KEEP_DAYS, workers: int = REPORT_WORKERS):
+        self.systems = systems
+        self.columns = ["bay_number", *fields]
+        self.fields = list(fields)
+        self.directory = directory
+        self.shifts = parse_shifts(shifts)
+        self.keep_days = keep_days
+        self.workers = workers
+        self.last_error: Optional[str] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Starts checking for due reports in the background; does nothing with no workers."""
+        if self.workers <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="report-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the scheduler; a report being written is finished first."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_due(datetime.now())
+                self.last_error = None
+                wait = min(self.seconds_to_next(datetime.now()), REPORT_CHECK_INTERVAL)
+            except Exception as ex:
+                self.last_error = f"{datetime.now().isoformat(timespec='seconds')}: {ex}"
+                wait = REPORT_RETRY
+            self._stop.wait(wait)
+
+    def seconds_to_next(self, now: datetime) -> float:
+        """Seconds until the next shift ends."""
+        upcoming = due_jobs("", self.shifts, now, now + timedelta(days=1))
+        return max((upcoming[0].end - now).total_seconds(), 1) if upcoming else REPORT_CHECK_INTERVAL
+
+    # -------------------- One round --------------------
+    def run_due(self, now: datetime) -> int:
+        """Writes every site's reports that are due and missing, then removes expired ones.
+
+        Returns the number of reports written. A site's progress is saved
+        only once all of its due reports exist, so a failed round is simply
+        run again.
+        """
+        written = 0
+        horizon = now - timedelta(days=self.keep_days)
+        for site_id, system in self.systems.items():
+            done_until = self._load_state(site_id)
+            if done_until is None:
+                # First run at this site: start with the shift under way
+                self._save_state(site_id, now)
+                continue
+            jobs = due_jobs(site_id, self.shifts, max(done_until, horizon), now)
+            written += self.write(system, jobs)
+            if self._stop.is_set():
+                break  # the rest of the backlog is left for the next start
+            self._save_state(site_id, now)
+            self.prune(site_id, now.date())
+        return written
+
+    def write(self, system, jobs: Sequence[ReportJob], force: bool = False) -> int:
+        """Writes the reports of ``jobs`` that do not exist yet (all of them with ``force``).
+
+        At most one report per worker is queued, so a long backlog neither
+        holds many days of loads in memory nor keeps the storage busy for long
+        at a time. Raises the errors once the other reports are done.
+        """
+        pending: List[Tuple[ReportJob, Future, float]] = []
+        written = 0
+        errors = []
+
+        def collect(entry):
+            nonlocal written
+            job, future, started = entry
+            try:
+                future.result()
+                written += 1
+                REPORT_SECONDS.observe("shift" if job.shift else "daily", time.perf_counter() - started)
+            except Exception as ex:
+                errors.append(f"{job.site_id}/{job.filename}: {ex}")
+
+        for job in jobs:
+            path = os.path.join(self.directory, job.site_id, job.filename)
+            if not force and os.path.exists(path):
+                continue
+            if len(pending) >= self.workers:
+                collect(pending.pop(0))
+            if self._stop.is_set():
+                break
+            started = time.perf_counter()
+            if isinstance(system.storage, SQLiteStorage):
+                future = self._executor().submit(write_from_database, system.storage.path, job.start, job.end,
+                                                 path, self.fields)
+            else:
+                # The loads only exist in this process
+                rows = [[record.bay_number, *record.row(self.fields)]
+                        for record in system.query_completed(start=job.start, end=job.end)]
+                future = self._executor().submit(write_report, path, rows, self.columns)
+            pending.append((job, future, started))
+        for entry in pending:
+            collect(entry)
+        if errors:
+            raise RuntimeError("; ".join(errors))
+        return written
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Spawned, not forked: the server's threads and locks stay behind
+            self._pool = ProcessPoolExecutor(max(self.workers, 1), mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def prune(self, site_id: str, today: date):
+        """Deletes the site's reports of days more than ``keep_days`` ago."""
+        folder = os.path.join(self.directory, site_id)
+        if not os.path.isdir(folder):
+            return
+        cutoff = (today - timedelta(days=self.keep_days)).isoformat()
+        for filename in os.listdir(folder):
+            match = _FILENAME_RE.match(filename)
+            if match and match.group(1) < cutoff:
+                os.remove(os.path.join(folder, filename))
+
+    def reports(self, site_id: str) -> List[str]:
+        """The site's report files, newest day first."""
+        folder = os.path.join(self.directory, site_id)
+        if not os.path.isdir(folder):
+            return []
+        return sorted((name for name in os.listdir(folder) if _FILENAME_RE.match(name)), reverse=True)
+
+    # -------------------- Progress --------------------
+    def _load_state(self, site_id: str) -> Optional[datetime]:
+        try:
+            with open(os.path.join(self.directory, site_id, _STATE_FILE), "r", encoding="utf-8") as f:
+                return datetime.fromisoformat(json.load(f)["done_until"])
+        except FileNotFoundError:
+            return None
+
+    def _save_state(self, site_id: str, done_until: datetime):
+        folder = os.path.join(self.directory, site_id)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, _STATE_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"done_until": done_until.isoformat(timespec="seconds")}, f)
+        os.replace(path + ".tmp", path)
+
+
+def main() -> int:
+    from app import EXPORT_FIELDS, SITES, gas_systems
+    from storage import command_line_site
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("day", type=date.fromisoformat, help="production day (YYYY-MM-DD)")
+    parser.add_argument("--site", default=None, help="site id (with several sites configured)")
+    parser.add_argument("--force", action="store_true", help="write reports that already exist again")
+    args = parser.parse_args()
+
+    site = command_line_site(args.site, SITES, "there is no stored history to report on")
+    if site is None:
+        return 2
+    scheduler = ReportScheduler(gas_systems, EXPORT_FIELDS, workers=max(REPORT_WORKERS, 1))
+    try:
+        written = scheduler.write(gas_systems[site.id], day_jobs(site.id, args.day, scheduler.shifts), args.force)
+    finally:
+        scheduler.stop()
+    print(f"Wrote {written} reports of {args.day} to {os.path.join(scheduler.directory, site.id)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""Production rollups: truck count and load_qty per day, shift, bay and customer.
+
+Each storage backend keeps one running total per (day, shift, bay_number,
+customer_name), updated as loads are completed or imported, so totals for
+any grouping and date range add up a few hundred rows a day at most and
+never read the completed history. The day is the completion date.
+
+Rebuild the totals from the history (after editing the database by hand,
+say), with GAS_LOADING_DB pointing at the database:
+
+    python -m rollups [--site T2]
+"""
+import argparse
+import sys
+import time
+from datetime import date, datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from records import LoadingRecord, format_timestamp, parse_number
+
+# What totals can be grouped and filtered by, in key order
+DIMENSIONS = ("day", "shift", "bay_number", "customer_name")
+# (day, shift, bay_number, customer_name); unset values are ''
+RollupKey = Tuple[str, str, str, str]
+# Record fields a key and quantity are read from when rebuilding
+SOURCE_FIELDS = ("completed_time", "shift", "bay_number", "customer_name", "load_qty")
+
+DayBound = Optional[Union[str, date]]
+
+
+def rollup_key(record: LoadingRecord) -> RollupKey:
+    return (format_timestamp(record.completed_time, iso=True)[:10], record.text("shift"),
+            record.text("bay_number"), record.text("customer_name"))
+
+
+def rollup_qty(record: LoadingRecord) -> float:
+    """load_qty as a number; a load without one (or with text that never parsed) still counts as a truck."""
+    value = record.load_qty
+    return value if isinstance(value, (int, float)) else 0
+
+
+def entries_from_texts(rows: Iterable[Tuple[int, Tuple[str, ...]]]) -> Iterator[Tuple[RollupKey, float]]:
+    """(key, load_qty) of each load streamed as texts of SOURCE_FIELDS (see iter_completed_fields)."""
+    for _, (completed_time, shift, bay_number, customer_name, load_qty) in rows:
+        try:
+            qty = parse_number(load_qty) if load_qty else 0
+        except ValueError:
+            qty = 0
+        yield (completed_time[:10], shift, bay_number, customer_name), qty
+
+
+def day_bound(value: DayBound) -> Optional[str]:
+    """A day as 'YYYY-MM-DD'; datetimes and dates are cut to their date."""
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def check_dimensions(by: Sequence[str]):
+    unknown = [name for name in by if name not in DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Cannot group rollups by {', '.join(unknown)}; expected some of {', '.join(DIMENSIONS)}")
+
+
+def summarize(entries: Iterable[Tuple[RollupKey, int, float]], by: Sequence[str],
+              filters: Dict[str, Optional[str]]) -> List[dict]:
+    """Adds up (key, loads, load_qty) entries per value of ``by``, keeping those that match ``filters``."""
+    positions = [DIMENSIONS.index(name) for name in by]
+    checks = [(DIMENSIONS.index(name), value) for name, value in filters.items() if value is not None]
+    totals: Dict[tuple, List[float]] = {}
+    for key, loads, qty in entries:
+        if any(key[position] != value for position, value in checks):
+            continue
+        group = tuple(key[position] for position in positions)
+        total = totals.get(group)
+        if total is None:
+            totals[group] = [loads, qty]
+        else:
+            total[0] += loads
+            total[1] += qty
+    return [dict(zip(by, group), loads=loads, load_qty=qty) for group, (loads, qty) in sorted(totals.items())]
+
+
+def main() -> int:
+    from sites import load_sites
+    from storage import command_line_site, open_storage
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--site", default=None, help="site id (with several sites configured)")
+    args = parser.parse_args()
+
+    sites = load_sites()
+    site = command_line_site(args.site, sites, "there is no stored history to rebuild from")
+    if site is None:
+        return 2
+    storage = open_storage(site.id if len(sites) > 1 else None)
+    start = time.perf_counter()
+    try:
+        storage.rebuild_rollups()
+        rows = storage.rollup(("day",))
+    finally:
+        storage.close()
+    print(f"Rebuilt rollups of {sum(row['loads'] for row in rows):,} loads over {len(rows):,} days "
+          f"in {time.perf_counter() - start:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,356 @@
+"""Search over the license plates, carriers, customers and order numbers of loads.
+
+Each distinct field value is indexed once, by its character trigrams, and
+points to the loads that have it. Plates, carriers and customers repeat
+across thousands of loads, so the index grows with the number of distinct
+values rather than with the history. Text is compared case-folded in NFKC
+form with spaces, dashes, dots and slashes removed: 'กข 1234', 'กข-1234'
+and 'กข1234' are the same plate, and Thai, which has no spaces between
+words, is matched anywhere inside a value like Latin text.
+"""
+import bisect
+import gc
+import heapq
+import re
+import threading
+import unicodedata
+from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple
+
+from records import LoadingRecord
+
+# Fields a load can be found by
+SEARCH_FIELDS = ("license_front", "license_rear", "carrier_name", "customer_name", "order_no")
+# Fields that change what the index holds for a load (search text or filter values)
+INDEXED_FIELDS = frozenset(SEARCH_FIELDS) | {"shift", "admin_saved_time"}
+ACTIVE = "active"
+COMPLETED = "completed"
+
+# ("active", bay_number) or ("completed", record id)
+DocKey = Tuple[str, Any]
+# Search values, bay_number, shift and the load's time: its completion, or
+# for an active bay when its admin order was saved (0 before that)
+Entry = Tuple[FrozenSet[str], str, str, int]
+
+GRAM = 3
+# Above this many candidate loads (or values), walking the history newest
+# first usually finds a page sooner than collecting and ranking every candidate
+SCAN_THRESHOLD = 5000
+# Loads looked at by that walk before falling back to ranking the candidates
+SCAN_LIMIT = 2000
+_SEPARATORS = re.compile(r"[\s\-./]+")
+
+
+@lru_cache(maxsize=1 << 16)
+def normalize(text: str) -> str:
+    return _SEPARATORS.sub("", unicodedata.normalize("NFKC", text).casefold())
+
+
+def _grams(value: str) -> Set[str]:
+    return {value[i:i + GRAM] for i in range(len(value) - GRAM + 1)}
+
+
+def _epoch(value) -> Optional[int]:
+    if value is None:
+        return None
+    return int(value.timestamp()) if isinstance(value, datetime) else int(value)
+
+
+class _Word:
+    """One word of a query, to be found anywhere in a value or, if ``prefix``, at its start.
+
+    ``values`` are the indexed values that match it, or None while that set
+    is too large to be worth building; the word is then tested on each value.
+    A prefix word made by starting() shares the work of resolving with its
+    word.
+    """
+    __slots__ = ("term", "prefix", "values", "source")
+
+    def __init__(self, term: str, prefix: bool, values: Optional[Set[str]], source: Optional["_Word"] = None):
+        self.term = term
+        self.prefix = prefix
+        self.values = values
+        self.source = source
+
+    def starting(self) -> "_Word":
+        values = None if self.values is None else {value for value in self.values if value.startswith(self.term)}
+        return _Word(self.term, True, values, self)
+
+    def test(self, doc_values: FrozenSet[str]) -> bool:
+        if self.values is not None:
+            return not doc_values.isdisjoint(self.values)
+        if self.prefix:
+            return any(value.startswith(self.term) for value in doc_values)
+        return any(self.term in value for value in doc_values)
+
+    def resolve(self, index: "SearchIndex"):
+        """Builds ``values`` however large it is."""
+        if self.values is not None:
+            return
+        if self.source is None:
+            self.values = index._values_containing(self.term, bounded=False)
+        else:
+            self.source.resolve(index)
+            self.values = {value for value in self.source.values if value.startswith(self.term)}
+
+
+class SearchIndex:
+    """Finds active bays and completed loads by part of any SEARCH_FIELDS value.
+
+    Writers only note the latest values of a load (put/remove never wait for
+    a search); the next search applies them. The index is built from
+    ``load``, which yields (key, texts of SEARCH_FIELDS, bay_number, shift,
+    time as in Entry), the first time it is searched or warmed. Until then
+    writers note nothing: they update the store first, so the build finds it.
+    """
+    def __init__(self, load: Callable[[], Iterable[Tuple[DocKey, Sequence[str], str, str, int]]]):
+        self._load = load
+        self._built = False
+        self._build_started = False
+        self._lock = threading.Lock()
+        self._docs: Dict[DocKey, Entry] = {}
+        self._postings: Dict[str, Set[DocKey]] = {}  # value -> loads that have it
+        self._grams: Dict[str, Set[str]] = {}  # trigram -> values that contain it
+        self._short: Set[str] = set()  # values too short to have a trigram
+        self._timeline: List[Tuple[int, int]] = []  # (completed_time, id) of completed loads, oldest first
+        self._active: Set[DocKey] = set()
+        self._pending: Dict[DocKey, Optional[Entry]] = {}
+        self._pending_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._docs)
+
+    # -------------------- Updates --------------------
+    def put(self, key: DocKey, texts: Iterable[str], bay_number: str, shift: str = "", moment: int = 0):
+        """Sets what a load is found by; a load without any search text is removed."""
+        if not self._build_started:
+            return
+        values = frozenset(value for value in map(normalize, texts) if value)
+        entry = (values, bay_number, shift or "", moment or 0) if values else None
+        with self._pending_lock:
+            self._pending[key] = entry
+
+    def put_record(self, key: DocKey, bay_number: str, record: LoadingRecord):
+        if not self._build_started:
+            return
+        moment = record.admin_saved_time if key[0] == ACTIVE else record.completed_time
+        self.put(key, (record.text(field) for field in SEARCH_FIELDS), bay_number, record.text("shift"), moment or 0)
+
+    def remove(self, key: DocKey):
+        if not self._build_started:
+            return
+        with self._pending_lock:
+            self._pending[key] = None
+
+    def warm(self):
+        """Builds the index now rather than on the first search."""
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self):
+        if not self._built:
+            self._build()
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        for key, entry in pending.items():
+            self._apply(key, entry)
+
+    def _build(self):
+        """Indexes everything ``load`` yields; the same as _apply on each load, with less bookkeeping."""
+        # The build creates millions of small sets and tuples, none of them
+        # cyclic; garbage collection passes over them would double its time
+        collecting = gc.isenabled()
+        gc.disable()
+        self._build_started = True  # from here on writers note their changes for the next refresh
+        try:
+            self._build_from(self._load())
+        finally:
+            if collecting:
+                gc.enable()
+        self._timeline = sorted((entry[3], key[1]) for key, entry in self._docs.items() if key[0] == COMPLETED)
+        self._built = True
+
+    def _build_from(self, entries: Iterable[Tuple[DocKey, Sequence[str], str, str, int]]):
+        postings = self._postings
+        for key, texts, bay_number, shift, moment in entries:
+            values = frozenset(value for value in map(normalize, texts) if value)
+            if not values:
+                continue
+            self._docs[key] = (values, bay_number, shift or "", moment or 0)
+            if key[0] == ACTIVE:
+                self._active.add(key)
+            for value in values:
+                docs = postings.get(value)
+                if docs is None:
+                    docs = postings[value] = set()
+                    self._index_value(value)
+                docs.add(key)
+
+    def _index_value(self, value: str):
+        if len(value) < GRAM:
+            self._short.add(value)
+        for gram in _grams(value):
+            self._grams.setdefault(gram, set()).add(value)
+
+    def _apply(self, key: DocKey, entry: Optional[Entry]):
+        old = self._docs.pop(key, None)
+        if entry is not None:
+            self._docs[key] = entry
+        if key[0] == ACTIVE:
+            if entry is None:
+                self._active.discard(key)
+            else:
+                self._active.add(key)
+        else:
+            if old is not None:
+                del self._timeline[bisect.bisect_left(self._timeline, (old[3], key[1]))]
+            if entry is not None:
+                bisect.insort(self._timeline, (entry[3], key[1]))
+        old_values = old[0] if old else frozenset()
+        new_values = entry[0] if entry else frozenset()
+        for value in old_values - new_values:
+            docs = self._postings[value]
+            docs.discard(key)
+            if not docs:
+                del self._postings[value]
+                self._short.discard(value)
+                for gram in _grams(value):
+                    values = self._grams[gram]
+                    values.discard(value)
+                    if not values:
+                        del self._grams[gram]
+        for value in new_values - old_values:
+            docs = self._postings.get(value)
+            if docs is None:
+                docs = self._postings[value] = set()
+                self._index_value(value)
+            docs.add(key)
+
+    # -------------------- Search --------------------
+    def _values_containing(self, term: str, bounded: bool = True) -> Optional[Set[str]]:
+        """The indexed values that contain ``term``.
+
+        If ``bounded``, returns None instead of checking every value for a
+        term shorter than a trigram, or over SCAN_THRESHOLD candidates for a
+        longer one.
+        """
+        if len(term) < GRAM:
+            if bounded:
+                return None
+            # Any longer value that contains the term has a trigram that does
+            values = {value for value in self._short if term in value}
+            for gram, gram_values in self._grams.items():
+                if term in gram:
+                    values |= gram_values
+            return values
+        candidates = sorted((self._grams.get(gram, set()) for gram in _grams(term)), key=len)
+        if bounded and len(candidates[0]) > SCAN_THRESHOLD:
+            return None
+        return {value for value in candidates[0] if term in value}
+
+    def _loads_with(self, values: Set[str]) -> int:
+        """How many loads have any of ``values``, counted up to SCAN_THRESHOLD."""
+        count = 0
+        for value in values:
+            count += len(self._postings[value])
+            if count > SCAN_THRESHOLD:
+                break
+        return count
+
+    def _newest(self, words: List[_Word], accept: Optional[Callable[[DocKey], bool]],
+                count: int) -> List[DocKey]:
+        """Up to ``count`` completed loads, newest first, that match every word and pass ``accept`` (if given)."""
+        def matches(key: DocKey, words: List[_Word] = words) -> bool:
+            if words:
+                values = self._docs[key][0]
+                if not all(word.test(values) for word in words):
+                    return False
+            return accept is None or accept(key)
+
+        def ranked(values: Set[str]) -> List[DocKey]:
+            # The loads of ``values`` match their own word already
+            others = [word for word in words if word.values is not values]
+            candidates = {key for value in values for key in self._postings[value] if key[0] == COMPLETED}
+            return heapq.nlargest(count, (key for key in candidates if matches(key, others)),
+                                  key=lambda key: (self._docs[key][3], key[1]))
+
+        if count <= 0:
+            return []
+        known = [word.values for word in words if word.values is not None]
+        narrowest = min(known, key=self._loads_with, default=None)
+        if narrowest is not None and self._loads_with(narrowest) <= SCAN_THRESHOLD:
+            return ranked(narrowest)
+        # Common words: the newest loads are likely to match
+        found = []
+        for _, record_id in islice(reversed(self._timeline), SCAN_LIMIT):
+            key = (COMPLETED, record_id)
+            if matches(key):
+                found.append(key)
+                if len(found) == count:
+                    return found
+        if len(self._timeline) > SCAN_LIMIT:
+            # Rare after all: rank the loads of one word's values (the longest word is likely the rarest)
+            if narrowest is None:
+                word = max(words, key=lambda word: len(word.term))
+                word.resolve(self)
+                narrowest = word.values
+            return ranked(narrowest)
+        return found
+
+    def search(self, text: str, filters: Optional[dict] = None, kinds: Sequence[str] = (ACTIVE, COMPLETED),
+               offset: int = 0, limit: int = 25) -> Tuple[List[DocKey], Optional[int]]:
+        """Returns the keys of one page of loads matching every word of ``text`` and the next page's offset.
+
+        A word matches when it is part of any search value of the load.
+        Active bays come first, then completed loads where every word starts
+        a value, then the rest; newest first within each. ``filters`` takes
+        bay_number, shift and start/end, as in the review table: an active bay
+        is dated by its admin order and is outside any range until it is saved.
+        """
+        terms = [term for term in map(normalize, text.split()) if term]
+        if not terms:
+            return [], None
+        filters = filters or {}
+        bay_number, shift = filters.get("bay_number"), filters.get("shift")
+        start, end = _epoch(filters.get("start")), _epoch(filters.get("end"))
+
+        def passes_filters(key: DocKey) -> bool:
+            _, entry_bay, entry_shift, moment = self._docs[key]
+            if bay_number is not None and entry_bay != bay_number:
+                return False
+            if shift is not None and entry_shift != shift:
+                return False
+            if start is not None or end is not None:
+                # An active bay without a saved admin order has no date yet
+                if not moment or (start is not None and moment < start) or (end is not None and moment >= end):
+                    return False
+            return True
+
+        wanted = offset + limit + 1
+        with self._lock:
+            self._refresh()
+            contain_words = [_Word(term, False, self._values_containing(term)) for term in terms]
+            start_words = [word.starting() for word in contain_words]
+
+            keys: List[DocKey] = []
+            if ACTIVE in kinds:
+                keys = sorted((key for key in self._active if passes_filters(key)
+                               and all(word.test(self._docs[key][0]) for word in contain_words)),
+                              key=lambda key: key[1])
+            if COMPLETED in kinds:
+                def starts_every_word(key: DocKey) -> bool:
+                    return all(word.test(self._docs[key][0]) for word in start_words)
+
+                filtered = any(value is not None for value in (bay_number, shift, start, end))
+                keys += self._newest(start_words, passes_filters if filtered else None, wanted - len(keys))
+                keys += self._newest(contain_words,
+                                     lambda key: (not filtered or passes_filters(key)) and not starts_every_word(key),
+                                     wanted - len(keys))
+        if len(keys) <= offset + limit:
+            return keys[offset:], None
+        return keys[offset:offset + limit], offset + limit
+
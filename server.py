@@ -0,0 +1,185 @@
+import os
+import secrets
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+import flet.fastapi as flet_fastapi
+from fastapi import FastAPI, Header, HTTPException, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+from pydantic import BaseModel
+
+from app import EXPORT_FIELDS, SITES, gas_systems, main
+from export import XLSX_MEDIA_TYPE, export_path
+from instrument import UPDATE_STATS_ENABLED, update_stats
+from metrics import PROFILER_ENABLED, profiler, render
+from reports import ReportScheduler, report_path
+
+# Shift and daily reports, written by worker processes as each shift ends
+report_scheduler = ReportScheduler(gas_systems, EXPORT_FIELDS)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    report_scheduler.start()
+    yield
+    report_scheduler.stop()
+
+
+# FastAPI app that serves the Flet UI plus the plain HTTP routes it needs.
+# Run with: uvicorn server:app --host 0.0.0.0 --port 8000
+app = FastAPI(lifespan=lifespan)
+
+# Shared secret instruments send as "Authorization: Bearer <token>"; unset refuses every reading
+INGEST_TOKEN = os.environ.get("INGEST_TOKEN")
+# Readings accepted in one request
+MAX_INGEST_BATCH = 1000
+
+
+@app.get("/exports/{filename}")
+def download_export(filename: str):
+    """Serves a finished Excel report to the browser."""
+    path = export_path(filename)
+    if path is None or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Report not found")
+    return FileResponse(path, media_type=XLSX_MEDIA_TYPE, filename=filename)
+
+
+@app.get("/reports")
+def list_reports(site: Optional[str] = None):
+    """The site's scheduled shift and daily reports, newest day first."""
+    site_id = site or SITES[0].id
+    if site_id not in gas_systems:
+        raise HTTPException(status_code=404, detail=f"Unknown site {site!r}")
+    return {"reports": report_scheduler.reports(site_id), "error": report_scheduler.last_error}
+
+
+@app.get("/reports/{site_id}/{filename}")
+def download_report(site_id: str, filename: str):
+    """Serves one scheduled report."""
+    path = report_path(site_id, filename, report_scheduler.directory)
+    if path is None or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Report not found")
+    return FileResponse(path, media_type=XLSX_MEDIA_TYPE, filename=filename)
+
+
+@app.get("/debug/updates")
+def update_statistics():
+    """Per-handler update counts and bytes sent; needs UPDATE_STATS=1."""
+    if not UPDATE_STATS_ENABLED:
+        raise HTTPException(status_code=404, detail="Set UPDATE_STATS=1 to collect update statistics")
+    return update_stats.snapshot()
+
+
+class Reading(BaseModel):
+    bay_number: str
+    fields: Dict[str, Any]  # checked by GasLoadingSystem.ingest_readings
+
+
+class ReadingBatch(BaseModel):
+    site: Optional[str] = None
+    readings: List[Reading]
+
+
+@app.post("/ingest")
+def ingest_readings(batch: ReadingBatch, authorization: Optional[str] = Header(None)):
+    """Applies weighbridge and DCS readings for many bays in one storage transaction.
+
+    Runs on the server's thread pool; open sessions receive the changes
+    through their own executors, so the Flet event loop never waits on it.
+    """
+    if not INGEST_TOKEN:
+        raise HTTPException(status_code=503, detail="Set INGEST_TOKEN to accept readings")
+    if not secrets.compare_digest(authorization or "", f"Bearer {INGEST_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Invalid ingest token")
+    if len(batch.readings) > MAX_INGEST_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_INGEST_BATCH} readings per request")
+    system = gas_systems.get(batch.site or SITES[0].id)
+    if system is None:
+        raise HTTPException(status_code=404, detail=f"Unknown site {batch.site!r}")
+    rejected = system.ingest_readings([{"bay_number": reading.bay_number, "fields": reading.fields} for reading in batch.readings])
+    return {"accepted": len(batch.readings) - len(rejected), "rejected": rejected}
+
+
+@app.get("/rollups")
+def production_rollups(by: str = "shift", start: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$"),
+                       end: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$"),
+                       shift: Optional[str] = None, bay_number: Optional[str] = None,
+                       customer_name: Optional[str] = None, site: Optional[str] = None):
+    """Truck count and load_qty per ``by`` (comma-separated: day, shift, bay_number, customer_name).
+
+    ``start`` and ``end`` are days (YYYY-MM-DD), both included. Answered from
+    running totals, so a shift-end report costs the same at any history size.
+    """
+    system = gas_systems.get(site or SITES[0].id)
+    if system is None:
+        raise HTTPException(status_code=404, detail=f"Unknown site {site!r}")
+    try:
+        rows = system.rollup(tuple(name for name in by.split(",") if name), start, end, shift=shift,
+                             bay_number=bay_number, customer_name=customer_name)
+    except ValueError as ex:
+        raise HTTPException(status_code=400, detail=str(ex))
+    return {"rows": rows}
+
+
+@app.get("/changes")
+def changes_since(since: int = Query(0, ge=0), feed: Optional[str] = None, site: Optional[str] = None):
+    """Changes to bays and completed loads after sequence number ``since``, for a client catching up.
+
+    Pass back the ``feed`` and ``seq`` of the previous answer (none the first
+    time). Each bay's edits come merged into one change with the latest value
+    of each field. A completion's ``record`` is null when it is older than
+    the changes kept in memory; read the completed list then. With ``reset``
+    true (the server restarted, or on the first request), ``changes`` hold
+    every bay's full state; fields left out are empty.
+    """
+    system = gas_systems.get(site or SITES[0].id)
+    if system is None:
+        raise HTTPException(status_code=404, detail=f"Unknown site {site!r}")
+    result = system.changes_since(since, feed)
+    return {
+        "feed": result.feed,
+        "seq": result.seq,
+        "reset": result.reset,
+        "changes": [{key: value.to_json() if key == "record" and value is not None else value
+                     for key, value in change.items() if key != "origin"} for change in result.changes],
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Handler latency, storage write and report histograms in the Prometheus text format."""
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
+
+
+def require_profiler():
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Set PROFILER_ENABLED=1 to allow the sampling profiler")
+
+
+@app.post("/debug/profiler/start")
+def start_profiler(interval_ms: float = 5.0):
+    """Starts sampling handler stacks every ``interval_ms``; needs PROFILER_ENABLED=1."""
+    require_profiler()
+    if not 1 <= interval_ms <= 1000:
+        raise HTTPException(status_code=400, detail="interval_ms must be between 1 and 1000")
+    profiler.start(interval_ms / 1000)
+    return profiler.report(top=0)
+
+
+@app.post("/debug/profiler/stop")
+def stop_profiler():
+    """Stops the profiler and returns what it collected."""
+    require_profiler()
+    profiler.stop()
+    return profiler.report()
+
+
+@app.get("/debug/profiler")
+def profiler_report(top: int = 50):
+    """Most sampled handler stacks and the slowest recent calls."""
+    require_profiler()
+    return profiler.report(top)
+
+
+# The Flet app takes every other path, so it must be mounted last
+app.mount("/", flet_fastapi.app(main))
@@ -0,0 +1,50 @@
+"""Loading sites and their bays.
+
+The layout comes from the JSON file named by GAS_LOADING_SITES:
+
+    {"sites": [
+        {"id": "T1", "name": "Terminal 1", "bays": ["1", "2", "3", "4"]},
+        {"id": "T2", "name": "Terminal 2", "bays": ["A", "B", "C", "D", "E", "F",
+                                                     "G", "H", "I", "J", "K", "L"]}
+    ]}
+
+Without it there is one site with bays 1-4, as before.
+"""
+import json
+import os
+import re
+from typing import List, NamedTuple, Optional, Tuple
+
+_ID_RE = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+class Site(NamedTuple):
+    id: str
+    name: str
+    bays: Tuple[str, ...]
+
+    def bay_label(self, bay_number: str) -> str:
+        return f"Bay {bay_number}"
+
+
+DEFAULT_SITES = [Site("main", "ลานโหลดก๊าซธรรมชาติ", ("1", "2", "3", "4"))]
+
+
+def load_sites(path: Optional[str] = None) -> List[Site]:
+    """Reads the site layout; raises ValueError if the file is not usable."""
+    path = path or os.environ.get("GAS_LOADING_SITES")
+    if not path:
+        return list(DEFAULT_SITES)
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    sites = []
+    for entry in config.get("sites", []):
+        site = Site(str(entry["id"]), str(entry.get("name", entry["id"])), tuple(str(bay) for bay in entry["bays"]))
+        if not _ID_RE.match(site.id):
+            raise ValueError(f"Site id {site.id!r} may only use letters, digits, '_' and '-'")
+        if not site.bays or len(set(site.bays)) != len(site.bays):
+            raise ValueError(f"Site {site.id!r} needs a list of distinct bays")
+        sites.append(site)
+    if not sites or len({site.id for site in sites}) != len(sites):
+        raise ValueError(f"{path} must list at least one site, each with a distinct id")
+    return sites
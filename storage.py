@@ -0,0 +1,560 @@
+import heapq
+import json
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+from operator import attrgetter
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+from records import LoadingRecord, parse_timestamp
+from sites import Site
+from rollups import SOURCE_FIELDS, DayBound, RollupKey, check_dimensions, day_bound, entries_from_texts, rollup_key, \
+    rollup_qty, summarize
+
+TimeBound = Optional[Union[str, datetime]]
+# (sort value, id) of the last row of a page; the next page starts after it
+Cursor = Optional[Tuple[Any, int]]
+
+# Columns a completed-loads page can be sorted by (all of them are indexed)
+SORT_COLUMNS = ("completed_time", "bay_number", "order_no", "carrier_name", "shift")
+
+# Identifies a completed load when importing history: (bay_number, order_no, completed_time)
+LoadKey = Tuple[str, str, int]
+
+
+def load_key(record: LoadingRecord) -> LoadKey:
+    return record.bay_number, record.text("order_no"), record.completed_time
+
+
+def _time_bound(value: TimeBound) -> Optional[str]:
+    """SQLite stores completed_time as an ISO string, so bounds compare as text."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _epoch_bound(value: TimeBound) -> Optional[int]:
+    """LoadingRecord keeps completed_time as epoch seconds."""
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    if isinstance(value, str):
+        return parse_timestamp(value)
+    return value
+
+
+def _check_sort(sort: str):
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"Cannot sort completed loads by {sort!r}")
+
+
+def _add_rollup(totals: Dict[RollupKey, List[float]], key: RollupKey, qty: float):
+    total = totals.get(key)
+    if total is None:
+        totals[key] = [1, qty]
+    else:
+        total[0] += 1
+        total[1] += qty
+
+
+# -------------------- In-memory storage --------------------
+class MemoryStorage:
+    """Keeps bays and completed loads in memory. Nothing survives a restart."""
+    def __init__(self):
+        self._bays: Dict[str, LoadingRecord] = {}
+        self._completed: List[LoadingRecord] = []
+        self._by_id: Dict[int, LoadingRecord] = {}
+        # day -> {(shift, bay_number, customer_name): [loads, load_qty]}
+        self._rollups: Dict[str, Dict[Tuple[str, str, str], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def load_bays(self) -> Dict[str, LoadingRecord]:
+        return {bay_number: record.copy() for bay_number, record in self._bays.items()}
+
+    def save_bay(self, bay_number: str, record: LoadingRecord):
+        self._bays[bay_number] = record.copy()
+
+    def save_bays(self, records: Dict[str, LoadingRecord]):
+        """Saves several bays at once."""
+        with self._lock:
+            self._bays.update((bay_number, record.copy()) for bay_number, record in records.items())
+
+    def complete(self, bay_number: str, record: LoadingRecord) -> LoadingRecord:
+        """Clears the bay and appends its record to the completed loads."""
+        with self._lock:
+            record.id = len(self._completed) + 1
+            self._completed.append(record)
+            self._by_id[record.id] = record
+            self._add_rollup(record)
+            self._bays.pop(bay_number, None)
+        return record
+
+    def _add_rollup(self, record: LoadingRecord):
+        key = rollup_key(record)
+        _add_rollup(self._rollups.setdefault(key[0], {}), key[1:], rollup_qty(record))
+
+    def count_completed(self) -> int:
+        return len(self._completed)
+
+    def completed_keys(self) -> Set[LoadKey]:
+        """(bay_number, order_no, completed_time) of every completed load."""
+        with self._lock:
+            return {load_key(record) for record in self._completed}
+
+    def import_completed(self, records: List[LoadingRecord]):
+        """Adds historical loads, keeping completed loads in completion-time order."""
+        with self._lock:
+            for record in records:
+                record.id = len(self._completed) + 1
+                self._completed.append(record)
+                self._by_id[record.id] = record
+                self._add_rollup(record)
+            self._completed.sort(key=attrgetter("completed_time"))
+
+    def rollup(self, by: Sequence[str] = (), start: DayBound = None, end: DayBound = None,
+               shift: Optional[str] = None, bay_number: Optional[str] = None,
+               customer_name: Optional[str] = None) -> List[dict]:
+        """Loads and load_qty per value of ``by`` over the days from ``start`` to ``end`` (both included)."""
+        check_dimensions(by)
+        start, end = day_bound(start), day_bound(end)
+        with self._lock:
+            entries = [((day, *rest), loads, qty) for day, totals in self._rollups.items()
+                       if (start is None or day >= start) and (end is None or day <= end)
+                       for rest, (loads, qty) in totals.items()]
+        return summarize(entries, by, {"shift": shift, "bay_number": bay_number, "customer_name": customer_name})
+
+    def rebuild_rollups(self):
+        """Recomputes every rollup from the completed loads."""
+        with self._lock:
+            self._rollups = {}
+            for record in self._completed:
+                self._add_rollup(record)
+
+    def recent_completed(self, limit: int = 10) -> List[LoadingRecord]:
+        """Returns the newest completed loads, oldest first."""
+        with self._lock:
+            return self._completed[-limit:]
+
+    def _matching(self, start: TimeBound = None, end: TimeBound = None, bay_number: Optional[str] = None,
+                  shift: Optional[str] = None, order_no: Optional[str] = None) -> Iterator[LoadingRecord]:
+        start, end = _epoch_bound(start), _epoch_bound(end)
+        with self._lock:
+            records = list(self._completed)
+        for record in records:
+            if start is not None and record.completed_time < start:
+                continue
+            if end is not None and record.completed_time >= end:
+                continue
+            if bay_number is not None and record.bay_number != bay_number:
+                continue
+            if shift is not None and record.shift != shift:
+                continue
+            if order_no is not None and record.order_no != order_no:
+                continue
+            yield record
+
+    def query_completed(self, start: TimeBound = None, end: TimeBound = None, bay_number: Optional[str] = None,
+                        shift: Optional[str] = None, order_no: Optional[str] = None,
+                        limit: Optional[int] = None) -> List[LoadingRecord]:
+        """Returns completed loads matching every given filter, ordered by completion time."""
+        result = []
+        for record in self._matching(start, end, bay_number, shift, order_no):
+            result.append(record)
+            if limit is not None and len(result) >= limit:
+                break
+        return result
+
+    def page_completed(self, filters: Optional[dict] = None, sort: str = "completed_time", descending: bool = True,
+                       cursor: Cursor = None, limit: int = 25) -> Tuple[List[LoadingRecord], Cursor]:
+        """Returns one page of filtered, sorted completed loads and the cursor of the next page."""
+        _check_sort(sort)
+        key = lambda record: (record.get(sort, ""), record.id)
+        records = self._matching(**(filters or {}))
+        if cursor is not None:
+            if descending:
+                records = (record for record in records if key(record) < tuple(cursor))
+            else:
+                records = (record for record in records if key(record) > tuple(cursor))
+        pick = heapq.nlargest if descending else heapq.nsmallest
+        rows = pick(limit + 1, records, key=key)
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, key(rows[-1])
+
+    def get_completed(self, ids: Sequence[int]) -> List[LoadingRecord]:
+        """Returns the completed loads with these ids, in the same order; unknown ids are skipped."""
+        with self._lock:
+            return [self._by_id[record_id] for record_id in ids if record_id in self._by_id]
+
+    def iter_completed(self) -> Iterator[LoadingRecord]:
+        with self._lock:
+            records = list(self._completed)
+        return iter(records)
+
+    def iter_completed_fields(self, fields: Sequence[str]) -> Iterator[Tuple[int, Tuple[str, ...]]]:
+        """Streams (id, texts of ``fields``) of every completed load; unset fields are ''."""
+        for record in self.iter_completed():
+            yield record.id, tuple(record.text(field) for field in fields)
+
+    def iter_completed_values(self, fields: Sequence[str]) -> Iterator[tuple]:
+        """Streams (id, *values of ``fields``) of every completed load; unset fields are None.
+
+        Values are the records' own: timestamps are epoch seconds.
+        """
+        return map(attrgetter("id", *fields), self.iter_completed())
+
+    def close(self):
+        pass
+
+
+# -------------------- SQLite storage --------------------
+class SQLiteStorage:
+    """Stores bays and completed loads in a SQLite database in WAL mode.
+
+    The searchable columns of a completed load are copied out of the record
+    and indexed; the full record is kept as JSON in ``data``.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS active_bays (
+            bay_number TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS completed (
+            id INTEGER PRIMARY KEY,
+            bay_number TEXT NOT NULL,
+            completed_time TEXT NOT NULL,
+            order_no TEXT,
+            carrier_name TEXT,
+            shift TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_completed_bay_number ON completed (bay_number);
+        CREATE INDEX IF NOT EXISTS idx_completed_completed_time ON completed (completed_time);
+        CREATE INDEX IF NOT EXISTS idx_completed_order_no ON completed (order_no);
+        CREATE INDEX IF NOT EXISTS idx_completed_carrier_name ON completed (carrier_name);
+        CREATE INDEX IF NOT EXISTS idx_completed_shift ON completed (shift);
+        CREATE TABLE IF NOT EXISTS rollups (
+            day TEXT NOT NULL,
+            shift TEXT NOT NULL,
+            bay_number TEXT NOT NULL,
+            customer_name TEXT NOT NULL,
+            loads INTEGER NOT NULL,
+            load_qty REAL NOT NULL,
+            PRIMARY KEY (day, shift, bay_number, customer_name)
+        ) WITHOUT ROWID;
+    """
+    ADD_ROLLUP = ("INSERT INTO rollups VALUES (?, ?, ?, ?, ?, ?) "
+                  "ON CONFLICT (day, shift, bay_number, customer_name) "
+                  "DO UPDATE SET loads = loads + excluded.loads, load_qty = load_qty + excluded.load_qty")
+    # Rows fetched per round trip when streaming the whole history
+    FETCH_SIZE = 500
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        # A database from before rollups existed gets them once
+        if (self._conn.execute("SELECT EXISTS (SELECT 1 FROM completed)").fetchone()[0]
+                and not self._conn.execute("SELECT EXISTS (SELECT 1 FROM rollups)").fetchone()[0]):
+            self.rebuild_rollups()
+
+    def load_bays(self) -> Dict[str, LoadingRecord]:
+        with self._lock:
+            rows = self._conn.execute("SELECT bay_number, data FROM active_bays").fetchall()
+        return {bay_number: LoadingRecord.from_json(json.loads(data)) for bay_number, data in rows}
+
+    def save_bay(self, bay_number: str, record: LoadingRecord):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO active_bays (bay_number, data) VALUES (?, ?) "
+                "ON CONFLICT (bay_number) DO UPDATE SET data = excluded.data",
+                (bay_number, json.dumps(record.to_json(), ensure_ascii=False)),
+            )
+
+    def save_bays(self, records: Dict[str, LoadingRecord]):
+        """Saves several bays in one transaction."""
+        rows = [(bay_number, json.dumps(record.to_json(), ensure_ascii=False)) for bay_number, record in records.items()]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO active_bays (bay_number, data) VALUES (?, ?) "
+                    "ON CONFLICT (bay_number) DO UPDATE SET data = excluded.data",
+                    rows,
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def complete(self, bay_number: str, record: LoadingRecord) -> LoadingRecord:
+        """Clears the bay and inserts its completed record in one transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                cursor = self._conn.execute(
+                    "INSERT INTO completed (bay_number, completed_time, order_no, carrier_name, shift, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (bay_number, record.text("completed_time"), record.text("order_no"),
+                     record.text("carrier_name"), record.text("shift"),
+                     json.dumps(record.to_json(), ensure_ascii=False)),
+                )
+                self._conn.execute("UPDATE active_bays SET data = '{}' WHERE bay_number = ?", (bay_number,))
+                self._conn.execute(self.ADD_ROLLUP, (*rollup_key(record), 1, rollup_qty(record)))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        record.id = cursor.lastrowid
+        return record
+
+    def count_completed(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM completed").fetchone()[0]
+
+    def completed_keys(self) -> Set[LoadKey]:
+        """(bay_number, order_no, completed_time) of every completed load."""
+        with self._lock:
+            rows = self._conn.execute("SELECT bay_number, order_no, completed_time FROM completed").fetchall()
+        return {(bay_number, order_no or "", parse_timestamp(completed_time))
+                for bay_number, order_no, completed_time in rows}
+
+    def import_completed(self, records: List[LoadingRecord]):
+        """Adds historical loads in one transaction."""
+        rows = [(record.bay_number, record.text("completed_time"), record.text("order_no"),
+                 record.text("carrier_name"), record.text("shift"),
+                 json.dumps(record.to_json(), ensure_ascii=False)) for record in records]
+        totals: Dict[RollupKey, List[float]] = {}
+        for record in records:
+            _add_rollup(totals, rollup_key(record), rollup_qty(record))
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO completed (bay_number, completed_time, order_no, carrier_name, shift, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.executemany(self.ADD_ROLLUP, [(*key, loads, qty) for key, (loads, qty) in totals.items()])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _record(row) -> LoadingRecord:
+        record = LoadingRecord.from_json(json.loads(row[1]))
+        record.id = row[0]
+        return record
+
+    def recent_completed(self, limit: int = 10) -> List[LoadingRecord]:
+        """Returns the newest completed loads, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, data FROM completed ORDER BY completed_time DESC, id DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [self._record(row) for row in reversed(rows)]
+
+    @staticmethod
+    def _where(start: TimeBound = None, end: TimeBound = None, bay_number: Optional[str] = None,
+               shift: Optional[str] = None, order_no: Optional[str] = None) -> Tuple[List[str], list]:
+        where, params = [], []
+        for clause, value in (("completed_time >= ?", _time_bound(start)), ("completed_time < ?", _time_bound(end)),
+                              ("bay_number = ?", bay_number), ("shift = ?", shift), ("order_no = ?", order_no)):
+            if value is not None:
+                where.append(clause)
+                params.append(value)
+        return where, params
+
+    def query_completed(self, start: TimeBound = None, end: TimeBound = None, bay_number: Optional[str] = None,
+                        shift: Optional[str] = None, order_no: Optional[str] = None,
+                        limit: Optional[int] = None) -> List[LoadingRecord]:
+        """Returns completed loads matching every given filter, ordered by completion time."""
+        where, params = self._where(start, end, bay_number, shift, order_no)
+        sql = "SELECT id, data FROM completed"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY completed_time, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._record(row) for row in rows]
+
+    def page_completed(self, filters: Optional[dict] = None, sort: str = "completed_time", descending: bool = True,
+                       cursor: Cursor = None, limit: int = 25) -> Tuple[List[LoadingRecord], Cursor]:
+        """Returns one page of filtered, sorted completed loads and the cursor of the next page.
+
+        Pages are addressed by the (sort value, id) of the previous page's last
+        row, so every page is an index range scan no matter how deep it is.
+        """
+        _check_sort(sort)
+        where, params = self._where(**(filters or {}))
+        if cursor is not None:
+            where.append(f"({sort}, id) {'<' if descending else '>'} (?, ?)")
+            params.extend(cursor)
+        direction = "DESC" if descending else "ASC"
+        sql = f"SELECT id, data, {sort} FROM completed"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {sort} {direction}, id {direction} LIMIT ?"
+        params.append(limit + 1)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        if len(rows) <= limit:
+            return [self._record(row) for row in rows], None
+        rows = rows[:limit]
+        return [self._record(row) for row in rows], (rows[-1][2], rows[-1][0])
+
+    def get_completed(self, ids: Sequence[int]) -> List[LoadingRecord]:
+        """Returns the completed loads with these ids, in the same order; unknown ids are skipped."""
+        if not ids:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, data FROM completed WHERE id IN ({', '.join('?' * len(ids))})", list(ids)
+            ).fetchall()
+        records = {row[0]: self._record(row) for row in rows}
+        return [records[record_id] for record_id in ids if record_id in records]
+
+    @staticmethod
+    def _extract(fields: Sequence[str]) -> Tuple[str, List[str]]:
+        """SQL that reads ``fields`` out of ``data`` as one JSON array, and its parameters."""
+        paths = [f'$."{field}"' for field in fields]
+        placeholders = ", ".join("?" * len(fields))
+        # Given several paths, json_extract returns one JSON array of their values
+        extract = f"json_extract(data, {placeholders})" if len(fields) > 1 else "json_array(json_extract(data, ?))"
+        return extract, paths
+
+    @staticmethod
+    def _texts(values: str) -> Tuple[str, ...]:
+        return tuple("" if value is None else str(value) for value in json.loads(values))
+
+    def _iter_extracted(self, fields: Sequence[str]) -> Iterator[Tuple[int, str]]:
+        """Streams (id, JSON array of ``fields``) of every completed load, in id order.
+
+        SQLite reads the fields out of the JSON, all at once as one small
+        array per load, so no record is built.
+        """
+        extract, paths = self._extract(fields)
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT id, {extract} FROM completed WHERE id > ? ORDER BY id LIMIT ?",
+                    (*paths, last_id, self.FETCH_SIZE)
+                ).fetchall()
+            if not rows:
+                return
+            yield from rows
+            last_id = rows[-1][0]
+
+    def iter_completed_fields(self, fields: Sequence[str]) -> Iterator[Tuple[int, Tuple[str, ...]]]:
+        """Streams (id, texts of ``fields``) of every completed load; unset fields are ''."""
+        for record_id, values in self._iter_extracted(fields):
+            yield record_id, self._texts(values)
+
+    def iter_completed_values(self, fields: Sequence[str]) -> Iterator[tuple]:
+        """Streams (id, *values of ``fields``) of every completed load; unset fields are None.
+
+        Values are as stored in the JSON layout, so timestamps are text.
+        """
+        for record_id, values in self._iter_extracted(fields):
+            yield (record_id, *json.loads(values))
+
+    def rollup(self, by: Sequence[str] = (), start: DayBound = None, end: DayBound = None,
+               shift: Optional[str] = None, bay_number: Optional[str] = None,
+               customer_name: Optional[str] = None) -> List[dict]:
+        """Loads and load_qty per value of ``by`` over the days from ``start`` to ``end`` (both included).
+
+        A range of days is a range of the rollups' primary key.
+        """
+        check_dimensions(by)
+        where, params = [], []
+        for clause, value in (("day >= ?", day_bound(start)), ("day <= ?", day_bound(end)), ("shift = ?", shift),
+                              ("bay_number = ?", bay_number), ("customer_name = ?", customer_name)):
+            if value is not None:
+                where.append(clause)
+                params.append(value)
+        columns = ", ".join(by)
+        sql = f"SELECT {columns + ', ' if by else ''}SUM(loads), SUM(load_qty) FROM rollups"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if by:
+            sql += f" GROUP BY {columns} ORDER BY {columns}"
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [dict(zip(by, row), loads=row[-2], load_qty=row[-1]) for row in rows if row[-2] is not None]
+
+    def rebuild_rollups(self):
+        """Recomputes every rollup from the completed loads, in one transaction."""
+        extract, paths = self._extract(SOURCE_FIELDS)
+        totals: Dict[RollupKey, List[float]] = {}
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(f"SELECT id, {extract} FROM completed", paths)
+                for key, qty in entries_from_texts((record_id, self._texts(values)) for record_id, values in rows):
+                    _add_rollup(totals, key, qty)
+                self._conn.execute("DELETE FROM rollups")
+                self._conn.executemany("INSERT INTO rollups VALUES (?, ?, ?, ?, ?, ?)",
+                                       [(*key, loads, qty) for key, (loads, qty) in totals.items()])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def iter_completed(self) -> Iterator[LoadingRecord]:
+        """Streams every completed load in id order without loading them all at once."""
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT id, data FROM completed WHERE id > ? ORDER BY id LIMIT ?", (last_id, self.FETCH_SIZE)
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield self._record(row)
+            last_id = rows[-1][0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_storage(partition: Optional[str] = None):
+    """Opens the storage backend selected by the GAS_LOADING_DB environment variable.
+
+    GAS_LOADING_DB is the path of a SQLite database; without it the data is
+    kept in memory, as before. A ``partition`` (a site id) gets its own
+    database next to it, e.g. loading.T2.db for loading.db.
+    """
+    path = os.environ.get("GAS_LOADING_DB")
+    if path:
+        if partition:
+            root, ext = os.path.splitext(path)
+            path = f"{root}.{partition}{ext}"
+        return SQLiteStorage(path)
+    return MemoryStorage()
+
+
+def command_line_site(site_id: Optional[str], sites: Sequence[Site], without_db: str) -> Optional[Site]:
+    """The site a command-line tool works on: ``site_id``, or the first of ``sites``.
+
+    Such a tool needs GAS_LOADING_DB; without it, or for an unknown site,
+    prints why (``without_db`` says what the tool would miss) and returns None.
+    """
+    if not os.environ.get("GAS_LOADING_DB"):
+        print(f"GAS_LOADING_DB is not set: {without_db}", file=sys.stderr)
+        return None
+    site = next((s for s in sites if s.id == site_id), None) if site_id else sites[0]
+    if site is None:
+        print(f"Unknown site {site_id!r}", file=sys.stderr)
+    return site
@@ -0,0 +1,27 @@
+"""The dashboard frame read straight from each storage."""
+import pandas as pd
+
+import analytics
+from benchmarks.bench_analytics import fake_history, open_history
+
+
+def test_sqlite_frame_matches_memory(tmp_path):
+    history = fake_history(2000)
+    frames = []
+    for backend in ("memory", "sqlite"):
+        storage = open_history(history, backend, str(tmp_path))
+        frame = analytics.build_frame(storage.iter_completed_values(analytics.COLUMNS))
+        frames.append(frame.sort_values("id", ignore_index=True))
+        storage.close()
+
+    memory, sqlite = frames
+    assert len(sqlite) == len(history)
+    assert sqlite[analytics.TURNAROUND].notna().any()
+    pd.testing.assert_frame_equal(memory.drop(columns="id"), sqlite.drop(columns="id"), check_dtype=False)
+
+
+def test_empty_storage_has_every_column(tmp_path):
+    storage = open_history([], "sqlite", str(tmp_path))
+    frame = analytics.build_frame(storage.iter_completed_values(analytics.COLUMNS))
+    assert list(frame.columns) == ["id", *analytics.GROUP_FIELDS, *analytics.STEPS, analytics.TURNAROUND]
+    assert analytics.find_outliers(frame).empty
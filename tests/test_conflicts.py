@@ -0,0 +1,69 @@
+"""Two sessions editing the same field of a bay."""
+import flet as ft
+
+import app
+from benchmarks.bench_sessions import field, settle
+from benchmarks.fake_page import fire, new_page, walk
+from tests.test_notify import wait_for
+
+CONFLICT = "ผู้ใช้อื่นแก้ไขแล้ว"
+
+
+def open_session(name: str):
+    page, conn = new_page(name)
+    app.main(page)
+    return page, conn
+
+
+def snackbar(page: ft.Page) -> ft.SnackBar:
+    return next(control for control in page.overlay if isinstance(control, ft.SnackBar))
+
+
+def test_pending_edit_conflicts_with_a_save_made_meanwhile(monkeypatch):
+    system = app.GasLoadingSystem(app.SITES[0])
+    monkeypatch.setitem(app.gas_systems, app.SITES[0].id, system)
+    bay_number = app.SITES[0].bays[0]
+    a, a_conn = open_session("session-a")
+    b, b_conn = open_session("session-b")
+
+    # A types and the edit waits for autosave; B saves the same field first
+    field(a, "Carrier Name").value = "Alpha"
+    fire(field(a, "Carrier Name"))
+    field(b, "Carrier Name").value = "Bravo"
+    fire(field(b, "Carrier Name"))
+    fire(field(b, "เลือก Bay"))  # re-selecting the bay saves B's edit now
+    settle(a_conn, b_conn)
+    assert system.get_bay_data(bay_number)["carrier_name"] == "Bravo"
+    # A keeps what was typed, marked as changed by someone else
+    assert field(a, "Carrier Name").value == "Alpha"
+    assert field(a, "Carrier Name").error_text == CONFLICT
+
+    # A's autosave runs: the edit was based on the version before B's save
+    assert wait_for(lambda: field(a, "Carrier Name").value == "Bravo")
+    settle(a_conn, b_conn)
+    assert system.get_bay_data(bay_number)["carrier_name"] == "Bravo"
+    assert field(a, "Carrier Name").error_text == CONFLICT
+    assert snackbar(a).content.value.startswith("ผู้ใช้อื่นแก้ไข 1 ช่อง")
+    assert field(b, "Carrier Name").value == "Bravo"
+
+
+def test_edits_of_different_fields_both_save(monkeypatch):
+    system = app.GasLoadingSystem(app.SITES[0])
+    monkeypatch.setitem(app.gas_systems, app.SITES[0].id, system)
+    bay_number = app.SITES[0].bays[0]
+    a, a_conn = open_session("session-a")
+    b, b_conn = open_session("session-b")
+
+    field(a, "Carrier Name").value = "Alpha"
+    fire(field(a, "Carrier Name"))
+    field(b, "Customer name").value = "Customer B"
+    fire(field(b, "Customer name"))
+    fire(field(b, "เลือก Bay"))
+    settle(a_conn, b_conn)
+    assert field(a, "Customer name").value == "Customer B"
+
+    fire(field(a, "เลือก Bay"))
+    settle(a_conn, b_conn)
+    assert system.get_bay_data(bay_number) == {"carrier_name": "Alpha", "customer_name": "Customer B"}
+    assert not [control for control in walk(a) if getattr(control, "error_text", None)]
+    assert field(b, "Carrier Name").value == "Alpha"
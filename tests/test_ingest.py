@@ -0,0 +1,110 @@
+"""Instrument readings from the fake weighbridge, applied through ingest_readings and POST /ingest."""
+import pytest
+from fastapi.testclient import TestClient
+
+import app
+import server
+from benchmarks.fake_weighbridge import WeighbridgeFeeder
+from records import LoadingRecord
+from sites import DEFAULT_SITES
+from storage import MemoryStorage
+
+
+class CountingStorage(MemoryStorage):
+    """Counts the transactions that write bays."""
+    def __init__(self):
+        super().__init__()
+        self.transactions = 0
+
+    def save_bays(self, records):
+        self.transactions += 1
+        super().save_bays(records)
+
+
+def start_loads(system: app.GasLoadingSystem):
+    for bay_number in system.site.bays:
+        system.save_bay_data(bay_number, {"carrier_name": f"Carrier {bay_number}"})
+
+
+@pytest.fixture
+def system():
+    system = app.GasLoadingSystem(DEFAULT_SITES[0], CountingStorage())
+    start_loads(system)
+    return system
+
+
+def latest_values(readings):
+    latest = {}
+    for reading in readings:
+        latest.setdefault(reading["bay_number"], {}).update(reading["fields"])
+    return latest
+
+
+def test_feeder_batches_are_applied_in_one_transaction(system):
+    changes = []
+    system.subscribe(changes.append)
+    feeder = WeighbridgeFeeder(system.site.bays, batch=50)
+    for _ in range(30):
+        readings = feeder.next_batch()["readings"]
+        changes.clear()
+        before = system.storage.transactions
+        assert system.ingest_readings(readings) == []
+        assert system.storage.transactions == before + 1
+        # Each bay's change is published once per batch, with the latest values
+        assert sorted(change["bay_number"] for change in changes) == sorted(system.site.bays)
+        published = {change["bay_number"]: change["fields"] for change in changes}
+        for bay_number, values in latest_values(readings).items():
+            expected = LoadingRecord()
+            assert expected.update(values) == {}
+            record = system.get_bay_record(bay_number)
+            for key in values:
+                assert record.text(key) == expected.text(key)
+                assert published[bay_number][key] == expected.text(key)
+            assert record.carrier_name == f"Carrier {bay_number}"
+
+
+def test_rejected_fields_are_reported_per_index(system):
+    system.complete_loading("4")
+    changes = []
+    system.subscribe(changes.append)
+    rejected = system.ingest_readings([
+        {"bay_number": "1", "fields": {"load_qty": 1200}},
+        {"bay_number": "9", "fields": {"load_qty": 1200}},
+        {"bay_number": "2", "fields": {"load_qty": 900, "carrier_name": "Someone"}},
+        {"bay_number": "3", "fields": {"cooldown_flow_m3": "fast", "release_pressure_barg": [1]}},
+        {"bay_number": "4", "fields": {"load_qty": 700}},
+    ])
+    assert rejected == [
+        {"index": 1, "errors": {"bay_number": "Unknown bay '9'"}},
+        {"index": 2, "errors": {"carrier_name": "Not an instrument reading"}},
+        {"index": 3, "errors": {**LoadingRecord().update({"cooldown_flow_m3": "fast"}),
+                                "release_pressure_barg": "Expected a number or text"}},
+        {"index": 4, "errors": {"bay_number": "No load in progress"}},
+    ]
+    assert system.storage.transactions == 1
+    assert sorted(change["bay_number"] for change in changes) == ["1", "2"]
+    assert system.get_bay_record("2").load_qty == 900
+    assert system.get_bay_record("2").carrier_name == "Carrier 2"
+    # An idle bay stays idle
+    assert not system.get_bay_record("4")
+
+
+def test_ingest_route_needs_the_token(monkeypatch):
+    client = TestClient(server.app)
+    start_loads(app.gas_systems[app.SITES[0].id])
+    feeder = WeighbridgeFeeder(app.SITES[0].bays, batch=20)
+
+    monkeypatch.setattr(server, "INGEST_TOKEN", None)
+    assert client.post("/ingest", json=feeder.next_batch()).status_code == 503
+    monkeypatch.setattr(server, "INGEST_TOKEN", "secret")
+    assert client.post("/ingest", json=feeder.next_batch()).status_code == 401
+
+    feeder.run(client, rate=2000, seconds=0.1, token="secret")  # raises on any rejected reading
+    body = feeder.next_batch()
+    response = client.post("/ingest", json=body, headers={"Authorization": "Bearer secret"})
+    assert response.json() == {"accepted": len(body["readings"]), "rejected": []}
+    for bay_number, values in latest_values(body["readings"]).items():
+        record = app.gas_systems[app.SITES[0].id].get_bay_record(bay_number)
+        expected = LoadingRecord()
+        expected.update(values)
+        assert all(record.text(key) == expected.text(key) for key in values)
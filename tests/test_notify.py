@@ -0,0 +1,87 @@
+"""Session notifications and autosave over a long run of field edits."""
+import gc
+import time
+import tracemalloc
+
+import flet as ft
+
+import app
+from autosave import Autosaver
+from benchmarks.bench_notify import BUDGET_GROWTH_BYTES, WARMUP_EDITS
+from benchmarks.fake_page import find, fire, new_page, walk
+from notify import NOTIFY_QUEUE_SIZE, Notifier
+
+EDITS = 10_000
+
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_edits_keep_overlay_and_queue_bounded(monkeypatch):
+    system = app.GasLoadingSystem(app.SITES[0])
+    monkeypatch.setitem(app.gas_systems, app.SITES[0].id, system)
+    page, conn = new_page("test-notify")
+    app.main(page)
+    notifier = Notifier(page, interval=0.001)
+    page.update()
+    field = find(page, ft.TextField, label="Carrier Name")
+    overlay = len(page.overlay)
+    controls = len(walk(page))
+
+    longest_queue = 0
+
+    def edit(edits: range):
+        nonlocal longest_queue
+        for i in edits:
+            field.value = f"carrier {i}"
+            fire(field)
+            # Distinct messages, more than the queue holds, as when several fields are saved at once
+            notifier.show(f"บันทึกข้อมูล carrier {i % 20} สำเร็จ")
+            longest_queue = max(longest_queue, len(notifier._queue))
+
+    tracemalloc.start()
+    try:
+        edit(range(WARMUP_EDITS))
+        time.sleep(0.1)
+        gc.collect()
+        before = tracemalloc.get_traced_memory()[0]
+        edit(range(WARMUP_EDITS, EDITS))
+        time.sleep(0.1)
+        gc.collect()
+        growth = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+    assert growth <= BUDGET_GROWTH_BYTES
+    assert longest_queue <= NOTIFY_QUEUE_SIZE
+    assert len(page.overlay) == overlay
+    assert len(walk(page)) == controls
+    # The typing burst is saved once it is over, with the last value
+    assert wait_for(lambda: system.get_bay_data(app.SITES[0].bays[0]).get("carrier_name") == f"carrier {EDITS - 1}")
+    assert wait_for(lambda: not notifier._queue)
+    notifier.close()
+
+
+def test_autosaver_saves_a_burst_in_few_batches():
+    saves = []
+    autosaver = Autosaver(lambda bay_number, changes, bases: saves.append((bay_number, changes)), delay=0.05)
+    keys = ("carrier_name", "order_no", "customer_name")
+    longest_pending = 0
+    for i in range(EDITS):
+        autosaver.mark("1", keys[i % len(keys)], str(i))
+        longest_pending = max(longest_pending, len(autosaver._pending))
+
+    assert longest_pending <= len(keys)
+    assert wait_for(lambda: saves and not autosaver._pending)
+    merged = {}
+    for bay_number, changes in saves:
+        assert bay_number == "1"
+        merged.update(changes)
+    assert merged == {keys[i % len(keys)]: str(i) for i in range(EDITS - len(keys), EDITS)}
+    assert len(saves) < EDITS // 100